@@ -1,11 +1,16 @@
 from telegram.ext import Application
+import asyncio
+import config
 from handlers.admin_handler import AdminHandler
 from interfaces.admin_interface import AdminInterface
 from logger import setup_logger
 from database.setup import setup_database
 from handlers.user_handler import UserHandler
 from interfaces.user_interface import UserInterface
+from keyboards.date_keyboards import DateKeyboardCache
+from keyboards.general_keyboards import GeneralKeyboards
 from keyboards.setup import setup_keyboards
+from utils.metrics import HandlerMetrics
 
 
 def setup_bot_data(app: Application):
@@ -13,16 +18,19 @@ def setup_bot_data(app: Application):
     user_keyboards, admin_keyboards, general_keyboards, dyn_keyboards = setup_keyboards(
         app
     )
+    metrics = HandlerMetrics()
     user_interface = UserInterface(user_keyboards, general_keyboards)
-    user_handler = UserHandler(user_interface, dyn_keyboards).get_handlers()
+    user_handler = metrics.instrument_handlers(
+        UserHandler(user_interface, dyn_keyboards).get_handlers()
+    )
     admin_interface = AdminInterface(admin_keyboards, general_keyboards)
-    admin_handler = AdminHandler(admin_interface, dyn_keyboards).get_handlers()
-
-    database = setup_database()
-    app.bot_data["db"] = database
+    admin_handler = metrics.instrument_handlers(
+        AdminHandler(admin_interface, dyn_keyboards).get_handlers()
+    )
 
     logger = setup_logger(__name__)
     app.bot_data["logger"] = logger
+    app.bot_data["metrics"] = metrics
 
     app.bot_data["general"] = {"keyboards": general_keyboards}
 
@@ -33,3 +41,75 @@ def setup_bot_data(app: Application):
     }
 
     app.bot_data["admin"] = {"keyboards": admin_keyboards, "handler": admin_handler}
+
+
+async def setup_bot_database(app: Application):
+    """Подключиться к базе данных при запуске приложения."""
+
+    database = await setup_database(app.persistence.db if app.persistence else None)
+    app.bot_data["db"] = database
+    app.bot_data["metrics"].register_cache("clients", database["client_cache"])
+    app.bot_data["metrics"].register_cache(
+        "availability", database["availability_cache"]
+    )
+    app.bot_data["general"]["date_keyboards"] = DateKeyboardCache(
+        database["schedule"], GeneralKeyboards()
+    )
+    app.bot_data["metrics"].register_cache(
+        "date_keyboards", app.bot_data["general"]["date_keyboards"]
+    )
+
+
+async def close_bot_database(app: Application):
+    """Закрыть пул соединений с базой данных при остановке приложения."""
+
+    if "db" in app.bot_data:
+        query_stats_file = getattr(config, "QUERY_STATS_FILE", None)
+        if query_stats_file:
+            app.bot_data["db"]["db"].query_stats.dump(query_stats_file)
+        await app.bot_data["db"]["db"].close()
+        app.bot_data["logger"].debug("База данных закрыта.")
+
+
+async def setup_bot_metrics(app: Application):
+    """Запустить HTTP-эндпоинт метрик и периодическую запись метрик в файл, если они заданы в конфигурации."""
+
+    metrics = app.bot_data["metrics"]
+    metrics_port = getattr(config, "METRICS_PORT", None)
+    metrics_file = getattr(config, "METRICS_FILE", None)
+
+    if metrics_port:
+        app.bot_data["metrics_server"] = await metrics.start_server(
+            getattr(config, "METRICS_HOST", "127.0.0.1"), metrics_port
+        )
+    if metrics_file:
+        app.bot_data["metrics_task"] = asyncio.create_task(
+            metrics.write_periodically(
+                metrics_file, getattr(config, "METRICS_FILE_INTERVAL", 60)
+            )
+        )
+
+
+async def close_bot_metrics(app: Application):
+    """Остановить эндпоинт метрик и записать метрики в файл при остановке приложения."""
+
+    if "metrics_server" in app.bot_data:
+        app.bot_data["metrics_server"].close()
+        await app.bot_data["metrics_server"].wait_closed()
+    if "metrics_task" in app.bot_data:
+        app.bot_data["metrics_task"].cancel()
+        app.bot_data["metrics"].write(config.METRICS_FILE)
+
+
+async def on_startup(app: Application):
+    """Подготовить приложение к запуску."""
+
+    await setup_bot_database(app)
+    await setup_bot_metrics(app)
+
+
+async def on_shutdown(app: Application):
+    """Освободить ресурсы приложения при остановке."""
+
+    await close_bot_metrics(app)
+    await close_bot_database(app)
@@ -5,6 +5,7 @@ EMOJI = {"back": "⬅️", "blocked": "🚫", "schedule": "📋", "sparkle": "
 # Сообщения для пользователя
 USER_MESSAGES = {
     "SELECT_PROCEDURE": f"{EMOJI['sparkle']} Выберите процедуру:",
+    "slot_taken": "Это время уже заняли, пожалуйста, выберите другое.",
 }
 
 REPLY_USER_BUTTONS = {
@@ -13,6 +14,27 @@ REPLY_USER_BUTTONS = {
 # Сообщения для администратора
 ADMIN_MESSAGES = {
     "NOT_AUTHORIZED": f"{EMOJI['blocked']} У вас нет прав администратора.",
+    "slot_taken": "Это время уже занято другой записью или блокировкой.",
+    "query_stats_dumped": "Статистика запросов сохранена в {path}.",
+    "query_stats_reset": "Статистика запросов обнулена.",
+    "hours_usage": (
+        "Использование:\n"
+        "/hours — показать рабочие часы салона\n"
+        "/hours <1-7> 09:00-13:00 14:00-18:00 — часы дня недели (1 — понедельник)\n"
+        "/hours ДД.ММ.ГГГГ 10:00-15:00 — часы отдельной даты\n"
+        "Вместо смен можно указать «выходной» или «сброс».\n"
+        "С #<id ресурса> первым аргументом часы задаются для мастера или кабинета."
+    ),
+    "hours_saved": "Рабочие часы для {day}: {shifts}",
+    "hours_save_failed": "Не удалось сохранить рабочие часы.",
+    "resources_usage": (
+        "Использование:\n"
+        "/resources — список мастеров и кабинетов\n"
+        "/resources add master|room Имя — добавить ресурс\n"
+        "/resources off|on <id> — отключить или включить ресурс\n"
+        "/resources block <id> ДД.ММ.ГГГГ [09:00-12:00] — заблокировать день или время ресурса"
+    ),
+    "resources_update_failed": "Не удалось изменить ресурсы.",
 }
 
 REPLY_ADMIN_BUTTONS = {
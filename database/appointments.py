@@ -1,51 +1,212 @@
+from database.availability_cache import AvailabilityCache
 from database.clients import Clients
+from database.slot_holds import SlotHolds
+from database.working_hours import WorkingHours
 from logger import setup_logger
 from database import Database
 from typing import Optional, List, Tuple
 from datetime import date, time
+from enum import Enum
+
+# Пространство ключей advisory-блокировки, сериализующей запись на одну дату.
+BOOKING_LOCK_NAMESPACE = 1
+
+
+class BookingStatus(Enum):
+    """Результат попытки записи на процедуру."""
+
+    BOOKED = "booked"
+    SLOT_TAKEN = "slot_taken"
+    ERROR = "error"
 
 
 class Appointments:
 
-    def __init__(self, db: Database, clients: Clients):
+    def __init__(
+        self,
+        db: Database,
+        clients: Clients,
+        availability_cache: AvailabilityCache,
+        slot_holds: SlotHolds,
+        working_hours: WorkingHours,
+    ):
         self.db = db
         self.clients = clients
+        self.availability_cache = availability_cache
+        self.slot_holds = slot_holds
+        self.working_hours = working_hours
         self.logger = setup_logger(__name__)
 
-    def create_appointment(
+    async def create_appointment(
         self,
-        client_id: int,
+        client_id: Optional[int],
         client_name: str,
         client_telephone: str,
         procedure: str,
         date: date,
         start_time: time,
         end_time: time,
-    ):
-        """Добавить запись на процедуру."""
-        query = """
-            INSERT INTO Appointments (client_id, procedure, date, start_time, end_time)
-            VALUES (%s, %s, %s, %s, %s)
+        replaced_appointment_id: Optional[int] = None,
+        hold_owner_id: Optional[int] = None,
+        tg_id: Optional[int] = None,
+        tg_first_name: Optional[str] = None,
+        tg_username: Optional[str] = None,
+    ) -> BookingStatus:
+        """Добавить запись на процедуру, если выбранное время свободно хотя бы у одного ресурса.
+
+        Запись получает ресурс, на котором hold_owner_id удерживает это время,
+        а если он занят — первый активный ресурс, который в это время работает,
+        не занят записями и блокировками и не удерживается другими пользователями.
+        Проверка пересечений с другими записями и блокировками и вставка выполняются
+        в одной транзакции под блокировкой даты, поэтому одновременные записи
+        на одно время одного ресурса невозможны.
+        Если указан replaced_appointment_id, эта запись удаляется в той же транзакции (перенос).
+        После записи удержание hold_owner_id снимается.
+        Если client_id не указан, клиент с tg_id добавляется или обновляется
+        в той же транзакции, поэтому клиент без записи в базе не остается.
+        """
+        overlap_query = """
+            SELECT resource_id FROM Appointments
+            WHERE date = $1 AND start_time < $3 AND end_time > $2
+            AND ($4::INTEGER IS NULL OR id <> $4)
+            UNION
+            SELECT resource_id FROM BlockedSlots
+            WHERE date = $1 AND start_time < $3 AND end_time > $2
         """
-        self.db.execute_query(query, client_id, procedure, date, start_time, end_time)
+        insert_query = """
+            INSERT INTO Appointments (client_id, procedure, date, start_time, end_time, resource_id)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            RETURNING id
+        """
+        delete_query = """
+            DELETE FROM Appointments
+            WHERE id = $1
+            RETURNING date
+        """
+        if replaced_appointment_id is not None:
+            replaced_appointment_id = int(replaced_appointment_id)
+
+        candidates = [
+            resource_id
+            for resource_id in self.working_hours.resources.active_ids
+            if self.working_hours.calendar_for(resource_id).is_open(
+                date, start_time, end_time
+            )
+            and not self.slot_holds.is_held_by_other(
+                hold_owner_id, date, start_time, end_time, resource_id
+            )
+        ]
+        held_resource_id = self.slot_holds.get_held_resource(
+            hold_owner_id, date, start_time, end_time
+        )
+        if held_resource_id in candidates:
+            candidates.remove(held_resource_id)
+            candidates.insert(0, held_resource_id)
+        if not candidates:
+            self.logger.debug(
+                "Время %s %s - %s не рабочее или удерживается другими пользователями.",
+                date,
+                start_time,
+                end_time,
+            )
+            return BookingStatus.SLOT_TAKEN
+
+        changed_dates = [date]
+        try:
+            async with self.db.transaction() as conn:
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock($1, $2)",
+                    BOOKING_LOCK_NAMESPACE,
+                    date.toordinal(),
+                )
+                busy = {
+                    row["resource_id"]
+                    for row in await conn.fetch(
+                        overlap_query,
+                        date,
+                        start_time,
+                        end_time,
+                        replaced_appointment_id,
+                    )
+                }
+                # Блокировка без ресурса занимает время всего салона.
+                resource_id = next(
+                    (
+                        resource_id
+                        for resource_id in candidates
+                        if resource_id not in busy
+                    ),
+                    None,
+                )
+                if None in busy or resource_id is None:
+                    self.logger.debug(
+                        "Время %s %s - %s уже занято, запись не создана.",
+                        date,
+                        start_time,
+                        end_time,
+                    )
+                    return BookingStatus.SLOT_TAKEN
+
+                if client_id is None:
+                    client_id = await self.clients.add_client(
+                        tg_id=tg_id,
+                        telephone=client_telephone,
+                        tg_first_name=tg_first_name,
+                        tg_username=tg_username,
+                        name=client_name,
+                        conn=conn,
+                    )
+
+                if replaced_appointment_id is not None:
+                    deleted = await conn.fetch(delete_query, replaced_appointment_id)
+                    changed_dates.extend(row["date"] for row in deleted)
+
+                appointment_id = await conn.fetchval(
+                    insert_query,
+                    client_id,
+                    procedure,
+                    date,
+                    start_time,
+                    end_time,
+                    resource_id,
+                )
+        except Exception as e:
+            self.logger.error(f"Ошибка при создании записи: {e}")
+            return BookingStatus.ERROR
+
+        self.availability_cache.invalidate(changed_dates)
+        if tg_id is not None:
+            self.clients.client_cache.invalidate(tg_id)
+        if hold_owner_id is not None:
+            self.slot_holds.release(hold_owner_id)
         self.logger.debug(
-            f"Параметры записи: Процедура: {procedure}, дата: {date}, время начала: {start_time}, клиент: {client_name}, телефон: {client_telephone}"
+            "Запись %s создана на ресурс %s. Параметры записи: Процедура: %s, дата: %s, время начала: %s, клиент: %s, телефон: %s",
+            appointment_id,
+            resource_id,
+            procedure,
+            date,
+            start_time,
+            client_name,
+            client_telephone,
         )
+        return BookingStatus.BOOKED
 
-    def get_appointments_by_date(self, date: date) -> Optional[List[Tuple]]:
-        """Получить все записи на конкретную дату."""
+    async def get_appointments_by_date(self, date: date) -> Optional[List[Tuple]]:
+        """Получить все записи на конкретную дату вместе с именем ресурса."""
 
         query = """
-            SELECT a.id, a.procedure, c.name, c.telephone, a.start_time, a.end_time
+            SELECT a.id, a.procedure, c.name, c.telephone, a.start_time, a.end_time,
+            r.name AS resource
             FROM Appointments a
             JOIN Clients c ON a.client_id = c.id
-            WHERE a.date = %s
-            ORDER BY a.start_time
+            LEFT JOIN Resources r ON a.resource_id = r.id
+            WHERE a.date = $1
+            ORDER BY a.start_time, a.resource_id
         """
-        result = self.db.fetch_data(query, date)
+        result = await self.db.fetch_data(query, date)
         return result
 
-    def get_all_appointments(self) -> Optional[List[Tuple]]:
+    async def get_all_appointments(self) -> Optional[List[Tuple]]:
         """Получить все записи из таблицы Appointments."""
 
         query = """
@@ -55,35 +216,37 @@ class Appointments:
             JOIN Clients c ON a.client_id = c.id
             ORDER BY a.date, a.start_time
         """
-        result = self.db.fetch_data(query)
+        result = await self.db.fetch_data(query)
         self.logger.debug(
             f"Запрос на получение всех записей из таблицы Appointments выполнен."
         )
         return result
 
-    def client_has_appointments(self, client_id: int) -> bool:
+    async def client_has_appointments(self, client_id: int) -> bool:
         """Проверить, есть ли у клиента записи."""
         query = """
-            SELECT COUNT(*) FROM Appointments WHERE client_id = %s
+            SELECT COUNT(*) FROM Appointments WHERE client_id = $1
         """
-        result = self.db.fetch_data(query, client_id)
+        result = await self.db.fetch_data(query, client_id)
         return result[0][0] > 0
 
-    def get_client_appointments(self, client_id: int) -> Optional[List[Tuple]]:
+    async def get_client_appointments(self, client_id: int) -> Optional[List[Tuple]]:
         """Получить все записи для клиента по ID."""
 
         query = """
             SELECT a.id, a.procedure, a.date, a.start_time, a.end_time
             FROM Appointments a
-            WHERE a.client_id = %s
+            WHERE a.client_id = $1
             ORDER BY a.date, a.start_time
         """
-        result = self.db.fetch_data(query, client_id)
-        self.logger.debug(f"Записи для клиента с ID {client_id}: {result}.")
+        result = await self.db.fetch_data(query, client_id)
+        self.logger.debug(
+            "Записи для клиента с ID %s: %d.", client_id, len(result or [])
+        )
 
         return result
 
-    def delete_appointment(self, appointment_id: int):
+    async def delete_appointment(self, appointment_id: int):
         """
         Удалить запись из таблицы Appointments по её ID.
 
@@ -92,15 +255,17 @@ class Appointments:
         """
         query = """
             DELETE FROM Appointments
-            WHERE id = %s
+            WHERE id = $1
+            RETURNING date
         """
         try:
-            self.db.execute_query(query, appointment_id)
+            deleted = await self.db.fetch_data(query, int(appointment_id))
+            self.availability_cache.invalidate(row["date"] for row in deleted or [])
             self.logger.debug(f"Запись с ID {appointment_id} успешно удалена.")
         except Exception as e:
             self.logger.error(f"Ошибка при удалении записи с ID {appointment_id}: {e}")
 
-    def get_client_data_by_appointment_id(self, appointment_id: int) -> Tuple:
+    async def get_client_data_by_appointment_id(self, appointment_id: int) -> Tuple:
         """
         Получить данные клиента по идентификатору записи в таблице Appointments.
         """
@@ -108,26 +273,7 @@ class Appointments:
             SELECT a.procedure, a.date, a.start_time, c.tg_username, c.telephone
             FROM Appointments a
             JOIN Clients c ON a.client_id = c.id
-            WHERE a.id = %s
+            WHERE a.id = $1
         """
-        result = self.db.fetch_data(query, appointment_id)[0]
-        return result
-
-    def reschedule_appointment(
-        self,
-        appointment_id: int,
-        client_name: str,
-        client_telephone: str,
-        procedure: str,
-        date: date,
-        start_time: time,
-        end_time: time,
-    ):
-        """
-        Перенести запись на другое время.
-        """
-
-        self.delete_appointment(appointment_id)
-        self.create_appointment(
-            client_name, client_telephone, procedure, date, start_time, end_time
-        )
+        result = await self.db.fetch_data(query, int(appointment_id))
+        return result[0]
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from datetime import date, datetime, time
+from typing import Dict, Iterable, List, Optional, Tuple
+from logger import setup_logger
+
+AvailabilityKey = Tuple[date, Optional[str]]
+Month = Tuple[int, int]
+
+
+class AvailabilityCache:
+    """Кэш доступных слотов по ключу (дата, процедура).
+
+    Рядом хранится индекс занятости: для даты — маски свободных минут
+    каждого ресурса. По нему слоты пересчитываются без запроса к базе данных,
+    когда часть времени ресурсов удерживают другие пользователи.
+    Записи и блокировки сбрасывают кэш только для затронутых дат,
+    при смене текущего дня кэш очищается полностью.
+    Для каждого месяца ведется версия, которая растет при сбросе любой его даты:
+    по ней кэши, построенные поверх месяца, проверяют, что он не менялся.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.entries: "OrderedDict[AvailabilityKey, List[Tuple[time, time]]]" = (
+            OrderedDict()
+        )
+        self.occupancy: "OrderedDict[date, Dict[int, int]]" = OrderedDict()
+        self.generation = 0
+        # Месяц -> значение generation при последнем сбросе его дат.
+        self.month_versions: Dict[Month, int] = {}
+        # Значение generation при последней полной очистке.
+        self.cleared_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.today = datetime.now().date()
+        self.logger = setup_logger(__name__)
+
+    def _check_day(self):
+        """Очистить кэш, если наступил новый день."""
+
+        today = datetime.now().date()
+        if today != self.today:
+            self.logger.debug("Наступил новый день %s, кэш доступности очищен.", today)
+            self.today = today
+            self.clear()
+
+    def get(
+        self, date_obj: date, procedure: Optional[str] = None
+    ) -> Optional[List[Tuple[time, time]]]:
+        """Получить слоты из кэша, None — если их нет в кэше."""
+
+        self._check_day()
+        key = (date_obj, procedure)
+        slots = self.entries.get(key)
+        if slots is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return list(slots)
+
+    def covers(
+        self, start_date: date, end_date: date, procedure: Optional[str] = None
+    ) -> bool:
+        """Проверить, что в кэше есть слоты для каждого дня диапазона."""
+
+        self._check_day()
+        return all(
+            (date.fromordinal(ordinal), procedure) in self.entries
+            for ordinal in range(start_date.toordinal(), end_date.toordinal() + 1)
+        )
+
+    def put(
+        self,
+        date_obj: date,
+        procedure: Optional[str],
+        slots: List[Tuple[time, time]],
+        generation: int,
+    ):
+        """Сохранить слоты в кэш.
+
+        generation — значение self.generation до запроса к базе данных:
+        если за время запроса кэш сбрасывался, результат может быть устаревшим
+        и не сохраняется."""
+
+        self._check_day()
+        if generation != self.generation:
+            return
+
+        key = (date_obj, procedure)
+        self.entries[key] = list(slots)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get_occupancy(self, date_obj: date) -> Optional[Dict[int, int]]:
+        """Получить маски свободных минут ресурсов за дату, None — если их нет в кэше."""
+
+        self._check_day()
+        masks = self.occupancy.get(date_obj)
+        if masks is None:
+            return None
+
+        self.occupancy.move_to_end(date_obj)
+        return dict(masks)
+
+    def put_occupancy(self, date_obj: date, masks: Dict[int, int], generation: int):
+        """Сохранить маски свободных минут ресурсов за дату, если кэш не сбрасывался."""
+
+        self._check_day()
+        if generation != self.generation:
+            return
+
+        self.occupancy[date_obj] = dict(masks)
+        self.occupancy.move_to_end(date_obj)
+        while len(self.occupancy) > self.max_size:
+            self.occupancy.popitem(last=False)
+
+    def invalidate(self, dates: Iterable[date]):
+        """Сбросить кэш для указанных дат."""
+
+        dates = set(dates)
+        self.generation += 1
+        for date_obj in dates:
+            self.month_versions[(date_obj.year, date_obj.month)] = self.generation
+        for key in [key for key in self.entries if key[0] in dates]:
+            del self.entries[key]
+        for date_obj in dates:
+            self.occupancy.pop(date_obj, None)
+        self.logger.debug("Кэш доступности сброшен для дат: %s", dates)
+
+    def clear(self):
+        """Полностью очистить кэш."""
+
+        self.generation += 1
+        self.cleared_version = self.generation
+        self.month_versions.clear()
+        self.entries.clear()
+        self.occupancy.clear()
+
+    def month_version(self, year: int, month: int) -> int:
+        """Получить версию месяца: она меняется при сбросе кэша для любой его даты."""
+
+        self._check_day()
+        return self.month_versions.get((year, month), self.cleared_version)
+
+    def stats(self) -> dict:
+        """Получить статистику попаданий в кэш."""
+
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
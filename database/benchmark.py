@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time as perf_time
+from datetime import date, time, timedelta
+from typing import Awaitable, Callable, Dict, List, Tuple
+import asyncpg
+import config
+from consts.constants import MONTHS_LOOKAHEAD, PROCEDURES, STEP
+from database import Database
+from database.occupancy import minutes_to_time, time_to_minutes
+from database.setup import DB_BACKENDS, setup_database
+from database.sqlite_database import SqliteDatabase
+
+# Схема, в которой создаются синтетические данные: рабочие таблицы бота не затрагиваются.
+BENCHMARK_SCHEMA = "schedule_benchmark"
+
+
+class ScheduleBenchmark:
+    """Замеры календарных запросов Schedule на синтетических данных салона.
+
+    Данные создаются в отдельной схеме PostgreSQL или в базе SQLite в памяти
+    (backend="sqlite"): resources мастеров, у каждого appointments_per_day записей
+    и blocked_per_day блокировок на каждый рабочий день за history_months месяцев
+    до сегодняшнего дня и MONTHS_LOOKAHEAD месяцев после него.
+    Для каждого сценария считаются задержка одного вызова и число запросов
+    к базе данных на вызов.
+    """
+
+    def __init__(
+        self,
+        appointments_per_day: int,
+        blocked_per_day: int,
+        history_months: int,
+        clients: int,
+        iterations: int,
+        schema: str = BENCHMARK_SCHEMA,
+        seed: int = 0,
+        backend: str = "postgres",
+        resources: int = 1,
+    ):
+        self.appointments_per_day = appointments_per_day
+        self.blocked_per_day = blocked_per_day
+        self.history_months = history_months
+        self.clients = clients
+        self.iterations = iterations
+        self.schema = schema
+        self.backend = backend
+        self.resources = resources
+        self.random = random.Random(seed)
+        self.database = None
+
+    async def connect(self):
+        """Создать схему для синтетических данных и применить в ней миграции."""
+
+        if self.backend == "sqlite":
+            self.database = await setup_database(SqliteDatabase())
+            return
+
+        connection_settings = {
+            "database": config.DB_CONFIG["dbname"],
+            "user": config.DB_CONFIG["user"],
+            "password": config.DB_CONFIG["password"],
+            "host": config.DB_CONFIG["host"],
+            "port": config.DB_CONFIG["port"],
+        }
+        conn = await asyncpg.connect(**connection_settings)
+        try:
+            await conn.execute(f'DROP SCHEMA IF EXISTS "{self.schema}" CASCADE')
+            await conn.execute(f'CREATE SCHEMA "{self.schema}"')
+        finally:
+            await conn.close()
+
+        db = Database()
+        db.connection_pool = await asyncpg.create_pool(
+            min_size=1,
+            max_size=10,
+            server_settings={"search_path": self.schema},
+            **connection_settings,
+        )
+        await db.migrate()
+        self.database = await setup_database(db)
+
+    async def close(self, keep: bool = False):
+        """Удалить схему с синтетическими данными и закрыть соединения."""
+
+        db = self.database["db"]
+        if not keep and self.backend == "postgres":
+            await db.execute_query(f'DROP SCHEMA IF EXISTS "{self.schema}" CASCADE')
+        await db.close()
+
+    def _day_intervals(
+        self, date_obj: date, count: int, durations: List[int], resource_id: int
+    ) -> List[Tuple[time, time]]:
+        """Подобрать до count непересекающихся интервалов в рабочих сменах ресурса."""
+
+        calendar = self.database["working_hours"].calendar_for(resource_id)
+        shifts = [
+            (time_to_minutes(start), time_to_minutes(end))
+            for start, end in calendar.shifts(date_obj)
+        ]
+        if not shifts:
+            return []
+
+        step = STEP // timedelta(minutes=1)
+        intervals = []
+        for _ in range(count * 10):
+            if len(intervals) == count:
+                break
+            duration = self.random.choice(durations)
+            work_start, work_end = self.random.choice(shifts)
+            if work_end - work_start < duration:
+                continue
+            start = work_start + step * self.random.randrange(
+                (work_end - work_start - duration) // step + 1
+            )
+            end = start + duration
+            if any(
+                start < busy_end and end > busy_start
+                for busy_start, busy_end in intervals
+            ):
+                continue
+            intervals.append((start, end))
+
+        return [
+            (minutes_to_time(start), minutes_to_time(end))
+            for start, end in sorted(intervals)
+        ]
+
+    async def seed(self) -> Dict[str, int]:
+        """Заполнить схему синтетическими ресурсами, клиентами, записями и блокировками."""
+
+        resources = self.database["resources"]
+        for number in range(len(resources.active_ids) + 1, self.resources + 1):
+            await resources.add_resource(f"Мастер {number}")
+
+        today = date.today()
+        start_date = today - timedelta(days=30 * self.history_months)
+        last_month = today.month + MONTHS_LOOKAHEAD - 1
+        end_date = date(
+            today.year + last_month // 12, last_month % 12 + 1, 1
+        ) - timedelta(days=1)
+
+        clients = [
+            (
+                f"+7900{client_id:07d}",
+                10_000_000 + client_id,
+                f"Клиент {client_id}",
+            )
+            for client_id in range(1, self.clients + 1)
+        ]
+        appointments = []
+        blocked_slots = []
+        procedures = list(PROCEDURES.items())
+        current_date = start_date
+        while current_date <= end_date:
+            for resource_id in resources.active_ids:
+                day_intervals = self._day_intervals(
+                    current_date,
+                    self.appointments_per_day + self.blocked_per_day,
+                    [duration for _, duration in procedures] + [30, 60],
+                    resource_id,
+                )
+                self.random.shuffle(day_intervals)
+                for start, end in day_intervals[: self.blocked_per_day]:
+                    blocked_slots.append((current_date, start, end, resource_id))
+                for start, end in day_intervals[self.blocked_per_day :]:
+                    procedure = self.random.choice(procedures)[0]
+                    appointments.append(
+                        (
+                            self.random.randint(1, self.clients),
+                            procedure,
+                            current_date,
+                            start,
+                            end,
+                            resource_id,
+                        )
+                    )
+            current_date += timedelta(days=1)
+
+        # Таблицы только что созданы, поэтому клиенты получают id от 1 до self.clients.
+        async with self.database["db"].transaction() as conn:
+            await conn.executemany(
+                "INSERT INTO Clients (telephone, tg_id, name) VALUES ($1, $2, $3)",
+                clients,
+            )
+            await conn.executemany(
+                """
+                INSERT INTO Appointments (client_id, procedure, date, start_time, end_time, resource_id)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                """,
+                appointments,
+            )
+            await conn.executemany(
+                "INSERT INTO BlockedSlots (date, start_time, end_time, resource_id) VALUES ($1, $2, $3, $4)",
+                blocked_slots,
+            )
+            for table in ("Resources", "Clients", "Appointments", "BlockedSlots"):
+                await conn.execute(f"ANALYZE {table}")
+
+        return {
+            "days": (end_date - start_date).days + 1,
+            "resources": len(resources.active_ids),
+            "clients": len(clients),
+            "appointments": len(appointments),
+            "blocked_slots": len(blocked_slots),
+        }
+
+    async def measure(
+        self, call: Callable[[], Awaitable[object]], cold: bool
+    ) -> Dict[str, float]:
+        """Замерить вызов iterations раз.
+
+        Если cold=True, перед каждым вызовом очищается кэш доступности,
+        и результат каждый раз считается по данным из базы."""
+
+        db = self.database["db"]
+        availability_cache = self.database["availability_cache"]
+        timings = []
+        db.query_stats.reset()
+        for _ in range(self.iterations):
+            if cold:
+                availability_cache.clear()
+            started = perf_time.perf_counter()
+            await call()
+            timings.append((perf_time.perf_counter() - started) * 1000)
+
+        queries = sum(stats.calls for stats in db.query_stats.statements.values())
+        return {
+            "avg_ms": statistics.fmean(timings),
+            "p50_ms": statistics.median(timings),
+            "p95_ms": percentile(timings, 0.95),
+            "max_ms": max(timings),
+            "queries_per_call": queries / len(timings),
+        }
+
+    async def run(self) -> List[Tuple[str, Dict[str, float]]]:
+        """Выполнить все сценарии и вернуть результаты замеров."""
+
+        schedule = self.database["schedule"]
+        today = date.today()
+        next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        target_month = (next_month.year, next_month.month)
+        target_date = next_month + timedelta(days=(2 - next_month.weekday()) % 7)
+        procedure = max(PROCEDURES, key=PROCEDURES.get)
+
+        occupied_slots = await schedule._get_occupied_slots(target_date, target_date)
+        blocked_by_day, occupied_by_day = occupied_slots
+        blocked = blocked_by_day.get(target_date, [])
+        occupied = occupied_by_day.get(target_date, [])
+
+        # Расчет дня в памяти по уже полученным записям и блокировкам,
+        # как в Schedule.get_availability для дня, которого нет в кэше.
+        async def free_intervals():
+            schedule._slots_from_masks(
+                schedule._resource_masks(target_date, blocked, occupied)
+            )
+
+        async def procedure_slots():
+            schedule._slots_from_masks(
+                schedule._resource_masks(target_date, blocked, occupied), procedure
+            )
+
+        scenarios = [
+            (
+                "get_available_dates(месяц, процедура), без кэша",
+                lambda: schedule.get_available_dates(procedure, target_month),
+                True,
+            ),
+            (
+                "get_available_dates(месяц, процедура), с кэшем",
+                lambda: schedule.get_available_dates(procedure, target_month),
+                False,
+            ),
+            (
+                "get_available_dates(месяц), без кэша",
+                lambda: schedule.get_available_dates(target_month=target_month),
+                True,
+            ),
+            (
+                "get_available_dates(30 дней), без кэша",
+                lambda: schedule.get_available_dates(procedure),
+                True,
+            ),
+            (
+                "get_available_time_slots(день, процедура), без кэша",
+                lambda: schedule.get_available_time_slots(target_date, procedure),
+                True,
+            ),
+            (
+                "get_available_time_slots(день, процедура), с кэшем",
+                lambda: schedule.get_available_time_slots(target_date, procedure),
+                False,
+            ),
+            ("свободные интервалы дня (расчет в памяти)", free_intervals, False),
+            ("слоты процедуры за день (расчет в памяти)", procedure_slots, False),
+        ]
+
+        results = []
+        for name, call, cold in scenarios:
+            results.append((name, await self.measure(call, cold)))
+        return results
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Перцентиль по отсортированной выборке (ближайший ранг)."""
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def format_results(
+    dataset: Dict[str, int], results: List[Tuple[str, Dict[str, float]]]
+) -> str:
+    """Сформировать текстовый отчет по результатам замеров."""
+
+    lines = [
+        f"Данные: дней {dataset['days']}, ресурсов {dataset['resources']}, клиентов {dataset['clients']}, "
+        f"записей {dataset['appointments']}, блокировок {dataset['blocked_slots']}",
+        "",
+        f"{'Сценарий':<55} {'среднее':>9} {'p50':>9} {'p95':>9} {'макс.':>9} {'запросов':>9}",
+    ]
+    for name, result in results:
+        lines.append(
+            f"{name:<55} {result['avg_ms']:>7.3f}мс {result['p50_ms']:>7.3f}мс "
+            f"{result['p95_ms']:>7.3f}мс {result['max_ms']:>7.3f}мс "
+            f"{result['queries_per_call']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+async def main(args: argparse.Namespace):
+    if not args.debug_log:
+        logging.disable(logging.INFO)
+
+    benchmark = ScheduleBenchmark(
+        appointments_per_day=args.appointments_per_day,
+        blocked_per_day=args.blocked_per_day,
+        history_months=args.history_months,
+        clients=args.clients,
+        iterations=args.iterations,
+        schema=args.schema,
+        seed=args.seed,
+        backend=args.backend,
+        resources=args.resources,
+    )
+    await benchmark.connect()
+    try:
+        dataset = await benchmark.seed()
+        results = await benchmark.run()
+        print(format_results(dataset, results))
+    finally:
+        await benchmark.close(keep=args.keep)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Замеры календарных запросов расписания на синтетических данных."
+    )
+    parser.add_argument(
+        "--appointments-per-day", type=int, default=6, help="записей на рабочий день"
+    )
+    parser.add_argument(
+        "--blocked-per-day", type=int, default=1, help="блокировок на рабочий день"
+    )
+    parser.add_argument(
+        "--history-months",
+        type=int,
+        default=6,
+        help="месяцев истории до сегодняшнего дня",
+    )
+    parser.add_argument("--clients", type=int, default=500, help="число клиентов")
+    parser.add_argument(
+        "--resources", type=int, default=1, help="число мастеров в салоне"
+    )
+    parser.add_argument(
+        "--iterations", type=int, default=50, help="число вызовов в каждом сценарии"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=DB_BACKENDS,
+        default=getattr(config, "DB_BACKEND", "postgres"),
+        help="база данных: postgres или sqlite в памяти",
+    )
+    parser.add_argument(
+        "--schema", default=BENCHMARK_SCHEMA, help="схема для синтетических данных"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="начальное значение генератора"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="не удалять схему с данными после замеров"
+    )
+    parser.add_argument(
+        "--debug-log",
+        action="store_true",
+        help="оставить отладочное журналирование включенным во время замеров",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -1,114 +1,129 @@
 from datetime import date, time
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from logger import setup_logger
 from database import Database
+from database.appointments import BOOKING_LOCK_NAMESPACE
+from database.availability_cache import AvailabilityCache
 
 
 class BlockedSlots:
 
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, availability_cache: AvailabilityCache):
         self.db = db
+        self.availability_cache = availability_cache
         self.logger = setup_logger(__name__)
 
-    def block_day(self, block_date: date) -> bool:
-        """Блокировать весь день."""
-        try:
-            self.db.execute_query(
-                """
-                    DELETE FROM BlockedSlots WHERE date = %s;
-                """,
-                block_date,
-            )
+    async def block_day(
+        self, block_date: date, resource_id: Optional[int] = None
+    ) -> bool:
+        """Блокировать весь день: без resource_id — для всего салона, иначе для ресурса.
 
-            self.db.execute_query(
-                """
-                    INSERT INTO BlockedSlots (date, start_time, end_time)
-                    VALUES (%s, '00:00:00', '23:59:59');
-                """,
-                block_date,
-            )
-            self.logger.debug(f"День {block_date.strftime('%d.%m.%Y')} заблокирован.")
-            return True
-        except:
-            self.logger.debug(
-                f"Ошибка при блокировке дня {block_date.strftime('%d.%m.%Y')}."
+        Прежние блокировки дня заменяются одной транзакцией под той же блокировкой даты,
+        что и запись на процедуру."""
+        try:
+            async with self.db.transaction() as conn:
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock($1, $2)",
+                    BOOKING_LOCK_NAMESPACE,
+                    block_date.toordinal(),
+                )
+                await conn.execute(
+                    """
+                        DELETE FROM BlockedSlots WHERE date = $1 AND resource_id IS NOT DISTINCT FROM $2;
+                    """,
+                    block_date,
+                    resource_id,
+                )
+                await conn.execute(
+                    """
+                        INSERT INTO BlockedSlots (date, start_time, end_time, resource_id)
+                        VALUES ($1, '00:00:00', '23:59:59', $2);
+                    """,
+                    block_date,
+                    resource_id,
+                )
+        except Exception as e:
+            self.logger.error(
+                f"Ошибка при блокировке дня {block_date.strftime('%d.%m.%Y')}: {e}"
             )
             return False
 
-    def block_time_slot(
-        self, block_date: date, start_time: time, end_time: time
+        self.availability_cache.invalidate([block_date])
+        self.logger.debug(f"День {block_date.strftime('%d.%m.%Y')} заблокирован.")
+        return True
+
+    async def block_time_slot(
+        self,
+        block_date: date,
+        start_time: time,
+        end_time: time,
+        resource_id: Optional[int] = None,
     ) -> bool:
         """Блокировать временной слот, объединяя при необходимости существующие слоты.
 
+        Без resource_id слот блокируется для всего салона, иначе только для ресурса,
+        объединяются только блокировки того же ресурса.
+        Поиск пересечений, удаление объединяемых слотов и вставка выполняются
+        одной транзакцией под той же блокировкой даты, что и запись на процедуру.
+
         Возвращает:
             True — если слот успешно заблокирован.
             False — если произошла ошибка.
         """
         try:
-            existing_slots = self.db.execute_query(
-                """
-                    SELECT * FROM BlockedSlots 
-                WHERE date = %s AND (
-                    (start_time < %s AND end_time > %s) OR
-                    (start_time < %s AND end_time > %s) OR
-                    (start_time >= %s AND end_time <= %s)
-                );
-                """,
-                block_date,
-                end_time,
-                end_time,
-                start_time,
-                start_time,
-                start_time,
-                end_time,
-            )
-
-            if existing_slots:
-                new_start_time = min(
-                    start_time, min(slot["start_time"] for slot in existing_slots)
+            async with self.db.transaction() as conn:
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock($1, $2)",
+                    BOOKING_LOCK_NAMESPACE,
+                    block_date.toordinal(),
                 )
-                new_end_time = max(
-                    end_time, max(slot["end_time"] for slot in existing_slots)
+                existing_slots = await conn.fetch(
+                    """
+                        SELECT * FROM BlockedSlots 
+                    WHERE date = $1 AND (
+                        (start_time < $2 AND end_time > $3) OR
+                        (start_time < $4 AND end_time > $5) OR
+                        (start_time >= $6 AND end_time <= $7)
+                    ) AND resource_id IS NOT DISTINCT FROM $8;
+                    """,
+                    block_date,
+                    end_time,
+                    end_time,
+                    start_time,
+                    start_time,
+                    start_time,
+                    end_time,
+                    resource_id,
                 )
 
-                for slot in existing_slots:
-                    self.db.execute_query(
-                        """
-                            DELETE FROM BlockedSlots WHERE id = %s;
-                        """,
-                        slot["id"],
+                new_start_time, new_end_time = start_time, end_time
+                if existing_slots:
+                    new_start_time = min(
+                        start_time, min(slot["start_time"] for slot in existing_slots)
+                    )
+                    new_end_time = max(
+                        end_time, max(slot["end_time"] for slot in existing_slots)
                     )
 
-                self.db.execute_query(
+                    for slot in existing_slots:
+                        await conn.execute(
+                            """
+                                DELETE FROM BlockedSlots WHERE id = $1;
+                            """,
+                            slot["id"],
+                        )
+
+                await conn.execute(
                     """
-                        INSERT INTO BlockedSlots (date, start_time, end_time)
-                        VALUES (%s, %s, %s);
+                        INSERT INTO BlockedSlots (date, start_time, end_time, resource_id)
+                        VALUES ($1, $2, $3, $4);
                     """,
                     block_date,
                     new_start_time,
                     new_end_time,
+                    resource_id,
                 )
 
-                self.logger.debug(
-                    f"Слот {block_date.strftime('%d.%m.%Y')} {new_start_time.strftime('%H:%M')} - {new_end_time.strftime('%H:%M')} заблокирован (объединено)."
-                )
-            else:
-                self.db.execute_query(
-                    """
-                        INSERT INTO BlockedSlots (date, start_time, end_time)
-                        VALUES (%s, %s, %s);
-                    """,
-                    block_date,
-                    start_time,
-                    end_time,
-                )
-
-                self.logger.debug(
-                    f"Слот {block_date.strftime('%d.%m.%Y')} {start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')} заблокирован (пересечений не было, новый слот)."
-                )
-
-            return True
-
         except Exception as e:
             # Логируем ошибку
             self.logger.error(
@@ -116,12 +131,24 @@ class BlockedSlots:
             )
             return False
 
-    def delete_blocked_slot(self, slot_id: int):
+        if existing_slots:
+            self.logger.debug(
+                f"Слот {block_date.strftime('%d.%m.%Y')} {new_start_time.strftime('%H:%M')} - {new_end_time.strftime('%H:%M')} заблокирован (объединено)."
+            )
+        else:
+            self.logger.debug(
+                f"Слот {block_date.strftime('%d.%m.%Y')} {start_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')} заблокирован (пересечений не было, новый слот)."
+            )
+
+        self.availability_cache.invalidate([block_date])
+        return True
+
+    async def delete_blocked_slot(self, slot_id: int):
         """Удалить заблокированный слот."""
 
-        slot = self.db.execute_query(
+        slot = await self.db.fetch_data(
             """
-                SELECT id FROM BlockedSlots WHERE id = %s;
+                SELECT id FROM BlockedSlots WHERE id = $1;
             """,
             slot_id,
         )
@@ -129,31 +156,37 @@ class BlockedSlots:
             self.logger.warning(f"Запись с id={slot_id} не найдена.")
             return
 
-        self.db.execute_query(
+        deleted = await self.db.fetch_data(
             """
-                DELETE FROM BlockedSlots WHERE id = %s;
+                DELETE FROM BlockedSlots WHERE id = $1 RETURNING date;
             """,
             slot_id,
         )
+        self.availability_cache.invalidate(row["date"] for row in deleted or [])
         self.logger.debug(f"Запись с id={slot_id} удалена.")
 
-    def get_blocked_slots(self, date: date) -> List[Tuple[date, time, time]]:
-        """Получить все заблокированные слоты для даты."""
+    async def get_blocked_slots(
+        self, date: date, resource_id: Optional[int] = None
+    ) -> List[Tuple[date, time, time]]:
+        """Получить все заблокированные слоты салона или ресурса для даты."""
         query = """
             SELECT start_time, end_time 
             FROM BlockedSlots 
-            WHERE date = %s 
+            WHERE date = $1 AND resource_id IS NOT DISTINCT FROM $2
             ORDER BY start_time;
         """
-        blocked_intervals = self.db.fetch_data(query, date)
+        blocked_intervals = await self.db.fetch_data(query, date, resource_id)
         return blocked_intervals
 
-    def is_day_blocked(self, date_obj: date) -> bool:
-        """Проверить, заблокирован ли день."""
+    async def is_day_blocked(
+        self, date_obj: date, resource_id: Optional[int] = None
+    ) -> bool:
+        """Проверить, заблокирован ли день для всего салона или для ресурса."""
         query = """
             SELECT start_time, end_time 
             FROM BlockedSlots 
-            WHERE date = %s AND start_time = '00:00:00' AND end_time = '23:59:59';
+            WHERE date = $1 AND start_time = '00:00:00' AND end_time = '23:59:59'
+            AND resource_id IS NOT DISTINCT FROM $2;
         """
-        blocked_slots = self.db.fetch_data(query, date_obj)
+        blocked_slots = await self.db.fetch_data(query, date_obj, resource_id)
         return bool(blocked_slots)
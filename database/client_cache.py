@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import asyncpg
+from logger import setup_logger
+
+
+class ClientCache:
+    """LRU-кэш записей клиентов по tg_id с ограниченным временем жизни.
+
+    Заполняется при чтении, а методы Clients, изменяющие данные клиента,
+    обновляют или сбрасывают его записи сразу после запроса к базе данных.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: timedelta = timedelta(minutes=30)):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[int, Tuple[asyncpg.Record, datetime]]" = (
+            OrderedDict()
+        )
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.logger = setup_logger(__name__)
+
+    def get(self, tg_id: int) -> Optional[asyncpg.Record]:
+        """Получить запись клиента из кэша, None — если ее нет или она устарела."""
+
+        entry = self.entries.get(tg_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        client, expires_at = entry
+        if expires_at <= datetime.now():
+            del self.entries[tg_id]
+            self.expired += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(tg_id)
+        self.hits += 1
+        return client
+
+    def put(self, client: asyncpg.Record, generation: Optional[int] = None):
+        """Сохранить запись клиента в кэш.
+
+        generation — значение self.generation до чтения из базы данных:
+        если за время чтения данные клиентов менялись, запись не сохраняется.
+        Без generation запись считается результатом изменения данных (write-through)."""
+
+        if generation is None:
+            self.generation += 1
+        elif generation != self.generation:
+            return
+        if client["tg_id"] is None:
+            return
+
+        self.entries[client["tg_id"]] = (client, datetime.now() + self.ttl)
+        self.entries.move_to_end(client["tg_id"])
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, tg_id: Optional[int]):
+        """Сбросить запись клиента."""
+
+        self.generation += 1
+        if tg_id is not None:
+            self.entries.pop(tg_id, None)
+
+    def stats(self) -> dict:
+        """Получить статистику попаданий в кэш."""
+
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
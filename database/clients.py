@@ -1,61 +1,102 @@
 from logger import setup_logger
 from database import Database
 from typing import List, Optional, Tuple
+import asyncpg
+from database.availability_cache import AvailabilityCache
+from database.client_cache import ClientCache
+
+CLIENT_COLUMNS = "id, telephone, tg_id, tg_first_name, tg_username, name"
 
 
 class Clients:
 
-    def __init__(self, db: Database):
+    def __init__(
+        self,
+        db: Database,
+        client_cache: ClientCache,
+        availability_cache: AvailabilityCache,
+    ):
         self.db = db
+        self.client_cache = client_cache
+        self.availability_cache = availability_cache
         self.logger = setup_logger(__name__)
 
-    def add_client(
+    async def add_client(
         self,
         tg_id: int,
         telephone: str,
         tg_first_name: Optional[str] = None,
         tg_username: Optional[str] = None,
         name: Optional[str] = None,
-    ):
-        """Добавить или обновить клиента."""
-        query = """
+        conn: Optional[asyncpg.Connection] = None,
+    ) -> Optional[int]:
+        """Добавить или обновить клиента и вернуть его ID одним запросом.
+
+        Если передано соединение conn, запрос выполняется в нем (например, внутри
+        транзакции записи), а ошибка пробрасывается, чтобы транзакция откатилась.
+        В этом случае кэш клиента только сбрасывается, так как транзакция еще может
+        откатиться: вызывающий код должен сбросить его еще раз после фиксации."""
+        query = f"""
             INSERT INTO Clients (telephone, tg_id, tg_first_name, tg_username, name)
-            VALUES (%s, %s, %s, %s, %s)
+            VALUES ($1, $2, $3, $4, $5)
             ON CONFLICT (tg_id) DO UPDATE
             SET
                 telephone = EXCLUDED.telephone,
                 tg_first_name = EXCLUDED.tg_first_name,
                 tg_username = EXCLUDED.tg_username,
                 name = EXCLUDED.name
+            RETURNING {CLIENT_COLUMNS}
         """
+        args = (telephone, tg_id, tg_first_name, tg_username, name)
 
         try:
-            self.db.execute_query(
-                query, telephone, tg_id, tg_first_name, tg_username, name
-            )
+            if conn:
+                client = await conn.fetchrow(query, *args)
+                self.client_cache.invalidate(tg_id)
+            else:
+                client = await self.db.fetch_row(query, *args)
+                if client:
+                    self.client_cache.put(client)
+            client_id = client["id"] if client else None
             self.logger.debug(f"Клиент с tg_id {tg_id} добавлен или обновлен.")
+            return client_id
         except Exception as e:
             self.logger.error(f"Ошибка при добавлении клиента: {e}")
+            if conn:
+                raise
+            return None
 
-    def delete_client_by_id(self, client_id: int) -> bool:
+    async def delete_client_by_id(self, client_id: int) -> bool:
         """
-        Удалить клиента по его ID.
+        Удалить клиента по его ID вместе с его записями.
         Возвращает True, если клиент был удален, иначе False.
-        """
-        query = "DELETE FROM Clients WHERE id = %s"
 
+        Записи удаляются явно, а не каскадом, чтобы получить их даты
+        и сбросить для них кэш доступности.
+        """
         try:
-            self.db.execute_query(query, client_id)
-            self.logger.debug(f"Клиент с ID {client_id} успешно удален.")
-            return True
+            async with self.db.transaction() as conn:
+                appointments = await conn.fetch(
+                    "DELETE FROM Appointments WHERE client_id = $1 RETURNING date",
+                    client_id,
+                )
+                deleted = await conn.fetchrow(
+                    "DELETE FROM Clients WHERE id = $1 RETURNING tg_id", client_id
+                )
         except Exception as e:
             self.logger.error(f"Ошибка при удалении клиента с ID {client_id}: {e}")
             return False
 
-    def get_client_by_telephone(self, telephone: str) -> Optional[List[Tuple]]:
+        if appointments:
+            self.availability_cache.invalidate(row["date"] for row in appointments)
+        self.client_cache.invalidate(deleted["tg_id"] if deleted else None)
+        self.logger.debug(f"Клиент с ID {client_id} успешно удален.")
+        return True
+
+    async def get_client_by_telephone(self, telephone: str) -> Optional[List[Tuple]]:
         """Получить данные о клиенте по его номеру телефона."""
-        query = "SELECT * FROM Clients WHERE telephone = %s"
-        clients = self.db.fetch_data(query, telephone)
+        query = "SELECT * FROM Clients WHERE telephone = $1"
+        clients = await self.db.fetch_data(query, telephone)
         if clients:
             self.logger.debug(
                 f"Найдено клиентов с телефоном {telephone}: {len(clients)}"
@@ -65,10 +106,10 @@ class Clients:
             self.logger.debug(f"Клиент с телефоном {telephone} не найден.")
             return None
 
-    def get_client_by_id(self, id: int) -> Optional[List[Tuple]]:
+    async def get_client_by_id(self, id: int) -> Optional[List[Tuple]]:
         """Получить данные о клиенте по его ID."""
-        query = "SELECT id, name, telephone, tg_username FROM Clients WHERE id = %s"
-        clients = self.db.fetch_data(query, id)
+        query = "SELECT id, name, telephone, tg_username FROM Clients WHERE id = $1"
+        clients = await self.db.fetch_data(query, id)
         if clients:
             self.logger.debug(f"Найдено клиентов с ID {id}: {len(clients)}")
             return clients
@@ -76,10 +117,10 @@ class Clients:
             self.logger.debug(f"Клиент с ID {id} не найден.")
             return None
 
-    def get_client_id_by_telephone(self, telephone: str) -> Optional[int]:
+    async def get_client_id_by_telephone(self, telephone: str) -> Optional[int]:
         """Получить ID клиента по его номеру телефона."""
-        query = "SELECT id FROM Clients WHERE telephone = %s"
-        client_ids = self.db.fetch_data(query, telephone)
+        query = "SELECT id FROM Clients WHERE telephone = $1"
+        client_ids = await self.db.fetch_data(query, telephone)
         if client_ids:
             if len(client_ids) > 1:
                 self.logger.warning(
@@ -91,19 +132,34 @@ class Clients:
             self.logger.debug(f"Клиент с телефоном {telephone} не найден.")
             return None
 
-    def get_client_id_by_tg_id(self, tg_id: int) -> Optional[int]:
-        """Получить ID клиента по его tg_id."""
-        if not self.client_is_registered_by_tg_id(tg_id):
+    async def get_client_by_tg_id(self, tg_id: int) -> Optional[asyncpg.Record]:
+        """Получить полную запись клиента по его tg_id одним запросом.
+
+        Запись берется из кэша клиентов, если она там есть."""
+        client = self.client_cache.get(tg_id)
+        if client:
+            return client
+
+        query = f"SELECT {CLIENT_COLUMNS} FROM Clients WHERE tg_id = $1"
+        generation = self.client_cache.generation
+        client = await self.db.fetch_row(query, tg_id)
+        if client:
+            self.client_cache.put(client, generation)
+        else:
             self.logger.debug(f"Клиент с tg_id {tg_id} не найден.")
-            return None
+        return client
 
-        client_id = self.db.fetch_data("SELECT id FROM Clients WHERE tg_id = %s", tg_id)
-        return client_id if client_id else None
+    async def get_client_id_by_tg_id(self, tg_id: int) -> Optional[int]:
+        """Получить ID клиента по его tg_id."""
+        client = await self.get_client_by_tg_id(tg_id)
+        return client["id"] if client else None
 
-    def update_client_phone_by_phone(self, old_telephone: str, new_telephone: str):
+    async def update_client_phone_by_phone(
+        self, old_telephone: str, new_telephone: str
+    ):
         """Обновить телефон клиента (получение данных по номеру телефона)."""
-        query = "SELECT id FROM Clients WHERE telephone = %s"
-        client_ids = self.db.fetch_data(query, old_telephone)
+        query = "SELECT id FROM Clients WHERE telephone = $1"
+        client_ids = await self.db.fetch_data(query, old_telephone)
 
         if not client_ids:
             self.logger.debug(f"Клиент с телефоном {old_telephone} не найден.")
@@ -115,22 +171,25 @@ class Clients:
             )
             return
 
-    def update_client_phone_by_tg_id(self, tg_id: int, new_telephone: str):
+    async def update_client_phone_by_tg_id(self, tg_id: int, new_telephone: str):
         """Обновить телефон клиента (получение данных по tg id)."""
-        if not self.client_is_registered_by_tg_id(tg_id):
+        query = f"UPDATE Clients SET telephone = $1 WHERE tg_id = $2 RETURNING {CLIENT_COLUMNS}"
+        client = await self.db.fetch_row(query, new_telephone, tg_id)
+        if not client:
+            self.client_cache.invalidate(tg_id)
             self.logger.debug(f"Клиент с tg_id {tg_id} не найден.")
             return
 
-        query = "UPDATE Clients SET telephone = %s WHERE tg_id = %s"
-        self.db.execute_query(query, new_telephone, tg_id)
+        self.client_cache.put(client)
+
         self.logger.debug(
             f"Телефон клиента с tg id {tg_id} изменен на {new_telephone}."
         )
 
-    def update_client_name_by_phone(self, telephone: str, new_name: str):
+    async def update_client_name_by_phone(self, telephone: str, new_name: str):
         """Обновить имя клиента (получение данных по номеру телефона)."""
-        query = "SELECT id FROM Clients WHERE telephone = %s"
-        client_ids = self.db.fetch_data(query, telephone)
+        query = "SELECT id FROM Clients WHERE telephone = $1"
+        client_ids = await self.db.fetch_data(query, telephone)
 
         if not client_ids:
             self.logger.debug(f"Клиент с телефоном {telephone} не найден.")
@@ -143,47 +202,43 @@ class Clients:
             return
 
         # Обновляем имя для одного клиента
-        query = "UPDATE Clients SET name = %s WHERE id = %s"
-        self.db.execute_query(query, new_name, client_ids[0][0])
+        query = f"UPDATE Clients SET name = $1 WHERE id = $2 RETURNING {CLIENT_COLUMNS}"
+        client = await self.db.fetch_row(query, new_name, client_ids[0][0])
+        if client:
+            self.client_cache.put(client)
         self.logger.debug(
             f"Имя клиента с телефоном {telephone} изменено на {new_name}."
         )
 
-    def update_client_name_by_tg_id(self, tg_id: int, new_name: str):
+    async def update_client_name_by_tg_id(self, tg_id: int, new_name: str):
         """Обновить имя клиента (получение данных по tg_id)."""
-        if not self.client_is_registered_by_tg_id(tg_id):
+        query = (
+            f"UPDATE Clients SET name = $1 WHERE tg_id = $2 RETURNING {CLIENT_COLUMNS}"
+        )
+        client = await self.db.fetch_row(query, new_name, tg_id)
+        if not client:
+            self.client_cache.invalidate(tg_id)
             self.logger.debug(f"Клиент с tg_id {tg_id} не найден.")
             return
 
-        query = "UPDATE Clients SET name = %s WHERE tg_id = %s"
-        self.db.execute_query(query, new_name, tg_id)
+        self.client_cache.put(client)
+
         self.logger.debug(f"Имя клиента с tg id {tg_id} изменено на {new_name}.")
 
-    def get_client_name_by_tg_id(self, tg_id: int) -> Optional[str]:
+    async def get_client_name_by_tg_id(self, tg_id: int) -> Optional[str]:
         """Получить имя клиента по его tg_id."""
-        if not self.client_is_registered_by_tg_id(tg_id):
-            self.logger.debug(f"Клиент с tg_id {tg_id} не найден.")
-            return None
-        client = self.db.fetch_data("SELECT name FROM Clients WHERE tg_id = %s", tg_id)
-
-        self.logger.debug(f"Имя клиента с tg_id {tg_id}: {client[0][0]}.")
-        return client[0][0]
+        client = await self.get_client_by_tg_id(tg_id)
+        return client["name"] if client else None
 
-    def get_client_phone_by_tg_id(self, tg_id: int) -> str:
+    async def get_client_phone_by_tg_id(self, tg_id: int) -> Optional[str]:
         """Получить телефон клиента по его tg_id."""
-        if not self.client_is_registered_by_tg_id(tg_id):
-            self.logger.debug(f"Клиент с tg_id {tg_id} не найден.")
-            return None
-        phone = self.db.fetch_data(
-            "SELECT telephone FROM Clients WHERE tg_id = %s", tg_id
-        )
-        self.logger.debug(f"Телефон клиента с tg_id {tg_id}: {phone[0][0]}.")
-        return phone[0][0]
+        client = await self.get_client_by_tg_id(tg_id)
+        return client["telephone"] if client else None
 
-    def get_client_name_by_telephone(self, telephone: str) -> Optional[str]:
+    async def get_client_name_by_telephone(self, telephone: str) -> Optional[str]:
         """Получить имя клиента по его телефону."""
-        query = "SELECT name FROM Clients WHERE telephone = %s"
-        clients = self.db.fetch_data(query, telephone)
+        query = "SELECT name FROM Clients WHERE telephone = $1"
+        clients = await self.db.fetch_data(query, telephone)
         if clients:
             if len(clients) > 1:
                 self.logger.warning(
@@ -195,57 +250,54 @@ class Clients:
             self.logger.debug(f"Клиент с телефоном {telephone} не найден.")
             return None
 
-    def client_is_registered_by_phone(self, telephone: str) -> bool:
+    async def client_is_registered_by_phone(self, telephone: str) -> bool:
         """Проверить, существует ли в базе данных клиент с таким телефоном."""
-        query = "SELECT EXISTS(SELECT 1 FROM Clients WHERE telephone = %s)"
-        result = self.db.fetch_data(query, telephone)
+        query = "SELECT EXISTS(SELECT 1 FROM Clients WHERE telephone = $1)"
+        result = await self.db.fetch_data(query, telephone)
         if result and result[0][0]:
             return True
         else:
             self.logger.debug(f"Клиент с телефоном {telephone} не найден.")
             return False
 
-    def client_is_registered_by_tg_id(self, tg_id: int) -> bool:
+    async def client_is_registered_by_tg_id(self, tg_id: int) -> bool:
         """Проверить, существует ли в базе данных клиент с таким tg_id."""
-        query = "SELECT EXISTS(SELECT 1 FROM Clients WHERE tg_id = %s)"
-        result = self.db.fetch_data(query, tg_id)
-        if result and result[0][0]:
-            return True
-        else:
-            self.logger.debug(f"Клиент с tg_id {tg_id} не найден.")
-            return False
+        return await self.get_client_by_tg_id(tg_id) is not None
 
-    def get_client_name_by_id(self, id: int) -> Optional[str]:
+    async def get_client_name_by_id(self, id: int) -> Optional[str]:
         """Получить имя клиента по его ID."""
-        query = "SELECT name FROM Clients WHERE id = %s"
-        client = self.db.fetch_data(query, id)
+        query = "SELECT name FROM Clients WHERE id = $1"
+        client = await self.db.fetch_data(query, id)
         if client:
             return client[0]
         else:
             self.logger.debug(f"Клиент с ID {id} не найден.")
             return None
 
-    def get_client_phone_by_id(self, id: int) -> Optional[str]:
+    async def get_client_phone_by_id(self, id: int) -> Optional[str]:
         """Получить телефон клиента по его ID."""
-        query = "SELECT telephone FROM Clients WHERE id = %s"
-        client = self.db.fetch_data(query, id)
+        query = "SELECT telephone FROM Clients WHERE id = $1"
+        client = await self.db.fetch_data(query, id)
         if client:
             return client[0]
         else:
             self.logger.debug(f"Клиент с ID {id} не найден.")
             return None
 
-    def update_client(self, client_id: int, name: str, telephone: str):
+    async def update_client(self, client_id: int, name: str, telephone: str):
         """Обновить данные клиента."""
-        query = """
+        query = f"""
             UPDATE Clients
-            SET name = %s, telephone = %s
-            WHERE id = %s
+            SET name = $1, telephone = $2
+            WHERE id = $3
+            RETURNING {CLIENT_COLUMNS}
         """
-        self.db.execute_query(query, name, telephone, client_id)
+        client = await self.db.fetch_row(query, name, telephone, client_id)
+        if client:
+            self.client_cache.put(client)
 
-    def fetch_all_clients(self) -> Optional[List[Tuple]]:
+    async def fetch_all_clients(self) -> Optional[List[Tuple]]:
         """Получить данные обо всех клиентах."""
         query = "SELECT id, name, telephone, tg_username FROM Clients"
-        result = self.db.fetch_data(query)
+        result = await self.db.fetch_data(query)
         return result
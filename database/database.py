@@ -1,131 +1,210 @@
-from psycopg2 import pool
+import asyncpg
 import config
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from database.migrator import Migrator
+from database.query_stats import QueryStats
+from utils.metrics import add_db_time
 from logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Режимы журналирования результатов SELECT-запросов:
+# "full" — результат целиком, "count" — только число строк, "off" — не журналировать.
+QUERY_LOG_MODES = ("full", "count", "off")
+
+
+class TransactionConnection:
+    """Соединение внутри Database.transaction.
+
+    Запросы учитываются в статистике запросов и метриках обработчика так же,
+    как запросы fetch_data и execute_query. elapsed — суммарное время запросов."""
+
+    def __init__(self, db: "Database", connection):
+        self.db = db
+        self.connection = connection
+        self.elapsed = 0.0
+
+    async def _run(self, method, query, args, count_rows):
+        started = time.perf_counter()
+        try:
+            result = await method(query, *args)
+        except Exception:
+            self.elapsed += time.perf_counter() - started
+            self.db._record_query(query, started, error=True)
+            raise
+        self.elapsed += time.perf_counter() - started
+        self.db._record_query(query, started, count_rows(result))
+        return result
+
+    async def fetch(self, query, *args):
+        return await self._run(self.connection.fetch, query, args, len)
+
+    async def fetchrow(self, query, *args):
+        return await self._run(
+            self.connection.fetchrow, query, args, lambda row: int(row is not None)
+        )
+
+    async def fetchval(self, query, *args):
+        return await self._run(
+            self.connection.fetchval, query, args, lambda value: int(value is not None)
+        )
+
+    async def execute(self, query, *args):
+        return await self._run(self.connection.execute, query, args, lambda _: 0)
+
+    async def executemany(self, query, args):
+        return await self._run(self.connection.executemany, query, (args,), lambda _: 0)
+
 
 class Database:
-    """Класс для работы с базой данных."""
+    """Класс для асинхронной работы с базой данных."""
 
     def __init__(self):
         self.connection_pool = None
+        self.query_stats = QueryStats()
+        self.query_log_mode = getattr(config, "QUERY_LOG_MODE", "count")
+        self.query_log_sample_rate = float(getattr(config, "QUERY_LOG_SAMPLE_RATE", 1.0))
+        if self.query_log_mode not in QUERY_LOG_MODES:
+            logger.warning(
+                f"Неизвестный режим журналирования запросов {self.query_log_mode}, используется count."
+            )
+            self.query_log_mode = "count"
+
+    async def connect(self, migrate: bool = True):
+        """Установить соединение с базой данных и создать пул соединений.
 
-    def connect(self):
-        """Установить соединение с базой данных и создать пул соединений."""
+        Если migrate=True, сразу применяются еще не примененные миграции схемы.
+        Повторный вызов для уже подключенной базы данных ничего не делает."""
+
+        if self.connection_pool:
+            return
 
         try:
-            self.connection_pool = pool.SimpleConnectionPool(
-                minconn=1, maxconn=10, **config.DB_CONFIG
+            self.connection_pool = await asyncpg.create_pool(
+                min_size=1,
+                max_size=10,
+                database=config.DB_CONFIG["dbname"],
+                user=config.DB_CONFIG["user"],
+                password=config.DB_CONFIG["password"],
+                host=config.DB_CONFIG["host"],
+                port=config.DB_CONFIG["port"],
             )
             logger.debug("Соединение с базой данных установлено.")
-            self.create_tables()
+            if migrate:
+                await self.migrate()
         except Exception as e:
             logger.error(f"Ошибка при подключении к базе данных: {e}")
             raise
 
-    def close(self):
+    async def close(self):
         """Закрыть соединение с базой данных."""
 
         if self.connection_pool:
-            self.connection_pool.closeall()
+            await self.connection_pool.close()
             logger.debug("Соединение с базой данных закрыто.")
 
-    def create_tables(self):
-        """Создать таблицы в базе данных."""
+    async def migrate(self):
+        """Применить к базе данных еще не примененные миграции схемы."""
 
-        conn = None
         try:
-            conn = self.connection_pool.getconn()
-            with conn.cursor() as cursor:
-
-                cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS Clients (
-                    id SERIAL PRIMARY KEY,
-                    telephone TEXT NOT NULL,
-                    tg_id INTEGER UNIQUE,
-                    tg_first_name TEXT,
-                    tg_username TEXT,
-                    name TEXT
-);
-                """
-                )
-
-                cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS Appointments (
-                    id SERIAL PRIMARY KEY,
-                    client_id INTEGER REFERENCES Clients(id) ON DELETE CASCADE,
-                    procedure TEXT,
-                    date DATE,
-                    start_time TIME,
-                    end_time TIME
-                );
-                """
-                )
-
-                cursor.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS BlockedSlots (
-                        id SERIAL PRIMARY KEY,
-                        date DATE NOT NULL,
-                        start_time TIME NOT NULL,
-                        end_time TIME NOT NULL
-                    )
-                """
-                )
-
-            conn.commit()
-            logger.debug(
-                "Созданы (при необходимости) таблицы: Clients, Appointments, BlockedSlots."
-            )
-
+            await Migrator(self.connection_pool).migrate()
         except Exception as e:
-            logger.error(f"Ошибка при создании таблиц: {e}")
-            if conn:
-                conn.rollback()
+            logger.error(f"Ошибка при применении миграций: {e}")
             raise
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Получить соединение из пула с открытой транзакцией.
+
+        Транзакция фиксируется при выходе из блока и откатывается при исключении.
+        Запросы внутри транзакции попадают в статистику запросов, а ожидание
+        соединения, BEGIN и COMMIT учитываются только во времени базы данных обработчика."""
+
+        started = time.perf_counter()
+        statements_elapsed = 0.0
+        try:
+            async with self.connection_pool.acquire() as conn:
+                async with conn.transaction():
+                    connection = TransactionConnection(self, conn)
+                    try:
+                        yield connection
+                    finally:
+                        statements_elapsed = connection.elapsed
         finally:
-            if conn:
-                self.connection_pool.putconn(conn)
+            add_db_time(time.perf_counter() - started - statements_elapsed)
+
+    def _record_query(self, query, started, rows=0, error=False):
+        """Учесть время выполнения запроса в статистике запросов и метриках обработчика."""
+
+        elapsed = time.perf_counter() - started
+        add_db_time(elapsed)
+        self.query_stats.record(query, elapsed * 1000, rows, error)
 
-    def fetch_data(self, query, *args):
+    def _log_query_result(self, result):
+        """Записать в журнал результат SELECT-запроса согласно режиму журналирования.
+
+        Результат не форматируется, если уровень DEBUG отключен или запрос не попал в выборку."""
+
+        if self.query_log_mode == "off" or not logger.isEnabledFor(logging.DEBUG):
+            return
+        if self.query_log_sample_rate < 1 and random.random() >= self.query_log_sample_rate:
+            return
+
+        if self.query_log_mode == "full":
+            logger.debug("Запрос SELECT выполнен. Результат запроса: %s", result)
+        elif isinstance(result, list):
+            logger.debug("Запрос SELECT выполнен. Получено строк: %d", len(result))
+        else:
+            logger.debug("Запрос SELECT выполнен. Получено строк: %d", int(result is not None))
+
+    async def fetch_data(self, query, *args):
         """Выполнить SELECT-запрос и вернуть результат."""
 
-        conn = None
+        started = time.perf_counter()
         try:
-            conn = self.connection_pool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(query, args)
-                result = cursor.fetchall()
-                logger.debug(f"Запрос SELECT выполнен. Результат запроса: {result}")
+            async with self.connection_pool.acquire() as conn:
+                result = await conn.fetch(query, *args)
+                self._record_query(query, started, len(result))
+                self._log_query_result(result)
                 return result
         except Exception as e:
+            self._record_query(query, started, error=True)
             logger.error(
                 f"Ошибка при выполнении запроса: {e} \n Запрос: {query} \n Параметры: {args}"
             )
             return None
-        finally:
-            if conn:
-                self.connection_pool.putconn(conn)
 
-    def execute_query(self, query, *args):
+    async def fetch_row(self, query, *args):
+        """Выполнить SELECT-запрос и вернуть первую строку результата."""
+
+        started = time.perf_counter()
+        try:
+            async with self.connection_pool.acquire() as conn:
+                result = await conn.fetchrow(query, *args)
+                self._record_query(query, started, int(result is not None))
+                self._log_query_result(result)
+                return result
+        except Exception as e:
+            self._record_query(query, started, error=True)
+            logger.error(
+                f"Ошибка при выполнении запроса: {e} \n Запрос: {query} \n Параметры: {args}"
+            )
+            return None
+
+    async def execute_query(self, query, *args):
         """Выполнить INSERT, UPDATE или DELETE запрос."""
 
-        conn = None
+        started = time.perf_counter()
         try:
-            conn = self.connection_pool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(query, args)
-                conn.commit()
+            async with self.connection_pool.acquire() as conn:
+                await conn.execute(query, *args)
+                self._record_query(query, started)
                 logger.debug("Запрос выполнен.")
         except Exception as e:
+            self._record_query(query, started, error=True)
             logger.error(
                 f"Ошибка при выполнении запроса: {e} \n Запрос: {query} \n Параметры: {args}"
             )
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                self.connection_pool.putconn(conn)
@@ -1,10 +1,30 @@
-from database import Database
+import argparse
+import asyncio
+from database.migrator import Migrator
+from database.setup import create_database
 
 
-def main():
-    db = Database()
-    db.connect()
+async def main(command: str):
+    db = create_database()
+    await db.connect(migrate=command == "migrate")
+    try:
+        if command == "status":
+            migrator = Migrator(db.connection_pool)
+            applied = set(await migrator.get_applied_versions())
+            for version, name, _ in migrator.get_migrations():
+                status = "применена" if version in applied else "не применена"
+                print(f"{version:04d} {name}: {status}")
+    finally:
+        await db.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Управление базой данных.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="migrate",
+        choices=["migrate", "status"],
+        help="migrate — применить миграции, status — показать версии схемы",
+    )
+    asyncio.run(main(parser.parse_args().command))
@@ -0,0 +1,26 @@
+-- Исходная схема: таблицы, которые раньше создавал Database.create_tables.
+
+CREATE TABLE IF NOT EXISTS Clients (
+    id SERIAL PRIMARY KEY,
+    telephone TEXT NOT NULL,
+    tg_id INTEGER UNIQUE,
+    tg_first_name TEXT,
+    tg_username TEXT,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Appointments (
+    id SERIAL PRIMARY KEY,
+    client_id INTEGER REFERENCES Clients(id) ON DELETE CASCADE,
+    procedure TEXT,
+    date DATE,
+    start_time TIME,
+    end_time TIME
+);
+
+CREATE TABLE IF NOT EXISTS BlockedSlots (
+    id SERIAL PRIMARY KEY,
+    date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL
+);
@@ -0,0 +1,6 @@
+-- Индексы для запросов расписания и поиска клиентов.
+
+CREATE INDEX IF NOT EXISTS appointments_date_idx ON Appointments (date);
+CREATE INDEX IF NOT EXISTS appointments_client_id_idx ON Appointments (client_id);
+CREATE INDEX IF NOT EXISTS blockedslots_date_idx ON BlockedSlots (date);
+CREATE INDEX IF NOT EXISTS clients_telephone_idx ON Clients (telephone);
@@ -0,0 +1,15 @@
+-- Хранилище состояний диалогов и user_data для PostgresPersistence.
+
+CREATE TABLE IF NOT EXISTS ConversationStates (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (name, key)
+);
+
+CREATE TABLE IF NOT EXISTS UserData (
+    user_id BIGINT PRIMARY KEY,
+    data BYTEA NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
@@ -0,0 +1,24 @@
+-- Рабочие часы: шаблон по дням недели и исключения для отдельных дат.
+-- В день может быть несколько смен; строка без времени начала и конца означает выходной.
+-- Если для дня недели строк нет, используются часы из констант.
+
+CREATE TABLE IF NOT EXISTS WorkingHours (
+    id SERIAL PRIMARY KEY,
+    weekday INTEGER NOT NULL CHECK (weekday BETWEEN 0 AND 6),
+    start_time TIME,
+    end_time TIME,
+    CHECK ((start_time IS NULL) = (end_time IS NULL)),
+    CHECK (start_time IS NULL OR start_time < end_time)
+);
+
+CREATE TABLE IF NOT EXISTS WorkingHoursOverrides (
+    id SERIAL PRIMARY KEY,
+    date DATE NOT NULL,
+    start_time TIME,
+    end_time TIME,
+    CHECK ((start_time IS NULL) = (end_time IS NULL)),
+    CHECK (start_time IS NULL OR start_time < end_time)
+);
+
+CREATE INDEX IF NOT EXISTS workinghours_weekday_idx ON WorkingHours (weekday);
+CREATE INDEX IF NOT EXISTS workinghoursoverrides_date_idx ON WorkingHoursOverrides (date);
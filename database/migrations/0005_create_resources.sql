@@ -0,0 +1,23 @@
+-- Ресурсы салона: мастера и кабинеты.
+-- Каждая запись занимает один ресурс. Блокировки и рабочие часы без ресурса
+-- действуют для всего салона, с ресурсом — только для него.
+-- Существующие записи переносятся на ресурс по умолчанию.
+
+CREATE TABLE IF NOT EXISTS Resources (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL DEFAULT 'master',
+    active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+INSERT INTO Resources (name) VALUES ('Мастер') ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE Appointments ADD COLUMN resource_id INTEGER REFERENCES Resources(id);
+UPDATE Appointments SET resource_id = (SELECT MIN(id) FROM Resources);
+
+ALTER TABLE BlockedSlots ADD COLUMN resource_id INTEGER REFERENCES Resources(id) ON DELETE CASCADE;
+ALTER TABLE WorkingHours ADD COLUMN resource_id INTEGER REFERENCES Resources(id) ON DELETE CASCADE;
+ALTER TABLE WorkingHoursOverrides ADD COLUMN resource_id INTEGER REFERENCES Resources(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS appointments_resource_id_date_idx ON Appointments (resource_id, date);
+CREATE INDEX IF NOT EXISTS blockedslots_resource_id_date_idx ON BlockedSlots (resource_id, date);
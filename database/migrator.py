@@ -0,0 +1,108 @@
+import re
+from pathlib import Path
+from typing import List, Tuple
+import asyncpg
+from logger import setup_logger
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+# Ключ advisory-блокировки, чтобы миграции не применялись одновременно
+# несколькими процессами.
+MIGRATION_LOCK_ID = 7_314_256_001
+
+
+class Migrator:
+    """Применение версионированных миграций схемы базы данных.
+
+    Миграции — SQL-файлы вида NNNN_описание.sql в каталоге migrations,
+    применяются по возрастанию номера, каждая в отдельной транзакции.
+    Примененные версии сохраняются в таблице schema_version.
+    """
+
+    def __init__(
+        self, connection_pool: asyncpg.Pool, migrations_dir: Path = MIGRATIONS_DIR
+    ):
+        self.connection_pool = connection_pool
+        self.migrations_dir = migrations_dir
+        self.logger = setup_logger(__name__)
+
+    def get_migrations(self) -> List[Tuple[int, str, Path]]:
+        """Получить список файлов миграций, отсортированный по версии."""
+
+        migrations = []
+        for path in self.migrations_dir.iterdir():
+            match = MIGRATION_FILE_PATTERN.match(path.name)
+            if not match:
+                continue
+            migrations.append((int(match.group(1)), match.group(2), path))
+
+        migrations.sort()
+        versions = [version for version, _, _ in migrations]
+        if len(versions) != len(set(versions)):
+            raise ValueError(f"Повторяющиеся номера миграций в {self.migrations_dir}")
+
+        return migrations
+
+    async def _ensure_version_table(self, conn: asyncpg.Connection):
+        """Создать таблицу schema_version, если ее нет."""
+
+        query = """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT now()
+            );
+        """
+        await conn.execute(query)
+
+    async def get_applied_versions(self) -> List[int]:
+        """Получить список примененных версий схемы."""
+
+        async with self.connection_pool.acquire() as conn:
+            await self._ensure_version_table(conn)
+            rows = await conn.fetch(
+                "SELECT version FROM schema_version ORDER BY version"
+            )
+        return [row["version"] for row in rows]
+
+    async def migrate(self) -> List[int]:
+        """Применить все еще не примененные миграции.
+
+        Возвращает список примененных при этом вызове версий."""
+
+        migrations = self.get_migrations()
+        applied_now = []
+
+        async with self.connection_pool.acquire() as conn:
+            await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+            try:
+                await self._ensure_version_table(conn)
+                applied = {
+                    row["version"]
+                    for row in await conn.fetch("SELECT version FROM schema_version")
+                }
+
+                for version, name, path in migrations:
+                    if version in applied:
+                        continue
+
+                    async with conn.transaction():
+                        await conn.execute(path.read_text(encoding="utf-8"))
+                        await conn.execute(
+                            "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                            version,
+                            name,
+                        )
+                    applied_now.append(version)
+                    self.logger.debug(f"Применена миграция {version}: {name}.")
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+        if applied_now:
+            self.logger.debug(
+                f"Схема базы данных обновлена до версии {applied_now[-1]}."
+            )
+        else:
+            self.logger.debug("Схема базы данных актуальна.")
+
+        return applied_now
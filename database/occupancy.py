@@ -0,0 +1,135 @@
+from datetime import time, timedelta
+from typing import Iterable, List, Tuple
+
+MINUTES_IN_DAY = 24 * 60
+
+
+def time_to_minutes(time_obj: time, round_up: bool = False) -> int:
+    """Перевести время в количество минут от начала дня."""
+
+    minutes = time_obj.hour * 60 + time_obj.minute
+    if round_up and (time_obj.second or time_obj.microsecond):
+        minutes += 1
+    return minutes
+
+
+def minutes_to_time(minutes: int) -> time:
+    """Перевести количество минут от начала дня во время."""
+
+    minutes %= MINUTES_IN_DAY
+    return time(minutes // 60, minutes % 60)
+
+
+def timedelta_to_minutes(delta: timedelta) -> int:
+    """Перевести timedelta в целое количество минут."""
+
+    return delta // timedelta(minutes=1)
+
+
+def shifts_mask(shifts: Iterable[Tuple[time, time]]) -> int:
+    """Маска рабочих минут дня для набора смен."""
+
+    mask = 0
+    for start, end in shifts:
+        mask |= DayOccupancy._mask(
+            time_to_minutes(start, round_up=True), time_to_minutes(end)
+        )
+    return mask
+
+
+class DayOccupancy:
+    """Занятость рабочего дня в виде битовой маски.
+
+    Один бит соответствует одной минуте дня, установленный бит - свободная минута.
+    Записи и блокировки снимают биты своих интервалов, а поиск места
+    для процедуры выполняется сдвигами маски без перебора datetime.
+    """
+
+    __slots__ = ("free",)
+
+    def __init__(self, work_start: time, work_end: time):
+        self.free = self._mask(
+            time_to_minutes(work_start, round_up=True), time_to_minutes(work_end)
+        )
+
+    @classmethod
+    def from_mask(cls, mask: int) -> "DayOccupancy":
+        """Создать занятость дня по маске рабочих минут, например из нескольких смен."""
+
+        occupancy = cls.__new__(cls)
+        occupancy.free = mask
+        return occupancy
+
+    @staticmethod
+    def _mask(start: int, end: int) -> int:
+        """Маска с установленными битами в полуинтервале [start, end)."""
+
+        if end <= start:
+            return 0
+        return ((1 << (end - start)) - 1) << start
+
+    def occupy(self, start: time, end: time):
+        """Отметить интервал как занятый."""
+
+        self.free &= ~self._mask(
+            time_to_minutes(start), time_to_minutes(end, round_up=True)
+        )
+
+    def is_free(self, start: time, end: time) -> bool:
+        """Проверить, что интервал свободен целиком."""
+
+        mask = self._mask(time_to_minutes(start), time_to_minutes(end, round_up=True))
+        return self.free & mask == mask
+
+    def free_intervals(self) -> List[Tuple[int, int]]:
+        """Получить свободные интервалы в минутах от начала дня."""
+
+        intervals = []
+        free = self.free
+        while free:
+            start = (free & -free).bit_length() - 1
+            shifted = free >> start
+            length = (~shifted & (shifted + 1)).bit_length() - 1
+            intervals.append((start, start + length))
+            free &= ~self._mask(start, start + length)
+        return intervals
+
+    def fits(self, duration: int) -> int:
+        """Маска минут, начиная с которых свободно не меньше duration минут подряд."""
+
+        fits = self.free
+        width = 1
+        while width < duration and fits:
+            shift = min(width, duration - width)
+            fits &= fits >> shift
+            width += shift
+        return fits
+
+    def has_slot(self, duration: int) -> bool:
+        """Проверить, помещается ли процедура длительностью duration минут."""
+
+        return self.fits(duration) != 0
+
+    def free_time_intervals(self) -> List[Tuple[time, time]]:
+        """Получить свободные интервалы в виде времени."""
+
+        return [
+            (minutes_to_time(start), minutes_to_time(end))
+            for start, end in self.free_intervals()
+        ]
+
+    def procedure_slots(self, duration: int, step: int) -> List[Tuple[time, time]]:
+        """Сгенерировать слоты длительностью duration минут.
+
+        Начало слотов идет с шагом step от начала каждого свободного интервала."""
+
+        slots = []
+        for start, end in self.free_intervals():
+            for slot_start in range(start, end - duration + 1, step):
+                slots.append(
+                    (
+                        minutes_to_time(slot_start),
+                        minutes_to_time(slot_start + duration),
+                    )
+                )
+        return slots
@@ -0,0 +1,277 @@
+from typing import Dict, Optional, Tuple
+import asyncio
+import io
+import json
+import pickle
+import asyncpg
+from telegram.ext import BasePersistence, PersistenceInput
+from database import Database
+from logger import setup_logger
+
+# Ожидаемый размер сериализованных user_data одного пользователя, байт.
+# Типичный диалог записи занимает около 1 КБ; превышение — повод проверить,
+# не попали ли в user_data клавиатуры или результаты запросов целиком.
+USER_DATA_SIZE_TARGET = 2048
+
+
+class StoredRecord(tuple):
+    """Сохраняемая копия asyncpg.Record: поля доступны по индексу и по имени столбца."""
+
+    def __new__(cls, keys: Tuple[str, ...], values: tuple):
+        record = super().__new__(cls, values)
+        record._keys = keys
+        return record
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return super().__getitem__(self._keys.index(key))
+        return super().__getitem__(key)
+
+    def __reduce__(self):
+        return StoredRecord, (self._keys, tuple(self))
+
+
+class _UserDataPickler(pickle.Pickler):
+    """Pickler, который сохраняет asyncpg.Record как StoredRecord."""
+
+    def reducer_override(self, obj):
+        if isinstance(obj, asyncpg.Record):
+            return StoredRecord, (tuple(obj.keys()), tuple(obj.values()))
+        return NotImplemented
+
+
+def dump_user_data(data: dict) -> bytes:
+    """Сериализовать user_data."""
+
+    buffer = io.BytesIO()
+    _UserDataPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(data)
+    return buffer.getvalue()
+
+
+class PostgresPersistence(BasePersistence):
+    """Хранение состояний ConversationHandler и user_data в базе данных.
+
+    Данные читаются из базы один раз при запуске. Изменения накапливаются в памяти:
+    user_data сравнивается с последней сохраненной версией, поэтому в базу попадают
+    только изменившиеся записи. Накопленные изменения записываются одной транзакцией
+    после каждого прохода update_persistence (раз в update_interval секунд)
+    и при остановке приложения.
+    chat_data, bot_data и callback_data не сохраняются.
+    """
+
+    def __init__(self, db: Database, update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self.db = db
+        self.user_data_dumps: Optional[Dict[int, bytes]] = None
+        self.conversations: Optional[Dict[str, Dict[tuple, object]]] = None
+        # Изменения, еще не записанные в базу; None — запись нужно удалить.
+        self.pending_user_data: Dict[int, Optional[bytes]] = {}
+        self.pending_conversations: Dict[Tuple[str, tuple], Optional[object]] = {}
+        self.flush_lock = asyncio.Lock()
+        self.flush_task: Optional[asyncio.Task] = None
+        self.logger = setup_logger(__name__)
+
+    async def _ensure_connected(self):
+        """Подключиться к базе данных, если приложение еще не сделало этого.
+
+        Сохраненные данные загружаются до post_init, где подключается база данных бота.
+        """
+
+        if self.db.connection_pool is None:
+            await self.db.connect()
+
+    def _schedule_flush(self):
+        """Запланировать запись изменений после текущего прохода update_persistence."""
+
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.flush())
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        await self._ensure_connected()
+        rows = await self.db.fetch_data("SELECT user_id, data FROM UserData")
+
+        user_data = {}
+        self.user_data_dumps = {}
+        for user_id, data in rows or []:
+            try:
+                user_data[user_id] = pickle.loads(data)
+                self.user_data_dumps[user_id] = data
+            except Exception as e:
+                self.logger.error(
+                    f"Не удалось восстановить user_data пользователя {user_id}: {e}"
+                )
+        self.logger.debug(f"Восстановлены user_data {len(user_data)} пользователей.")
+        return user_data
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        await self._ensure_connected()
+        if self.conversations is None:
+            self.conversations = {}
+        query = """
+            SELECT key, state FROM ConversationStates
+            WHERE name = $1
+        """
+        rows = await self.db.fetch_data(query, name)
+
+        conversations = {tuple(json.loads(key)): state for key, state in rows or []}
+        self.conversations[name] = dict(conversations)
+        self.logger.debug(
+            f"Восстановлены состояния диалога {name}: {len(conversations)}."
+        )
+        return conversations
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        if self.user_data_dumps is None:
+            self.user_data_dumps = {}
+        try:
+            dump = dump_user_data(data)
+        except Exception as e:
+            self.logger.error(
+                f"Не удалось сериализовать user_data пользователя {user_id}: {e}"
+            )
+            return
+        if self.user_data_dumps.get(user_id) == dump:
+            return
+        if len(dump) > USER_DATA_SIZE_TARGET:
+            self.logger.warning(
+                f"user_data пользователя {user_id} занимают {len(dump)} байт "
+                f"(ожидается не больше {USER_DATA_SIZE_TARGET}): {sorted(data)}"
+            )
+
+        self.user_data_dumps[user_id] = dump
+        self.pending_user_data[user_id] = dump
+        self._schedule_flush()
+
+    async def update_conversation(
+        self, name: str, key: tuple, new_state: Optional[object]
+    ) -> None:
+        if self.conversations is None:
+            self.conversations = {}
+        conversation = self.conversations.setdefault(name, {})
+        if conversation.get(key) == new_state:
+            return
+
+        if new_state is None:
+            conversation.pop(key, None)
+        else:
+            conversation[key] = new_state
+        self.pending_conversations[(name, key)] = new_state
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        if self.user_data_dumps is not None:
+            self.user_data_dumps.pop(user_id, None)
+        self.pending_user_data[user_id] = None
+        self._schedule_flush()
+
+    async def flush(self) -> None:
+        """Записать накопленные изменения в базу данных одной транзакцией."""
+
+        async with self.flush_lock:
+            if not self.pending_user_data and not self.pending_conversations:
+                return
+
+            user_data, self.pending_user_data = self.pending_user_data, {}
+            conversations, self.pending_conversations = self.pending_conversations, {}
+
+            upsert_user_data_query = """
+                INSERT INTO UserData (user_id, data)
+                VALUES ($1, $2)
+                ON CONFLICT (user_id) DO UPDATE
+                SET data = EXCLUDED.data, updated_at = now()
+            """
+            delete_user_data_query = """
+                DELETE FROM UserData WHERE user_id = ANY($1::BIGINT[])
+            """
+            upsert_conversation_query = """
+                INSERT INTO ConversationStates (name, key, state)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (name, key) DO UPDATE
+                SET state = EXCLUDED.state, updated_at = now()
+            """
+            delete_conversation_query = """
+                DELETE FROM ConversationStates WHERE name = $1 AND key = $2
+            """
+            try:
+                async with self.db.transaction() as conn:
+                    await conn.executemany(
+                        upsert_user_data_query,
+                        [
+                            (user_id, dump)
+                            for user_id, dump in user_data.items()
+                            if dump is not None
+                        ],
+                    )
+                    await conn.execute(
+                        delete_user_data_query,
+                        [
+                            user_id
+                            for user_id, dump in user_data.items()
+                            if dump is None
+                        ],
+                    )
+                    await conn.executemany(
+                        upsert_conversation_query,
+                        [
+                            (name, json.dumps(list(key)), state)
+                            for (name, key), state in conversations.items()
+                            if state is not None
+                        ],
+                    )
+                    await conn.executemany(
+                        delete_conversation_query,
+                        [
+                            (name, json.dumps(list(key)))
+                            for (name, key), state in conversations.items()
+                            if state is None
+                        ],
+                    )
+            except Exception as e:
+                self.logger.error(f"Ошибка при сохранении состояний диалогов: {e}")
+                # Изменения, сделанные во время записи, новее — их не перезаписываем.
+                self.pending_user_data = {**user_data, **self.pending_user_data}
+                self.pending_conversations = {
+                    **conversations,
+                    **self.pending_conversations,
+                }
+                return
+
+            self.logger.debug(
+                f"Сохранены user_data {len(user_data)} пользователей "
+                f"и {len(conversations)} состояний диалогов."
+            )
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
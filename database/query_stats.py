@@ -0,0 +1,141 @@
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, List
+import json
+import re
+
+# Верхние границы корзин гистограммы задержек, мс. Последняя корзина — все, что дольше.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def normalize_query(query: str) -> str:
+    """Привести текст запроса к одной строке без лишних пробелов."""
+
+    return re.sub(r"\s+", " ", query).strip().rstrip(";")
+
+
+class StatementStats:
+    """Статистика выполнения одного запроса."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float, rows: int, error: bool):
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Оценить перцентиль задержки по гистограмме (верхняя граница корзины), мс."""
+
+        threshold = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= threshold:
+                return float(bound)
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "histogram_ms": {
+                **{
+                    f"<={bound}": count
+                    for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+                },
+                f">{LATENCY_BUCKETS_MS[-1]}": self.buckets[-1],
+            },
+        }
+
+
+class QueryStats:
+    """Счетчики вызовов, задержек, строк и ошибок по каждому запросу к базе данных.
+
+    Запросы группируются по нормализованному тексту, поэтому одинаковые
+    запросы с разными параметрами попадают в одну строку статистики."""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.statements: Dict[str, StatementStats] = {}
+
+    def record(self, query: str, elapsed_ms: float, rows: int = 0, error: bool = False):
+        """Учесть одно выполнение запроса."""
+
+        key = normalize_query(query)
+        stats = self.statements.get(key)
+        if stats is None:
+            stats = self.statements[key] = StatementStats()
+        stats.record(elapsed_ms, rows, error)
+
+    def reset(self):
+        """Обнулить статистику."""
+
+        self.started_at = datetime.now()
+        self.statements.clear()
+
+    def snapshot(self) -> List[dict]:
+        """Получить статистику по запросам, отсортированную по суммарному времени."""
+
+        return [
+            {"query": query, **stats.to_dict()}
+            for query, stats in sorted(
+                self.statements.items(), key=lambda item: item[1].total_ms, reverse=True
+            )
+        ]
+
+    def format_report(self, limit: int = 10, query_width: int = 120) -> str:
+        """Сформировать текстовый отчет по самым затратным запросам."""
+
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "Запросов к базе данных пока не было."
+
+        lines = [
+            f"Статистика запросов с {self.started_at:%d.%m.%Y %H:%M:%S}, "
+            f"всего запросов: {len(snapshot)}"
+        ]
+        for entry in snapshot[:limit]:
+            query = entry["query"]
+            if len(query) > query_width:
+                query = query[: query_width - 1] + "…"
+            lines.append(
+                f"\n{query}\n"
+                f"вызовов: {entry['calls']}, ошибок: {entry['errors']}, строк: {entry['rows']}, "
+                f"всего: {entry['total_ms']:.1f} мс, среднее: {entry['avg_ms']:.2f} мс, "
+                f"p50: ≤{entry['p50_ms']:g} мс, p95: ≤{entry['p95_ms']:g} мс, "
+                f"макс.: {entry['max_ms']:.2f} мс"
+            )
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> str:
+        """Сохранить статистику в JSON-файл и вернуть путь к нему."""
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "started_at": self.started_at.isoformat(),
+                    "dumped_at": datetime.now().isoformat(),
+                    "statements": self.snapshot(),
+                },
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+        return path
@@ -0,0 +1,93 @@
+from typing import Dict, Optional, Tuple
+from database import Database
+from database.availability_cache import AvailabilityCache
+from logger import setup_logger
+
+# Виды ресурсов: мастер или кабинет (кресло).
+RESOURCE_KINDS = ("master", "room")
+
+
+class Resources:
+    """Ресурсы салона из таблицы Resources: мастера и кабинеты.
+
+    Ресурсы читаются в память при запуске и после каждого изменения.
+    Расписание считается отдельно для каждого активного ресурса,
+    а клиенту показывается объединение их свободного времени.
+    """
+
+    def __init__(self, db: Database, availability_cache: AvailabilityCache):
+        self.db = db
+        self.availability_cache = availability_cache
+        self.names: Dict[int, str] = {}
+        self.kinds: Dict[int, str] = {}
+        self.active_ids: Tuple[int, ...] = ()
+        self.logger = setup_logger(__name__)
+
+    async def load(self) -> bool:
+        """Прочитать ресурсы из базы данных."""
+
+        rows = await self.db.fetch_data(
+            "SELECT id, name, kind, active FROM Resources ORDER BY id;"
+        )
+        if rows is None:
+            self.logger.error("Не удалось загрузить ресурсы из базы данных.")
+            return False
+
+        self.names = {row["id"]: row["name"] for row in rows}
+        self.kinds = {row["id"]: row["kind"] for row in rows}
+        self.active_ids = tuple(row["id"] for row in rows if row["active"])
+        self.logger.debug(
+            f"Ресурсы загружены: {len(rows)}, активных {len(self.active_ids)}."
+        )
+        return True
+
+    async def add_resource(self, name: str, kind: str = "master") -> Optional[int]:
+        """Добавить ресурс и вернуть его id."""
+
+        if kind not in RESOURCE_KINDS:
+            self.logger.error(f"Неизвестный вид ресурса: {kind}")
+            return None
+
+        row = await self.db.fetch_row(
+            "INSERT INTO Resources (name, kind) VALUES ($1, $2) RETURNING id;",
+            name,
+            kind,
+        )
+        if row is None:
+            self.logger.error(f"Не удалось добавить ресурс {name}.")
+            return None
+
+        await self.load()
+        self.availability_cache.clear()
+        self.logger.debug(f"Ресурс {name} ({kind}) добавлен с id {row['id']}.")
+        return row["id"]
+
+    async def set_active(self, resource_id: int, active: bool) -> bool:
+        """Включить или отключить ресурс.
+
+        Записи отключенного ресурса сохраняются, но новые на него не создаются."""
+
+        row = await self.db.fetch_row(
+            "UPDATE Resources SET active = $2 WHERE id = $1 RETURNING id;",
+            resource_id,
+            active,
+        )
+        if row is None:
+            self.logger.error(f"Ресурс {resource_id} не найден или не обновлен.")
+            return False
+
+        await self.load()
+        self.availability_cache.clear()
+        self.logger.debug(
+            f"Ресурс {resource_id} {'включен' if active else 'отключен'}."
+        )
+        return True
+
+    def format_resources(self) -> str:
+        """Сформировать текстовый список ресурсов."""
+
+        lines = ["Ресурсы:"]
+        for resource_id, name in self.names.items():
+            status = "" if resource_id in self.active_ids else " (отключен)"
+            lines.append(f"#{resource_id} {name}, {self.kinds[resource_id]}{status}")
+        return "\n".join(lines)
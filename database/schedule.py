@@ -1,10 +1,16 @@
+from collections import defaultdict
+import logging
 from datetime import date, datetime, time, timedelta
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import config
 from consts.constants import *
 from database import Database
 from logger import setup_logger
+from database.availability_cache import AvailabilityCache
 from database.blocked_slots import BlockedSlots
+from database.occupancy import DayOccupancy, timedelta_to_minutes
+from database.slot_holds import SlotHolds
+from database.working_hours import WorkingHours
 
 
 class Schedule:
@@ -13,82 +19,51 @@ class Schedule:
         self,
         db: Database,
         blocked_slots: BlockedSlots,
+        availability_cache: AvailabilityCache,
+        slot_holds: SlotHolds,
+        working_hours: WorkingHours,
     ):
         self.db = db
         self.blocked_slots = blocked_slots
+        self.availability_cache = availability_cache
+        self.slot_holds = slot_holds
+        self.working_hours = working_hours
         self.logger = setup_logger(__name__)
 
-    def get_working_hours(self, date_obj: date) -> Optional[Tuple[time, time]]:
-        """Получить рабочие часы для даты."""
-
-        if self.blocked_slots.is_day_blocked(date_obj):
-            self.logger.debug(f"День {date_obj} полностью заблокирован.")
-            return None
-
-        if date_obj.weekday() == 6:
-            self.logger.debug(f"{date_obj} — выходной день (воскресенье).")
-            return None
-
-        if date_obj.weekday() in [0, 2, 4]:
-            base_start_time = MON_WED_FRI_START
-            base_end_time = MON_WED_FRI_END
-        elif date_obj.weekday() in [1, 3, 5]:
-            base_start_time = TUE_THU_SAT_START
-            base_end_time = TUE_THU_SAT_END
-        else:
-            self.logger.warning(f"Не удалось определить рабочие часы для {date_obj}.")
-            return None
-
-        blocked_intervals = self.blocked_slots.get_blocked_slots(date_obj)
-
-        if not blocked_intervals:
-            self.logger.debug(
-                f"Рабочие часы для {date_obj}: {base_start_time} - {base_end_time}"
-            )
-            return (base_start_time, base_end_time)
-
-        start_time = base_start_time
-        end_time = base_end_time
-
-        for block_start, block_end in blocked_intervals:
-            if block_start <= start_time and block_end >= end_time:
-                self.logger.debug(
-                    f"Рабочие часы для {date_obj} полностью заблокированы: {block_start} - {block_end}"
-                )
-                return None
-
-            if block_start <= start_time < block_end:
-                start_time = block_end
-            elif block_start < end_time <= block_end:
-                end_time = block_start
-
-        if start_time >= end_time:
-            self.logger.debug(
-                f"Рабочие часы для {date_obj} стали некорректными после блокировок."
-            )
-            return None
-
-        self.logger.debug(
-            f"Рабочие часы для {date_obj} с учетом блокировок: {start_time} - {end_time}"
+    @staticmethod
+    def _is_day_blocked(
+        blocked_intervals: List[Tuple[time, time, Optional[int]]],
+    ) -> bool:
+        """Проверить, что среди блокировок есть блокировка всего дня для всего салона."""
+
+        return any(
+            block_start == time(0, 0)
+            and block_end == time(23, 59, 59)
+            and resource_id is None
+            for block_start, block_end, resource_id in blocked_intervals
         )
-        return (start_time, end_time)
 
-    def get_available_dates(
+    async def get_available_dates(
         self,
         procedure: Optional[str] = None,
         target_month: Optional[Tuple[int, int]] = None,
+        owner_id: Optional[int] = None,
     ) -> List[date]:
-        """Получить список доступных дат, исключая воскресенья.
+        """Получить список доступных дат, исключая выходные.
 
         Если указан target_month, возвращает доступные даты только для этого месяца,
         если месяц не указан, возвращает даты на ближайшее количество дней по умолчанию (DAYS_LOOKAHEAD).
 
         Если не указана процедура, возвращает доступные даты, где есть хотя бы один слот любого размера,
         если процедура указана, возвращаются только те даты, где есть слоты для этой процедуры.
+
+        Слоты, удерживаемые другими пользователями (не owner_id), считаются занятыми.
+
+        Записи и блокировки для всего диапазона получаются одним запросом,
+        дни, посчитанные ранее, берутся из кэша доступности.
         """
 
         today = datetime.now().date()
-        available_dates = []
 
         if target_month:
             year, month = target_month
@@ -102,183 +77,267 @@ class Schedule:
             start_date = today
             end_date = today + DAYS_LOOKAHEAD
 
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date.weekday() == 6:
-                current_date += timedelta(days=1)
-                continue
+        availability = await self.get_availability(
+            start_date, end_date, procedure, owner_id
+        )
+        return sorted(availability)
 
-            working_hours = self.get_working_hours(current_date)
-            if not working_hours:
-                current_date += timedelta(days=1)
-                continue
+    async def get_available_time_slots(
+        self,
+        date: date,
+        procedure: Optional[str] = None,
+        owner_id: Optional[int] = None,
+    ) -> List[Tuple[time, time]]:
+        """Получить доступные слоты для даты.
 
-            if procedure is None:
-                available_dates.append(current_date)
-                current_date += timedelta(days=1)
-                continue
+        Если указана процедура, возвращается список слотов для этой процедуры,
+        если процедура не указана, возвращается список всех доступных слотов.
+        Слоты, удерживаемые другими пользователями (не owner_id), не возвращаются."""
 
-            time_slots = self.get_available_time_slots(current_date, procedure)
-            if time_slots:
-                available_dates.append(current_date)
+        availability = await self.get_availability(date, date, procedure, owner_id)
+        return availability.get(date, [])
 
+    async def get_availability(
+        self,
+        start_date: date,
+        end_date: date,
+        procedure: Optional[str] = None,
+        owner_id: Optional[int] = None,
+    ) -> Dict[date, List[Tuple[time, time]]]:
+        """Получить доступные слоты для каждого дня диапазона одним запросом к базе данных.
+
+        Если указана процедура, для каждого дня возвращается список слотов для этой процедуры,
+        если процедура не указана, возвращаются свободные интервалы.
+        Слот доступен, если он свободен хотя бы у одного ресурса.
+        Дни без доступных слотов в результат не попадают.
+        Запрос к базе данных выполняется только для дней, которых нет в кэше.
+        Для дней, где часть времени удерживают другие пользователи, слоты
+        пересчитываются по индексу занятости ресурсов с учетом удержаний."""
+
+        slots_by_day = {}
+        masks_by_day = {}
+        held_by_day = {}
+        missing_dates = []
+        current_date = start_date
+        while current_date <= end_date:
+            held_intervals = self.slot_holds.get_held_intervals(current_date, owner_id)
+            if held_intervals:
+                held_by_day[current_date] = held_intervals
+                masks = self.availability_cache.get_occupancy(current_date)
+                if masks is None:
+                    missing_dates.append(current_date)
+                else:
+                    masks_by_day[current_date] = masks
+            else:
+                time_slots = self.availability_cache.get(current_date, procedure)
+                if time_slots is None:
+                    missing_dates.append(current_date)
+                else:
+                    slots_by_day[current_date] = time_slots
             current_date += timedelta(days=1)
 
-        return available_dates
-
-    def get_available_time_slots(
-        self, date: date, procedure: Optional[str] = None
-    ) -> List[Tuple[time, time]]:
-        """Получить доступные слоты для даты.
+        if missing_dates:
+            generation = self.availability_cache.generation
+            occupied_slots = await self._get_occupied_slots(
+                missing_dates[0], missing_dates[-1]
+            )
+            if occupied_slots is not None:
+                blocked_by_day, occupied_by_day = occupied_slots
+                for current_date in missing_dates:
+                    masks = self._resource_masks(
+                        current_date,
+                        blocked_by_day.get(current_date, []),
+                        occupied_by_day.get(current_date, []),
+                    )
+                    self.availability_cache.put_occupancy(
+                        current_date, masks, generation
+                    )
+                    if current_date in held_by_day:
+                        masks_by_day[current_date] = masks
+                        continue
+
+                    time_slots = self._slots_from_masks(masks, procedure)
+                    self.availability_cache.put(
+                        current_date, procedure, time_slots, generation
+                    )
+                    slots_by_day[current_date] = time_slots
+
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "Кэш доступности: %s", self.availability_cache.stats()
+                )
 
-        Если указана процедура, возвращается список слотов для этой процедуры,
-        если процедура не указана, возвращается список всех доступных слотов."""
+        for current_date, masks in masks_by_day.items():
+            slots_by_day[current_date] = self._slots_from_masks(
+                self._exclude_held_slots(masks, held_by_day[current_date]), procedure
+            )
 
-        working_hours = self.get_working_hours(date)
-        if not working_hours:
-            return []
+        availability = {}
+        for current_date in sorted(slots_by_day):
+            if slots_by_day[current_date]:
+                availability[current_date] = slots_by_day[current_date]
+
+        return availability
+
+    async def hold_slot(
+        self, owner_id: int, date_obj: date, start_time: time, end_time: time
+    ) -> bool:
+        """Удержать слот за пользователем на первом ресурсе, у которого это время свободно.
+
+        Возвращает False, если время не свободно ни у одного ресурса
+        или запрос к базе данных не выполнился."""
+
+        masks = self.availability_cache.get_occupancy(date_obj)
+        if masks is None:
+            generation = self.availability_cache.generation
+            occupied_slots = await self._get_occupied_slots(date_obj, date_obj)
+            if occupied_slots is None:
+                return False
+
+            blocked_by_day, occupied_by_day = occupied_slots
+            masks = self._resource_masks(
+                date_obj,
+                blocked_by_day.get(date_obj, []),
+                occupied_by_day.get(date_obj, []),
+            )
+            self.availability_cache.put_occupancy(date_obj, masks, generation)
 
-        work_start, work_end = working_hours
+        for resource_id, mask in masks.items():
+            if DayOccupancy.from_mask(mask).is_free(
+                start_time, end_time
+            ) and self.slot_holds.hold(
+                owner_id, date_obj, start_time, end_time, resource_id
+            ):
+                return True
 
-        occupied = self._get_occupied_slots(date)
-        self.logger.debug(f"Найдено занятых слотов для даты {date}: {len(occupied)}")
+        self.logger.debug(
+            "Время %s %s - %s не свободно ни у одного ресурса.",
+            date_obj,
+            start_time,
+            end_time,
+        )
+        return False
 
-        work_start_dt = datetime.combine(date, work_start)
-        work_end_dt = datetime.combine(date, work_end)
+    @staticmethod
+    def _exclude_held_slots(
+        masks: Dict[int, int], held_intervals: List[Tuple[time, time, int]]
+    ) -> Dict[int, int]:
+        """Снять с масок ресурсов время, удерживаемое другими пользователями."""
+
+        occupancies = {
+            resource_id: DayOccupancy.from_mask(mask)
+            for resource_id, mask in masks.items()
+        }
+        for held_start, held_end, resource_id in held_intervals:
+            if resource_id in occupancies:
+                occupancies[resource_id].occupy(held_start, held_end)
+        return {
+            resource_id: occupancy.free
+            for resource_id, occupancy in occupancies.items()
+        }
+
+    def _resource_masks(
+        self,
+        date_obj: date,
+        blocked_intervals: List[Tuple[time, time, Optional[int]]],
+        occupied_intervals: List[Tuple[time, time, Optional[int]]],
+    ) -> Dict[int, int]:
+        """Построить индекс занятости дня: маску свободных минут каждого активного ресурса.
+
+        Ресурсы без рабочих часов в этот день в индекс не попадают.
+        Блокировки без ресурса занимают время всех ресурсов."""
+
+        if self._is_day_blocked(blocked_intervals):
+            return {}
+
+        occupancies = {}
+        for resource_id in self.working_hours.resources.active_ids:
+            mask = self.working_hours.calendar_for(resource_id).mask(date_obj)
+            if mask:
+                occupancies[resource_id] = DayOccupancy.from_mask(mask)
+
+        for start, end, resource_id in occupied_intervals:
+            if not (start and end):
+                continue
+            if resource_id is None:
+                for occupancy in occupancies.values():
+                    occupancy.occupy(start, end)
+            elif resource_id in occupancies:
+                occupancies[resource_id].occupy(start, end)
 
-        free_intervals = self._calculate_free_intervals(
-            work_start_dt, work_end_dt, occupied
+        self.logger.debug(
+            "Найдено занятых слотов для даты %s: %d", date_obj, len(occupied_intervals)
         )
-        self.logger.debug(f"Свободные интервалы для даты {date}: {free_intervals}")
+        return {
+            resource_id: occupancy.free
+            for resource_id, occupancy in occupancies.items()
+        }
+
+    def _slots_from_masks(
+        self, masks: Dict[int, int], procedure: Optional[str] = None
+    ) -> List[Tuple[time, time]]:
+        """Вычислить доступные слоты дня как объединение слотов всех ресурсов."""
+
+        if not masks:
+            return []
 
         if procedure:
             duration = PROCEDURES.get(procedure)
             if not duration:
                 return []
-            duration_timedelta = timedelta(minutes=duration)
-            return self._generate_procedure_slots(free_intervals, duration_timedelta)
-
-        return self._convert_to_time(free_intervals)
-
-    def _calculate_free_intervals(
-        self,
-        work_start: datetime,
-        work_end: datetime,
-        occupied: List[Tuple[datetime, datetime]],
-    ) -> List[Tuple[datetime, datetime]]:
-        """Вычислить свободные интервалы в переданном диапазоне. Если занятых слотов нет, возвращается весь диапазон."""
-
-        if not occupied:
-            return [(work_start, work_end)]
-
-        free_intervals = []
-        prev_end = work_start
-
-        for start, end in sorted(occupied, key=lambda x: x[0]):
-            if start > prev_end:
-                free_intervals.append((prev_end, start))
-            prev_end = max(prev_end, end)
+            step = timedelta_to_minutes(STEP)
+            time_slots = set()
+            for mask in masks.values():
+                time_slots.update(
+                    DayOccupancy.from_mask(mask).procedure_slots(duration, step)
+                )
+            return sorted(time_slots)
 
-        if prev_end < work_end:
-            free_intervals.append((prev_end, work_end))
+        free = 0
+        for mask in masks.values():
+            free |= mask
+        return DayOccupancy.from_mask(free).free_time_intervals()
 
-        self.logger.debug(f"Свободные интервалы для даты {date}: {free_intervals}")
-        return free_intervals
+    async def _get_occupied_slots(self, start_date: date, end_date: date) -> Optional[
+        Tuple[
+            Dict[date, List[Tuple[time, time, Optional[int]]]],
+            Dict[date, List[Tuple[time, time, Optional[int]]]],
+        ]
+    ]:
+        """Получить заблокированные и занятые слоты для диапазона дат одним запросом.
 
-    def _get_occupied_slots(self, date_obj: date) -> List[Tuple[datetime, datetime]]:
-        """Получить занятые слоты для даты."""
+        Возвращает два словаря, сгруппированных по дате: заблокированные слоты
+        и все занятые слоты (блокировки и записи), отсортированные по времени начала.
+        Слот — кортеж (начало, конец, id ресурса), у блокировок всего салона id ресурса None.
+        Возвращает None, если запрос к базе данных не выполнился."""
 
-        result = self.db.fetch_data(
+        result = await self.db.fetch_data(
             """
-            SELECT start_time, end_time 
-            FROM BlockedSlots 
-            WHERE date = %s
+            SELECT date, start_time, end_time, resource_id, TRUE AS blocked
+            FROM BlockedSlots
+            WHERE date BETWEEN $1 AND $2
             UNION ALL
-            SELECT start_time, end_time 
-            FROM Appointments 
-            WHERE date = %s
-            ORDER BY start_time;
+            SELECT date, start_time, end_time, resource_id, FALSE AS blocked
+            FROM Appointments
+            WHERE date BETWEEN $1 AND $2
+            ORDER BY date, start_time;
             """,
-            date_obj,
-            date_obj,
+            start_date,
+            end_date,
         )
+        if result is None:
+            return None
 
-        self.logger.debug(f"Найдено занятых слотов для даты {date_obj}: {result}")
-
-        if not result:
-            return []
-
-        return [
-            (self._safe_combine(date_obj, start), self._safe_combine(date_obj, end))
-            for start, end in result
-            if start and end
-        ]
-
-    def _has_available_slot(self, date_obj: date, duration: timedelta) -> bool:
-        """Проверить наличие доступного слота для процедуры."""
-
-        try:
-            time_slots = self.get_available_time_slots(date_obj)
-            for start_time, end_time in time_slots:
-                start_dt = self._safe_combine(date_obj, start_time)
-                end_dt = self._safe_combine(date_obj, end_time)
-
-                if not start_dt or not end_dt:
-                    continue
-
-                if (end_dt - start_dt) >= duration:
-                    return True
-            return False
-
-        except Exception as e:
-            self.logger.error(
-                f"Ошибка при проверке доступности для даты {date_obj}: {e}"
-            )
-            return False
-
-    @staticmethod
-    def _generate_procedure_slots(
-        free_intervals: List[Tuple[datetime, datetime]], duration: timedelta
-    ) -> List[Tuple[time, time]]:
-        """Сгенерировать слоты определенной длительности.
-        Возвращает список кортежей с временными интервалами.
-        Начало интервала - с шагом по умолчанию (STEP)."""
-
-        if not free_intervals or not isinstance(duration, timedelta):
-            return []
-
-        slots = []
-
-        for interval_start, interval_end in free_intervals:
-            if not isinstance(interval_start, datetime) or not isinstance(
-                interval_end, datetime
-            ):
-                continue
-
-            current = interval_start
-            while current + duration <= interval_end:
-                slots.append((current.time(), (current + duration).time()))
-                current += STEP
-
-        return sorted(list({tuple(slot) for slot in slots}), key=lambda x: x[0])
-
-    @staticmethod
-    def _safe_combine(date_obj: date, time_obj: time) -> Optional[datetime]:
-        """Безопасное объединение date и time."""
+        blocked_by_day = defaultdict(list)
+        occupied_by_day = defaultdict(list)
 
-        try:
-            return datetime.combine(date_obj, time_obj)
-        except (TypeError, ValueError) as e:
-            return None
+        for date_obj, start, end, resource_id, blocked in result:
+            if blocked:
+                blocked_by_day[date_obj].append((start, end, resource_id))
+            occupied_by_day[date_obj].append((start, end, resource_id))
 
-    @staticmethod
-    def _convert_to_time(
-        intervals: List[Tuple[datetime, datetime]],
-    ) -> List[Tuple[time, time]]:
-        """Конвертация с проверкой типов."""
+        self.logger.debug(
+            "Найдено занятых слотов с %s по %s: %d", start_date, end_date, len(result)
+        )
 
-        return [
-            (start.time(), end.time())
-            for start, end in intervals
-            if isinstance(start, datetime) and isinstance(end, datetime)
-        ]
+        return blocked_by_day, occupied_by_day
@@ -1,19 +1,59 @@
+from typing import Optional
+import config
 from database import Database
 from database.clients import Clients
+from database.resources import Resources
 from database.blocked_slots import BlockedSlots
+from database.client_cache import ClientCache
 from database.appointments import Appointments
+from database.availability_cache import AvailabilityCache
 from database.schedule import Schedule
+from database.slot_holds import SlotHolds
+from database.working_hours import WorkingHours
+from database.sqlite_database import SqliteDatabase
 
+# Поддерживаемые базы данных: postgres — PostgreSQL из DB_CONFIG,
+# sqlite — SQLite из SQLITE_PATH (по умолчанию в памяти процесса).
+DB_BACKENDS = ("postgres", "sqlite")
 
-def setup_database():
-    """Настроить базу данных."""
-    db = Database()
-    db.connect()
 
-    clients = Clients(db)
-    blocked_slots = BlockedSlots(db)
-    appointments = Appointments(db, clients)
-    schedule = Schedule(db, blocked_slots)
+def create_database(backend: Optional[str] = None) -> Database:
+    """Создать подключение к базе данных, выбранной в DB_BACKEND."""
+
+    backend = backend or getattr(config, "DB_BACKEND", "postgres")
+    if backend not in DB_BACKENDS:
+        raise ValueError(
+            f"Неизвестная база данных {backend}, ожидается одна из {DB_BACKENDS}."
+        )
+    if backend == "sqlite":
+        return SqliteDatabase(getattr(config, "SQLITE_PATH", ":memory:"))
+    return Database()
+
+
+async def setup_database(db: Optional[Database] = None):
+    """Настроить базу данных.
+
+    Если db передан (например, уже используется хранилищем состояний диалогов),
+    работа идет через него, иначе создается новое подключение к базе данных из DB_BACKEND.
+    """
+    db = db or create_database()
+    await db.connect()
+
+    availability_cache = AvailabilityCache()
+    slot_holds = SlotHolds()
+    client_cache = ClientCache()
+    clients = Clients(db, client_cache, availability_cache)
+    blocked_slots = BlockedSlots(db, availability_cache)
+    resources = Resources(db, availability_cache)
+    await resources.load()
+    working_hours = WorkingHours(db, availability_cache, resources)
+    await working_hours.load()
+    appointments = Appointments(
+        db, clients, availability_cache, slot_holds, working_hours
+    )
+    schedule = Schedule(
+        db, blocked_slots, availability_cache, slot_holds, working_hours
+    )
 
     return {
         "db": db,
@@ -21,4 +61,9 @@ def setup_database():
         "blocked_slots": blocked_slots,
         "appointments": appointments,
         "schedule": schedule,
+        "working_hours": working_hours,
+        "resources": resources,
+        "availability_cache": availability_cache,
+        "slot_holds": slot_holds,
+        "client_cache": client_cache,
     }
@@ -0,0 +1,155 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from logger import setup_logger
+
+
+class SlotHolds:
+    """Временные удержания слотов на время ввода имени и телефона.
+
+    У каждого пользователя может быть не больше одного удержания.
+    Удержание занимает время одного ресурса (мастера или кабинета),
+    остальные ресурсы в это время остаются доступными.
+    Удержание истекает через ttl, если запись не была подтверждена или отменена.
+    Удержания хранятся в памяти процесса и не переживают перезапуск бота.
+    """
+
+    def __init__(self, ttl: timedelta = timedelta(minutes=10)):
+        self.ttl = ttl
+        self.holds: Dict[int, Tuple[date, time, time, int, datetime]] = {}
+        # Счетчик, который меняется при каждом изменении набора удержаний.
+        self.version = 0
+        # Месяц -> значение version при последнем изменении удержаний его дат.
+        self.month_versions: Dict[Tuple[int, int], int] = {}
+        self.logger = setup_logger(__name__)
+
+    def _purge_expired(self):
+        """Удалить истекшие удержания."""
+
+        now = datetime.now()
+        for owner_id in [
+            owner_id
+            for owner_id, (*_, expires_at) in self.holds.items()
+            if expires_at <= now
+        ]:
+            hold_date, start_time, end_time, _, _ = self.holds.pop(owner_id)
+            self._touch(hold_date)
+            self.logger.debug(
+                "Удержание слота %s %s - %s пользователем %s истекло.",
+                hold_date,
+                start_time,
+                end_time,
+                owner_id,
+            )
+
+    def _touch(self, hold_date: date):
+        """Отметить изменение удержаний в месяце даты."""
+
+        self.version += 1
+        self.month_versions[(hold_date.year, hold_date.month)] = self.version
+
+    def hold(
+        self,
+        owner_id: int,
+        hold_date: date,
+        start_time: time,
+        end_time: time,
+        resource_id: int,
+    ) -> bool:
+        """Удержать слот ресурса за пользователем, заменив его прежнее удержание.
+
+        Возвращает False, если слот пересекается с удержанием того же ресурса
+        другим пользователем."""
+
+        if self.is_held_by_other(
+            owner_id, hold_date, start_time, end_time, resource_id
+        ):
+            return False
+
+        previous = self.holds.get(owner_id)
+        if previous is not None:
+            self._touch(previous[0])
+        self.holds[owner_id] = (
+            hold_date,
+            start_time,
+            end_time,
+            resource_id,
+            datetime.now() + self.ttl,
+        )
+        self._touch(hold_date)
+        self.logger.debug(
+            "Слот %s %s - %s ресурса %s удержан пользователем %s.",
+            hold_date,
+            start_time,
+            end_time,
+            resource_id,
+            owner_id,
+        )
+        return True
+
+    def release(self, owner_id: int):
+        """Снять удержание пользователя, если оно есть."""
+
+        entry = self.holds.pop(owner_id, None)
+        if entry:
+            self._touch(entry[0])
+            self.logger.debug("Удержание слота пользователем %s снято.", owner_id)
+
+    def month_version(self, year: int, month: int) -> int:
+        """Удалить истекшие удержания и получить версию удержаний месяца."""
+
+        self._purge_expired()
+        return self.month_versions.get((year, month), 0)
+
+    def has_hold(self, owner_id: Optional[int]) -> bool:
+        """Проверить, удерживает ли пользователь слот."""
+
+        self._purge_expired()
+        return owner_id in self.holds
+
+    def get_held_intervals(
+        self, hold_date: date, owner_id: Optional[int] = None
+    ) -> List[Tuple[time, time, int]]:
+        """Получить интервалы даты с ресурсами, удерживаемые пользователями, кроме owner_id."""
+
+        self._purge_expired()
+        return sorted(
+            (start_time, end_time, resource_id)
+            for holder_id, (
+                held_date,
+                start_time,
+                end_time,
+                resource_id,
+                _,
+            ) in self.holds.items()
+            if held_date == hold_date and holder_id != owner_id
+        )
+
+    def get_held_resource(
+        self, owner_id: Optional[int], hold_date: date, start_time: time, end_time: time
+    ) -> Optional[int]:
+        """Получить ресурс, на котором пользователь удерживает именно этот слот."""
+
+        self._purge_expired()
+        entry = self.holds.get(owner_id)
+        if entry is None or entry[:3] != (hold_date, start_time, end_time):
+            return None
+        return entry[3]
+
+    def is_held_by_other(
+        self,
+        owner_id: Optional[int],
+        hold_date: date,
+        start_time: time,
+        end_time: time,
+        resource_id: int,
+    ) -> bool:
+        """Проверить, пересекается ли интервал с удержанием ресурса другим пользователем."""
+
+        return any(
+            held_resource_id == resource_id
+            and held_start < end_time
+            and held_end > start_time
+            for held_start, held_end, held_resource_id in self.get_held_intervals(
+                hold_date, owner_id
+            )
+        )
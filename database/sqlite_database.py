@@ -0,0 +1,209 @@
+import asyncio
+import json
+import re
+import sqlite3
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time
+from typing import Any, Iterable, List, Optional
+from database import Database
+from database.persistence import StoredRecord
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Замены, которые переводят запросы и миграции, написанные для PostgreSQL, на диалект SQLite.
+# Порядок важен: ANY($n::TYPE[]) разбирается раньше, чем удаляются приведения типов.
+SQL_REPLACEMENTS = (
+    (
+        re.compile(r"=\s*ANY\(\s*\$(\d+)(?:::[\w\[\]]+)?\s*\)"),
+        r"IN (SELECT value FROM json_each(?\1))",
+    ),
+    (re.compile(r"::\w+(?:\[\])?"), ""),
+    (re.compile(r"\$(\d+)"), r"?\1"),
+    (
+        re.compile(r"\bSERIAL PRIMARY KEY\b", re.IGNORECASE),
+        "INTEGER PRIMARY KEY AUTOINCREMENT",
+    ),
+    (re.compile(r"\bBYTEA\b", re.IGNORECASE), "BLOB"),
+    (re.compile(r"\bDEFAULT now\(\)", re.IGNORECASE), "DEFAULT CURRENT_TIMESTAMP"),
+)
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+TIME_PATTERN = re.compile(r"^\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?$")
+
+
+def translate_query(query: str) -> str:
+    """Перевести запрос с диалекта PostgreSQL на диалект SQLite."""
+
+    for pattern, replacement in SQL_REPLACEMENTS:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+def _to_sqlite(value: Any) -> Any:
+    """Привести параметр запроса к типу, который хранит SQLite."""
+
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return json.dumps(list(value))
+    return value
+
+
+def _from_sqlite(value: Any) -> Any:
+    """Восстановить дату и время, которые SQLite хранит строками."""
+
+    if isinstance(value, str):
+        if DATE_PATTERN.match(value):
+            return date.fromisoformat(value)
+        if TIME_PATTERN.match(value):
+            return time.fromisoformat(value)
+    return value
+
+
+def _split_script(script: str) -> List[str]:
+    """Разбить SQL-скрипт на отдельные выражения."""
+
+    statements = []
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \t\r\n;"):
+                statements.append(statement)
+            statement = ""
+    return statements
+
+
+class SqliteConnection:
+    """Соединение SQLite с подмножеством интерфейса asyncpg.Connection,
+    которое используют Database, Migrator и классы работы с данными.
+
+    Строки результата возвращаются как StoredRecord: поля доступны по индексу
+    и по имени столбца, как у asyncpg.Record."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.transaction_depth = 0
+
+    def _execute(self, query: str, args: Iterable[Any]) -> sqlite3.Cursor:
+        return self.connection.execute(
+            translate_query(query), [_to_sqlite(arg) for arg in args]
+        )
+
+    @staticmethod
+    def _records(cursor: sqlite3.Cursor) -> List[StoredRecord]:
+        if cursor.description is None:
+            return []
+        keys = tuple(column[0].lower() for column in cursor.description)
+        return [
+            StoredRecord(keys, tuple(_from_sqlite(value) for value in row))
+            for row in cursor.fetchall()
+        ]
+
+    async def fetch(self, query: str, *args) -> List[StoredRecord]:
+        return self._records(self._execute(query, args))
+
+    async def fetchrow(self, query: str, *args) -> Optional[StoredRecord]:
+        records = self._records(self._execute(query, args))
+        return records[0] if records else None
+
+    async def fetchval(self, query: str, *args) -> Any:
+        record = await self.fetchrow(query, *args)
+        return record[0] if record else None
+
+    async def execute(self, query: str, *args) -> str:
+        """Выполнить запрос; без параметров запрос может содержать несколько выражений."""
+
+        if args:
+            self._execute(query, args).fetchall()
+            return "OK"
+        for statement in _split_script(translate_query(query)):
+            self.connection.execute(statement).fetchall()
+        return "OK"
+
+    async def executemany(self, query: str, args: Iterable[Iterable[Any]]):
+        self.connection.executemany(
+            translate_query(query),
+            [[_to_sqlite(arg) for arg in row] for row in args],
+        )
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Транзакция; вложенные транзакции выполняются как точки сохранения."""
+
+        savepoint = f"savepoint_{self.transaction_depth}"
+        self.connection.execute(
+            f"SAVEPOINT {savepoint}" if self.transaction_depth else "BEGIN"
+        )
+        self.transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.transaction_depth -= 1
+            if self.transaction_depth:
+                self.connection.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                self.connection.execute(f"RELEASE SAVEPOINT {savepoint}")
+            else:
+                self.connection.execute("ROLLBACK")
+            raise
+        self.transaction_depth -= 1
+        self.connection.execute(
+            f"RELEASE SAVEPOINT {savepoint}" if self.transaction_depth else "COMMIT"
+        )
+
+
+class SqlitePool:
+    """Пул из одного соединения SQLite с интерфейсом asyncpg.Pool.
+
+    Соединение выдается одной корутине за раз, поэтому транзакции разных
+    обработчиков не смешиваются."""
+
+    def __init__(self, path: str):
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.execute("PRAGMA foreign_keys = ON")
+        # Заглушки функций PostgreSQL: в SQLite одновременно пишет только одно соединение.
+        for name, arguments in (
+            ("pg_advisory_lock", 1),
+            ("pg_advisory_unlock", 1),
+            ("pg_advisory_xact_lock", 2),
+        ):
+            connection.create_function(name, arguments, lambda *args: None)
+        connection.create_function("now", 0, lambda: datetime.now().isoformat(sep=" "))
+        self.connection = SqliteConnection(connection)
+        self.lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self.lock:
+            yield self.connection
+
+    async def close(self):
+        self.connection.connection.close()
+
+
+class SqliteDatabase(Database):
+    """База данных SQLite: по умолчанию в памяти процесса.
+
+    Запросы классов работы с данными написаны для PostgreSQL и переводятся
+    на диалект SQLite на лету, миграции применяются тем же Migrator.
+    Подходит для замеров и нагрузочных тестов без запущенного PostgreSQL;
+    даты и время хранятся строками в формате ISO."""
+
+    def __init__(self, path: str = ":memory:"):
+        super().__init__()
+        self.path = path
+
+    async def connect(self, migrate: bool = True):
+        """Открыть базу данных SQLite и применить миграции схемы."""
+
+        if self.connection_pool:
+            return
+
+        try:
+            self.connection_pool = SqlitePool(self.path)
+            logger.debug(f"База данных SQLite {self.path} открыта.")
+            if migrate:
+                await self.migrate()
+        except Exception as e:
+            logger.error(f"Ошибка при открытии базы данных SQLite {self.path}: {e}")
+            raise
@@ -0,0 +1,340 @@
+from datetime import date, time
+from typing import Dict, Iterable, List, Optional, Tuple
+from consts.constants import (
+    MON_WED_FRI_END,
+    MON_WED_FRI_START,
+    TUE_THU_SAT_END,
+    TUE_THU_SAT_START,
+)
+from database import Database
+from database.availability_cache import AvailabilityCache
+from database.occupancy import DayOccupancy, shifts_mask
+from database.resources import Resources
+from logger import setup_logger
+
+Shift = Tuple[time, time]
+Shifts = Tuple[Shift, ...]
+
+WEEKDAY_NAMES = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+
+def default_weekly_hours() -> Tuple[Shifts, ...]:
+    """Рабочие часы по дням недели из констант: воскресенье — выходной."""
+
+    weekly = []
+    for weekday in range(7):
+        if weekday in (0, 2, 4):
+            weekly.append(((MON_WED_FRI_START, MON_WED_FRI_END),))
+        elif weekday in (1, 3, 5):
+            weekly.append(((TUE_THU_SAT_START, TUE_THU_SAT_END),))
+        else:
+            weekly.append(())
+    return tuple(weekly)
+
+
+def format_shifts(shifts: Iterable[Shift]) -> str:
+    """Представить смены дня строкой вида 09:00-13:00, 14:00-18:00."""
+
+    text = ", ".join(
+        f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in shifts
+    )
+    return text or "выходной"
+
+
+def validate_shifts(shifts: Iterable[Shift]) -> Optional[str]:
+    """Проверить смены дня: вернуть описание ошибки или None, если смены корректны."""
+
+    previous_end = None
+    for start, end in sorted(shifts):
+        if start >= end:
+            return f"Смена {format_shifts([(start, end)])} заканчивается раньше, чем начинается."
+        if previous_end is not None and start < previous_end:
+            return f"Смена {format_shifts([(start, end)])} пересекается с предыдущей."
+        previous_end = end
+    return None
+
+
+class WorkingCalendar:
+    """Рабочие часы в памяти: шаблон на каждый день недели и исключения для дат.
+
+    Для каждого дня хранятся смены и маска рабочих минут, поэтому расчет
+    расписания не обращается к базе данных за рабочими часами.
+    Пустой набор смен означает выходной.
+    """
+
+    __slots__ = ("weekly", "overrides", "weekly_masks", "override_masks")
+
+    def __init__(
+        self,
+        weekly: Tuple[Shifts, ...],
+        overrides: Optional[Dict[date, Shifts]] = None,
+    ):
+        self.weekly = weekly
+        self.overrides = overrides or {}
+        self.weekly_masks = tuple(shifts_mask(shifts) for shifts in weekly)
+        self.override_masks = {
+            date_obj: shifts_mask(shifts) for date_obj, shifts in self.overrides.items()
+        }
+
+    def shifts(self, date_obj: date) -> Shifts:
+        """Получить смены для даты."""
+
+        shifts = self.overrides.get(date_obj)
+        if shifts is None:
+            return self.weekly[date_obj.weekday()]
+        return shifts
+
+    def mask(self, date_obj: date) -> int:
+        """Получить маску рабочих минут для даты."""
+
+        mask = self.override_masks.get(date_obj)
+        if mask is None:
+            return self.weekly_masks[date_obj.weekday()]
+        return mask
+
+    def is_day_off(self, date_obj: date) -> bool:
+        """Проверить, что дата — выходной."""
+
+        return not self.mask(date_obj)
+
+    def is_open(self, date_obj: date, start_time: time, end_time: time) -> bool:
+        """Проверить, что интервал целиком попадает в рабочие смены даты."""
+
+        return DayOccupancy.from_mask(self.mask(date_obj)).is_free(start_time, end_time)
+
+
+class WorkingHours:
+    """Рабочие часы из таблиц WorkingHours и WorkingHoursOverrides.
+
+    Таблицы читаются в WorkingCalendar при запуске и после каждого изменения.
+    Строки без ресурса задают часы салона, строки с ресурсом — часы мастера
+    или кабинета поверх часов салона: для даты действует исключение ресурса,
+    затем исключение салона, затем шаблон дня недели ресурса и салона.
+    Дни недели без строк в WorkingHours берут часы из констант.
+    Изменение шаблона сбрасывает кэш доступности целиком,
+    изменение часов даты — только для этой даты.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        availability_cache: AvailabilityCache,
+        resources: Resources,
+    ):
+        self.db = db
+        self.availability_cache = availability_cache
+        self.resources = resources
+        self.calendar = WorkingCalendar(default_weekly_hours())
+        self.calendars: Dict[int, WorkingCalendar] = {}
+        self.logger = setup_logger(__name__)
+
+    def calendar_for(self, resource_id: Optional[int]) -> WorkingCalendar:
+        """Получить календарь ресурса; без собственных часов действуют часы салона."""
+
+        return self.calendars.get(resource_id, self.calendar)
+
+    def is_day_off(self, date_obj: date) -> bool:
+        """Проверить, что в дату не работает ни один активный ресурс."""
+
+        return all(
+            self.calendar_for(resource_id).is_day_off(date_obj)
+            for resource_id in self.resources.active_ids
+        )
+
+    async def load(self) -> bool:
+        """Прочитать рабочие часы из базы данных в календари салона и ресурсов."""
+
+        weekly_rows = await self.db.fetch_data("""
+            SELECT resource_id, weekday, start_time, end_time
+            FROM WorkingHours
+            ORDER BY resource_id, weekday, start_time;
+            """)
+        override_rows = await self.db.fetch_data("""
+            SELECT resource_id, date, start_time, end_time
+            FROM WorkingHoursOverrides
+            ORDER BY resource_id, date, start_time;
+            """)
+        if weekly_rows is None or override_rows is None:
+            self.logger.error("Не удалось загрузить рабочие часы из базы данных.")
+            return False
+
+        weekly_by_resource = {}
+        for resource_id, weekday, start, end in weekly_rows:
+            shifts = weekly_by_resource.setdefault(resource_id, {}).setdefault(
+                weekday, []
+            )
+            if start is not None:
+                shifts.append((start, end))
+
+        overrides_by_resource = {}
+        for resource_id, date_obj, start, end in override_rows:
+            shifts = overrides_by_resource.setdefault(resource_id, {}).setdefault(
+                date_obj, []
+            )
+            if start is not None:
+                shifts.append((start, end))
+
+        weekly = list(default_weekly_hours())
+        for weekday, shifts in weekly_by_resource.get(None, {}).items():
+            weekly[weekday] = tuple(shifts)
+        overrides = {
+            date_obj: tuple(shifts)
+            for date_obj, shifts in overrides_by_resource.get(None, {}).items()
+        }
+
+        calendars = {}
+        for resource_id in (set(weekly_by_resource) | set(overrides_by_resource)) - {
+            None
+        }:
+            resource_weekly = list(weekly)
+            for weekday, shifts in weekly_by_resource.get(resource_id, {}).items():
+                resource_weekly[weekday] = tuple(shifts)
+            resource_overrides = dict(overrides)
+            for date_obj, shifts in overrides_by_resource.get(resource_id, {}).items():
+                resource_overrides[date_obj] = tuple(shifts)
+            calendars[resource_id] = WorkingCalendar(
+                tuple(resource_weekly), resource_overrides
+            )
+
+        self.calendar = WorkingCalendar(tuple(weekly), overrides)
+        self.calendars = calendars
+        self.logger.debug(
+            f"Рабочие часы загружены: {len(weekly_rows)} строк шаблона, "
+            f"{len(override_rows)} строк исключений, {len(calendars)} ресурсов со своими часами."
+        )
+        return True
+
+    async def _replace(
+        self,
+        table: str,
+        column: str,
+        key,
+        shifts: List[Shift],
+        resource_id: Optional[int],
+    ) -> bool:
+        """Заменить смены дня недели или даты одной транзакцией."""
+
+        error = validate_shifts(shifts)
+        if error:
+            self.logger.error(f"Некорректные рабочие часы для {key}: {error}")
+            return False
+
+        # Строка без времени начала и конца означает выходной.
+        rows = [(key, start, end, resource_id) for start, end in sorted(shifts)] or [
+            (key, None, None, resource_id)
+        ]
+        try:
+            async with self.db.transaction() as conn:
+                await conn.execute(
+                    f"DELETE FROM {table} WHERE {column} = $1 AND resource_id IS NOT DISTINCT FROM $2",
+                    key,
+                    resource_id,
+                )
+                await conn.executemany(
+                    f"INSERT INTO {table} ({column}, start_time, end_time, resource_id) VALUES ($1, $2, $3, $4)",
+                    rows,
+                )
+        except Exception as e:
+            self.logger.error(f"Ошибка при сохранении рабочих часов для {key}: {e}")
+            return False
+        return await self.load()
+
+    async def _delete(
+        self, table: str, column: str, key, resource_id: Optional[int]
+    ) -> bool:
+        """Удалить смены дня недели или даты."""
+
+        try:
+            async with self.db.transaction() as conn:
+                await conn.execute(
+                    f"DELETE FROM {table} WHERE {column} = $1 AND resource_id IS NOT DISTINCT FROM $2",
+                    key,
+                    resource_id,
+                )
+        except Exception as e:
+            self.logger.error(f"Ошибка при сбросе рабочих часов для {key}: {e}")
+            return False
+        return await self.load()
+
+    async def set_weekday_hours(
+        self, weekday: int, shifts: List[Shift], resource_id: Optional[int] = None
+    ) -> bool:
+        """Задать смены для дня недели (0 — понедельник); пустой список — выходной.
+
+        Без resource_id задаются часы салона."""
+
+        if not 0 <= weekday <= 6:
+            self.logger.error(f"Некорректный день недели: {weekday}")
+            return False
+        if not await self._replace(
+            "WorkingHours", "weekday", weekday, shifts, resource_id
+        ):
+            return False
+        self.availability_cache.clear()
+        self.logger.debug(
+            f"Рабочие часы ресурса {resource_id} для дня недели {WEEKDAY_NAMES[weekday]}: {format_shifts(shifts)}"
+        )
+        return True
+
+    async def reset_weekday_hours(
+        self, weekday: int, resource_id: Optional[int] = None
+    ) -> bool:
+        """Вернуть дню недели часы по умолчанию: для ресурса — часы салона,
+        для салона — часы из констант."""
+
+        if not 0 <= weekday <= 6:
+            self.logger.error(f"Некорректный день недели: {weekday}")
+            return False
+        if not await self._delete("WorkingHours", "weekday", weekday, resource_id):
+            return False
+        self.availability_cache.clear()
+        return True
+
+    async def set_date_hours(
+        self, date_obj: date, shifts: List[Shift], resource_id: Optional[int] = None
+    ) -> bool:
+        """Задать смены для отдельной даты; пустой список — выходной."""
+
+        if not await self._replace(
+            "WorkingHoursOverrides", "date", date_obj, shifts, resource_id
+        ):
+            return False
+        self.availability_cache.invalidate([date_obj])
+        self.logger.debug(
+            f"Рабочие часы ресурса {resource_id} для {date_obj}: {format_shifts(shifts)}"
+        )
+        return True
+
+    async def reset_date_hours(
+        self, date_obj: date, resource_id: Optional[int] = None
+    ) -> bool:
+        """Удалить исключение для даты: действуют часы ее дня недели."""
+
+        if not await self._delete(
+            "WorkingHoursOverrides", "date", date_obj, resource_id
+        ):
+            return False
+        self.availability_cache.invalidate([date_obj])
+        return True
+
+    def format_calendar(self, resource_id: Optional[int] = None) -> str:
+        """Сформировать текстовое описание шаблона недели и исключений."""
+
+        calendar = self.calendar_for(resource_id)
+        if resource_id is None:
+            lines = ["Рабочие часы салона по дням недели:"]
+        else:
+            name = self.resources.names.get(resource_id, resource_id)
+            lines = [f"Рабочие часы #{resource_id} {name} по дням недели:"]
+        for weekday, shifts in enumerate(calendar.weekly):
+            lines.append(
+                f"{weekday + 1}. {WEEKDAY_NAMES[weekday]}: {format_shifts(shifts)}"
+            )
+        if calendar.overrides:
+            lines.append("")
+            lines.append("Исключения:")
+            for date_obj in sorted(calendar.overrides):
+                lines.append(
+                    f"{date_obj.strftime('%d.%m.%Y')}: {format_shifts(calendar.overrides[date_obj])}"
+                )
+        return "\n".join(lines)
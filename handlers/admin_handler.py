@@ -25,6 +25,7 @@ from keyboards.general_keyboards import *
 from states import *
 from utils.formatter import format_date_for_keyboard
 from utils.utils import create_appointment_from_context
+from database.appointments import BookingStatus
 
 
 class AdminHandler:
@@ -265,21 +266,21 @@ class AdminHandler:
 
             current_date = start_date
             while current_date <= end_date:
-                if current_date.weekday() == 6:
+                if context.bot_data["db"]["working_hours"].is_day_off(current_date):
                     logger.debug(
-                        f"Пропуск воскресенья: {current_date.strftime('%d.%m.%Y')}"
+                        f"Пропуск выходного дня: {current_date.strftime('%d.%m.%Y')}"
                     )
                     current_date += timedelta(days=1)
                     continue
 
-                if context.bot_data["db"]["blocked_slots"].is_day_blocked(current_date):
+                if await context.bot_data["db"]["blocked_slots"].is_day_blocked(current_date):
                     logger.debug(
                         f"День {current_date.strftime('%d.%m.%Y')} уже заблокирован."
                     )
                     current_date += timedelta(days=1)
                     continue
 
-                success = context.bot_data["db"]["blocked_slots"].block_day(
+                success = await context.bot_data["db"]["blocked_slots"].block_day(
                     current_date
                 )
                 if not success:
@@ -316,12 +317,12 @@ class AdminHandler:
                 await self.interface.error_back_to_menu(update, error_message)
                 return ADMIN_BLOCK
 
-            if date.weekday() == 6:
-                await self.interface.day_is_sunday(update, date=text)
+            if context.bot_data["db"]["working_hours"].is_day_off(date):
+                await self.interface.day_is_day_off(update, date=text)
                 await self.interface.main_menu(update)
                 return ADMIN_MAIN_MENU
 
-            is_day_blocked = context.bot_data["db"]["blocked_slots"].is_day_blocked(
+            is_day_blocked = await context.bot_data["db"]["blocked_slots"].is_day_blocked(
                 date
             )
             if is_day_blocked:
@@ -349,7 +350,7 @@ class AdminHandler:
         if text == REPLY_ADMIN_BUTTONS["block_whole_day"]:
             date = context.user_data.get("date_obj")
             blocked_slots = context.bot_data["db"].get("blocked_slots")
-            if blocked_slots.block_day(date):
+            if await blocked_slots.block_day(date):
                 await update.message.reply_text(
                     text=f"День {context.user_data.get('single_date')} заблокирован."
                 )
@@ -362,7 +363,7 @@ class AdminHandler:
 
         if text == REPLY_ADMIN_BUTTONS["select_time"]:
             date = context.user_data.get("date_obj")
-            available_slots = context.bot_data["db"][
+            available_slots = await context.bot_data["db"][
                 "schedule"
             ].get_available_time_slots(date)
 
@@ -424,7 +425,7 @@ class AdminHandler:
 
                 date = context.user_data.get("date_obj")
 
-                if context.bot_data["db"]["blocked_slots"].block_time_slot(
+                if await context.bot_data["db"]["blocked_slots"].block_time_slot(
                     date, start_time, end_time
                 ):
                     await update.message.reply_text(
@@ -525,17 +526,16 @@ class AdminHandler:
                 month, year = map(int, month_str.split("_"))
                 context.user_data["month_selected"] = (year, month)
 
-                available_dates = context.bot_data["db"][
-                    "schedule"
-                ].get_available_dates(
-                    procedure=context.user_data.get("procedure_selected"),
-                    target_month=context.user_data.get("month_selected"),
+                available_dates, keyboard = await context.bot_data["general"][
+                    "date_keyboards"
+                ].get(
+                    year,
+                    month,
+                    context.user_data.get("procedure_selected"),
+                    context.user_data["tg_id"],
                 )
                 if available_dates:
-                    keyboard = self.dyn_keyboards.date(
-                        year, month, available_dates, context.user_data["tg_id"]
-                    )
-                    context.user_data["date_keyboard"] = keyboard
+                    save_date_keyboard(context, year, month, available_dates)
                     await context.bot.send_message(
                         chat_id=chat_id,
                         text=ADMIN_MESSAGES["select_date"],
@@ -547,7 +547,7 @@ class AdminHandler:
                     await context.bot.send_message(
                         chat_id=chat_id,
                         text=ADMIN_MESSAGES["no_dates_available"],
-                        reply_markup=self.interface.general_keyboards["months"],
+                        reply_markup=self.dyn_keyboards.months(),
                     )
                     return ADMIN_SELECT_MONTH
 
@@ -578,7 +578,7 @@ class AdminHandler:
                     text=ADMIN_MESSAGES["error_try_again"]
                     + "\n"
                     + ADMIN_MESSAGES["select_month"],
-                    reply_markup=self.interface.general_keyboards["months"],
+                    reply_markup=self.dyn_keyboards.months(),
                 )
                 return ADMIN_SELECT_MONTH
 
@@ -595,30 +595,60 @@ class AdminHandler:
                 await context.bot.send_message(
                     chat_id=chat_id,
                     text=ADMIN_MESSAGES["select_month"],
-                    reply_markup=self.interface.general_keyboards["months"],
+                    reply_markup=self.dyn_keyboards.months(),
                 )
                 return ADMIN_SELECT_MONTH
 
+            elif query.data == "back_to_dates":
+                # Кнопка из сообщения о том, что на выбранную дату не осталось слотов:
+                # даты месяца пересчитываются, чтобы не предлагать занятый день снова.
+                await query.delete_message()
+                year, month = context.user_data["month_selected"]
+
+                available_dates, keyboard = await context.bot_data["general"][
+                    "date_keyboards"
+                ].get(
+                    year,
+                    month,
+                    context.user_data.get("procedure_selected"),
+                    context.user_data["tg_id"],
+                )
+
+                if available_dates:
+                    save_date_keyboard(context, year, month, available_dates)
+                    await context.bot.send_message(
+                        chat_id=chat_id,
+                        text=ADMIN_MESSAGES["select_date"],
+                        reply_markup=keyboard,
+                    )
+                    return ADMIN_SELECT_DATE
+
+                else:
+                    await context.bot.send_message(
+                        chat_id=chat_id,
+                        text=ADMIN_MESSAGES["no_dates_available"],
+                        reply_markup=self.dyn_keyboards.months(),
+                    )
+                    return ADMIN_SELECT_MONTH
+
             elif query.data.startswith("prev_month_") or query.data.startswith(
                 "next_month_"
             ):
                 _, _, year, month = query.data.split("_")
                 year, month = int(year), int(month)
 
-                schedule = context.bot_data["db"].get("schedule")
-
-                available_dates = schedule.get_available_dates(
-                    procedure=context.user_data.get("procedure_selected"),
-                    target_month=(year, month),
+                available_dates, keyboard = await context.bot_data["general"][
+                    "date_keyboards"
+                ].get(
+                    year,
+                    month,
+                    context.user_data.get("procedure_selected"),
+                    context.user_data["tg_id"],
                 )
 
                 context.user_data["month_selected"] = (year, month)
 
-                keyboard = self.dyn_keyboards.date(
-                    year, month, available_dates, context.user_data["tg_id"]
-                )
-
-                context.user_data["date_keyboard"] = keyboard
+                save_date_keyboard(context, year, month, available_dates)
 
                 await query.edit_message_reply_markup(reply_markup=keyboard)
                 return ADMIN_SELECT_DATE
@@ -634,7 +664,7 @@ class AdminHandler:
                 )
 
                 schedule = context.bot_data["db"].get("schedule")
-                available_slots = schedule.get_available_time_slots(
+                available_slots = await schedule.get_available_time_slots(
                     selected_date, context.user_data.get("procedure_selected")
                 )
 
@@ -670,7 +700,7 @@ class AdminHandler:
 
                 else:
                     keyboard = self.dyn_keyboards.time(available_slots, context)
-                    context.user_data["time_keyboard"] = keyboard
+                    save_time_keyboard(context, available_slots)
                     await context.bot.send_message(
                         chat_id=chat_id,
                         text=f"{format_date_for_keyboard(selected_date)}\n\n{ADMIN_MESSAGES["select_time"]}",
@@ -703,7 +733,7 @@ class AdminHandler:
                 await context.bot.send_message(
                     chat_id=chat_id,
                     text=f"{ADMIN_MESSAGES['error_try_again']}\n{ADMIN_MESSAGES["select_date"]}",
-                    reply_markup=context.user_data["date_keyboard"],
+                    reply_markup=saved_date_keyboard(context),
                 )
                 return ADMIN_SELECT_DATE
 
@@ -762,7 +792,7 @@ class AdminHandler:
                 await context.bot.send_message(
                     chat_id=chat_id,
                     text=f"{ADMIN_MESSAGES['error_try_again']}\n{ADMIN_MESSAGES["select_time"]}",
-                    reply_markup=context.user_data["time_keyboard"],
+                    reply_markup=saved_time_keyboard(context),
                 )
                 return ADMIN_SELECT_TIME
 
@@ -817,6 +847,43 @@ class AdminHandler:
             )
             return ADMIN_CONFIRMATION
 
+    async def slot_taken(self, context: CallbackContext):
+        """Сообщить, что выбранное время уже занято, и предложить выбрать другое."""
+
+        chat_id = context.user_data["chat_id"]
+        selected_date = context.user_data["date_selected"]
+
+        schedule = context.bot_data["db"].get("schedule")
+        available_slots = await schedule.get_available_time_slots(
+            selected_date, context.user_data.get("procedure_selected")
+        )
+
+        if not available_slots:
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=f"{ADMIN_MESSAGES["slot_taken"]}\n\n{ADMIN_MESSAGES["no_slots_available"]}",
+                reply_markup=InlineKeyboardMarkup(
+                    [
+                        [
+                            InlineKeyboardButton(
+                                INLINE_BUTTONS["back"],
+                                callback_data="back_to_dates",
+                            )
+                        ]
+                    ]
+                ),
+            )
+            return ADMIN_SELECT_DATE
+
+        keyboard = self.dyn_keyboards.time(available_slots, context)
+        save_time_keyboard(context, available_slots)
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"{ADMIN_MESSAGES["slot_taken"]}\n\n{format_date_for_keyboard(selected_date)}\n\n{ADMIN_MESSAGES["select_time"]}",
+            reply_markup=keyboard,
+        )
+        return ADMIN_SELECT_TIME
+
     async def confirmation(self, update: Update, context: CallbackContext):
         """Хэндлер для подтверждения или отмены записи."""
 
@@ -828,18 +895,18 @@ class AdminHandler:
 
             if query.data == "confirm":
                 appointments = context.bot_data["db"].get("appointments")
-                if context.user_data["reschedule"]:
-                    appointment_id = context.user_data.get("appointment_id")
-                    appointments.delete_appointment(appointment_id)
-
                 try:
-                    await create_appointment_from_context(update, context)
-                    db_success = True
+                    booking_status = await create_appointment_from_context(
+                        update, context
+                    )
                 except Exception as e:
-                    db_success = False
+                    booking_status = BookingStatus.ERROR
                     appointments.logger.error(f"Ошибка при записи в базу данных: {e}")
 
-                if db_success:
+                if booking_status == BookingStatus.SLOT_TAKEN:
+                    return await self.slot_taken(context)
+
+                if booking_status == BookingStatus.BOOKED:
                     if context.user_data["reschedule"]:
                         notification_message = ADMIN_MESSAGES["appointment_updated"]
                     else:
@@ -920,7 +987,7 @@ class AdminHandler:
                 await context.bot.send_message(
                     chat_id=chat_id,
                     text=ADMIN_MESSAGES["select_date"],
-                    reply_markup=context.user_data["date_keyboard"],
+                    reply_markup=saved_date_keyboard(context),
                 )
                 return ADMIN_SELECT_DATE
         else:
@@ -997,7 +1064,7 @@ class AdminHandler:
             return ADMIN_MAIN_MENU
         elif text == REPLY_ADMIN_BUTTONS["fetch_all_clients"]:
             clients = context.bot_data["db"].get("clients")
-            clients_list = clients.fetch_all_clients()
+            clients_list = await clients.fetch_all_clients()
             if not clients_list:
                 await update.message.reply_text(
                     text=ADMIN_MESSAGES["db_error"],
@@ -1026,8 +1093,8 @@ class AdminHandler:
             return ADMIN_BACK_TO_MENU
         else:
             clients = context.bot_data["db"]["clients"]
-            if clients.client_is_registered_by_phone(text):
-                client_data = clients.get_client_by_telephone(text)
+            if await clients.client_is_registered_by_phone(text):
+                client_data = await clients.get_client_by_telephone(text)
 
                 if client_data:
                     if len(client_data) > 1:
@@ -1056,8 +1123,8 @@ class AdminHandler:
                         client_id = client_data[0][0]
                         context.user_data["client_id"] = client_id
                         clients = context.bot_data["db"]["clients"]
-                        client = clients.get_client_by_id(int(client_id))[0]
-                        context.user_data["client"] = client
+                        client = (await clients.get_client_by_id(int(client_id)))[0]
+                        context.user_data["client"] = tuple(client)
 
                         if len(client) == 4:
                             message = (
@@ -1100,8 +1167,8 @@ class AdminHandler:
 
                 context.user_data["client_id"] = client_id
                 clients = context.bot_data["db"]["clients"]
-                client = clients.get_client_by_id(int(client_id))[0]
-                context.user_data["client"] = client
+                client = (await clients.get_client_by_id(int(client_id)))[0]
+                context.user_data["client"] = tuple(client)
                 if len(client) == 4:
                     message = (
                         "<b>Данные клиента:</b>\n"
@@ -1142,7 +1209,7 @@ class AdminHandler:
 
         if text == REPLY_ADMIN_BUTTONS["view_client_appointments"]:
             context.user_data["prev_state"] = "view_client_appointments"
-            if context.bot_data["db"]["appointments"].client_has_appointments(
+            if await context.bot_data["db"]["appointments"].client_has_appointments(
                 int(client_id)
             ):
                 await self.interface.view_appointments(update, context, int(client_id))
@@ -1183,7 +1250,7 @@ class AdminHandler:
         text = update.message.text
         if text == REPLY_ADMIN_BUTTONS["delete"]:
             client_id = context.user_data["client_id"]
-            if context.bot_data["db"]["clients"].delete_client_by_id(int(client_id)):
+            if await context.bot_data["db"]["clients"].delete_client_by_id(int(client_id)):
                 await update.message.reply_text(
                     text=f"{ADMIN_MESSAGES["client_deleted"]}",
                     reply_markup=ReplyKeyboardRemove(),
@@ -1266,7 +1333,7 @@ class AdminHandler:
 
             if text == REPLY_ADMIN_BUTTONS["view_client_appointments"]:
                 context.user_data["prev_state"] = "view_client_appointments"
-                if context.bot_data["db"]["appointments"].client_has_appointments(
+                if await context.bot_data["db"]["appointments"].client_has_appointments(
                     int(client_id)
                 ):
                     await self.interface.view_appointments(update, context, int(client_id))
@@ -1329,11 +1396,11 @@ class AdminHandler:
             appointment_id = int(context.user_data["appointment_id"])
             appointments = context.bot_data["db"]["appointments"]
 
-            appointment_data = appointments.get_client_data_by_appointment_id(
+            appointment_data = await appointments.get_client_data_by_appointment_id(
                 appointment_id
             )
             try:
-                appointments.delete_appointment(appointment_id)
+                await appointments.delete_appointment(appointment_id)
                 db_success = True
             except Exception as e:
                 db_success = False
@@ -1367,7 +1434,7 @@ class AdminHandler:
 
         if text == REPLY_ADMIN_BUTTONS["back_to_appointments"]:
             context.user_data["reschedule"] = False
-            if context.bot_data["db"]["appointments"].client_has_appointments(int(id)):
+            if await context.bot_data["db"]["appointments"].client_has_appointments(int(id)):
                 await self.interface.view_appointments(update, context, int(id))
                 return ADMIN_VIEW_APPOINTMENTS
             else:
@@ -1,9 +1,14 @@
+from datetime import datetime, time
+from typing import List, Tuple
 from telegram import (
     Update,
 )
 from telegram.ext import ContextTypes
 from config import ADMIN_IDS
+import config
 from consts.messages import ADMIN_MESSAGES, EMOJI
+from database.resources import RESOURCE_KINDS
+from database.working_hours import format_shifts, validate_shifts
 from states import *
 from utils.utils import basic_context_update
 
@@ -26,3 +31,178 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=context.bot_data["user"]["keyboards"]["main_menu"],
         )
         return USER_MAIN_MENU
+
+
+async def query_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показать администратору статистику запросов к базе данных.
+
+    /query_stats dump сохраняет полную статистику в файл, /query_stats reset обнуляет ее.
+    """
+
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    query_stats = context.bot_data["db"]["db"].query_stats
+    action = context.args[0] if context.args else None
+
+    if action == "dump":
+        path = query_stats.dump(getattr(config, "QUERY_STATS_FILE", "query_stats.json"))
+        await update.message.reply_text(
+            ADMIN_MESSAGES["query_stats_dumped"].format(path=path)
+        )
+    elif action == "reset":
+        query_stats.reset()
+        await update.message.reply_text(ADMIN_MESSAGES["query_stats_reset"])
+    else:
+        # Ограничение Telegram на длину сообщения — 4096 символов.
+        await update.message.reply_text(query_stats.format_report()[:4096])
+
+
+def parse_shifts(values: List[str]) -> List[Tuple[time, time]]:
+    """Разобрать смены вида 09:00-13:00; ValueError — если формат неверный."""
+
+    shifts = []
+    for value in values:
+        start, end = value.split("-")
+        shifts.append(
+            (
+                datetime.strptime(start, "%H:%M").time(),
+                datetime.strptime(end, "%H:%M").time(),
+            )
+        )
+    return shifts
+
+
+def parse_resource_id(value: str, resources) -> int:
+    """Разобрать id ресурса вида 2 или #2; ValueError — если такого ресурса нет."""
+
+    resource_id = int(value.lstrip("#"))
+    if resource_id not in resources.names:
+        raise ValueError(value)
+    return resource_id
+
+
+async def working_hours_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показать или изменить рабочие часы салона или ресурса.
+
+    /hours 1 09:00-13:00 14:00-18:00 задает смены понедельника,
+    /hours 08.03.2025 выходной делает дату выходным, сброс возвращает часы по умолчанию,
+    /hours #2 1 10:00-19:00 задает смены понедельника для ресурса 2.
+    """
+
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    working_hours = context.bot_data["db"]["working_hours"]
+    args = list(context.args or [])
+    try:
+        resource_id = None
+        if args and args[0].startswith("#"):
+            resource_id = parse_resource_id(args.pop(0), working_hours.resources)
+    except ValueError:
+        await update.message.reply_text(ADMIN_MESSAGES["hours_usage"])
+        return
+
+    if not args:
+        await update.message.reply_text(working_hours.format_calendar(resource_id))
+        return
+
+    day, *values = args
+    try:
+        if day.isdigit():
+            weekday = int(day) - 1
+            if not 0 <= weekday <= 6:
+                raise ValueError(day)
+            date_obj = None
+        else:
+            weekday = None
+            date_obj = datetime.strptime(day, "%d.%m.%Y").date()
+
+        reset = values == ["сброс"]
+        shifts = []
+        if not reset and values != ["выходной"]:
+            if not values:
+                raise ValueError(day)
+            shifts = parse_shifts(values)
+    except ValueError:
+        await update.message.reply_text(ADMIN_MESSAGES["hours_usage"])
+        return
+
+    error = validate_shifts(shifts)
+    if error:
+        await update.message.reply_text(error)
+        return
+
+    if weekday is not None:
+        if reset:
+            success = await working_hours.reset_weekday_hours(weekday, resource_id)
+        else:
+            success = await working_hours.set_weekday_hours(
+                weekday, shifts, resource_id
+            )
+        shifts = working_hours.calendar_for(resource_id).weekly[weekday]
+    else:
+        if reset:
+            success = await working_hours.reset_date_hours(date_obj, resource_id)
+        else:
+            success = await working_hours.set_date_hours(date_obj, shifts, resource_id)
+        shifts = working_hours.calendar_for(resource_id).shifts(date_obj)
+
+    if not success:
+        await update.message.reply_text(ADMIN_MESSAGES["hours_save_failed"])
+        return
+
+    await update.message.reply_text(
+        ADMIN_MESSAGES["hours_saved"].format(day=day, shifts=format_shifts(shifts))
+    )
+
+
+async def resources_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показать или изменить ресурсы салона: мастеров и кабинеты.
+
+    /resources add master Анна добавляет мастера, /resources off 2 отключает ресурс,
+    /resources block 2 08.03.2025 10:00-12:00 блокирует время только этого ресурса.
+    """
+
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    resources = context.bot_data["db"]["resources"]
+    blocked_slots = context.bot_data["db"]["blocked_slots"]
+    args = list(context.args or [])
+    if not args:
+        await update.message.reply_text(resources.format_resources())
+        return
+
+    action, *values = args
+    try:
+        if action == "add" and len(values) >= 2 and values[0] in RESOURCE_KINDS:
+            resource_id = await resources.add_resource(" ".join(values[1:]), values[0])
+            success = resource_id is not None
+        elif action in ("on", "off") and len(values) == 1:
+            success = await resources.set_active(
+                parse_resource_id(values[0], resources), action == "on"
+            )
+        elif action == "block" and len(values) in (2, 3):
+            resource_id = parse_resource_id(values[0], resources)
+            block_date = datetime.strptime(values[1], "%d.%m.%Y").date()
+            if len(values) == 2:
+                success = await blocked_slots.block_day(block_date, resource_id)
+            else:
+                [(start_time, end_time)] = parse_shifts(values[2:])
+                if validate_shifts([(start_time, end_time)]):
+                    raise ValueError(values[2])
+                success = await blocked_slots.block_time_slot(
+                    block_date, start_time, end_time, resource_id
+                )
+        else:
+            raise ValueError(action)
+    except ValueError:
+        await update.message.reply_text(ADMIN_MESSAGES["resources_usage"])
+        return
+
+    if not success:
+        await update.message.reply_text(ADMIN_MESSAGES["resources_update_failed"])
+        return
+
+    await update.message.reply_text(resources.format_resources())
@@ -14,6 +14,7 @@ from telegram.ext import (
 )
 
 from config import ID_TO_SEND_NOTIFICATIONS
+from consts.constants import PROCEDURES
 from keyboards.general_keyboards import *
 from consts.messages import (
     CONFIRMATION_MESSAGE,
@@ -22,9 +23,14 @@ from consts.messages import (
     REPLY_USER_BUTTONS,
     USER_MESSAGES,
 )
-from utils.utils import create_appointment_from_context
+from utils.utils import (
+    create_appointment_from_context,
+    forget_client_for_update,
+    get_client_for_update,
+)
+from database.appointments import BookingStatus
 from states import *
-from datetime import datetime
+from datetime import datetime, timedelta
 from interfaces.user_interface import *
 
 
@@ -131,8 +137,7 @@ class UserHandler:
             return USER_SELECT_PROCEDURE
 
         elif text == REPLY_USER_BUTTONS["client_account"]:
-            tg_id = update.message.from_user.id
-            if context.bot_data["db"]["clients"].client_is_registered_by_tg_id(tg_id):
+            if await get_client_for_update(update, context):
                 await self.interface.user_account(update, context)
                 return USER_CLIENT_ACCOUNT
             else:
@@ -206,7 +211,7 @@ class UserHandler:
 
             else:
                 clients = context.bot_data["db"]["clients"]
-                client_data = clients.get_client_by_telephone(phone)
+                client_data = await clients.get_client_by_telephone(phone)
 
                 if client_data:
                     if len(client_data) > 1:
@@ -216,7 +221,6 @@ class UserHandler:
                         )
                         return USER_MAIN_MENU
                     else:
-                        context.user_data["client_data"] = client_data[0]
                         await self.interface.user_account(update, context)
                         return USER_CLIENT_ACCOUNT
                 else:
@@ -234,11 +238,11 @@ class UserHandler:
         text = update.message.text
 
         if text == REPLY_USER_BUTTONS["my_appointments"]:
-            id = context.bot_data["db"]["clients"].get_client_id_by_tg_id(
-                context.user_data["tg_id"]
-            )
+            client = await get_client_for_update(update, context)
+            id = client["id"] if client else None
             context.user_data["id"] = id
-            if context.bot_data["db"]["appointments"].client_has_appointments(id):
+            appointments = context.bot_data["db"]["appointments"]
+            if id and await appointments.client_has_appointments(id):
                 await self.interface.appointments(update, context, id)
                 return USER_APPOINTMENTS
             else:
@@ -332,7 +336,8 @@ class UserHandler:
                 clients = context.bot_data["db"]["clients"]
                 tg_id = context.user_data["tg_id"]
 
-                clients.update_client_phone_by_tg_id(tg_id, phone)
+                await clients.update_client_phone_by_tg_id(tg_id, phone)
+                forget_client_for_update(context)
 
                 await context.bot.send_message(
                     chat_id=context.user_data["chat_id"],
@@ -353,7 +358,8 @@ class UserHandler:
             context.user_data["name"] = name
             clients = context.bot_data["db"]["clients"]
             tg_id = context.user_data["tg_id"]
-            clients.update_client_name_by_tg_id(tg_id, name)
+            await clients.update_client_name_by_tg_id(tg_id, name)
+            forget_client_for_update(context)
             await update.message.reply_text(
                 text=f"{USER_MESSAGES["name_updated"]}: {name}.",
                 reply_markup=self.interface.user_keyboards["after_edit"],
@@ -365,11 +371,11 @@ class UserHandler:
     ):
         text = update.message.text
         if text == REPLY_USER_BUTTONS["my_appointments"]:
-            id = context.bot_data["db"]["clients"].get_client_id_by_tg_id(
-                context.user_data["tg_id"]
-            )
+            client = await get_client_for_update(update, context)
+            id = client["id"] if client else None
             context.user_data["id"] = id
-            if context.bot_data["db"]["appointments"].client_has_appointments(id):
+            appointments = context.bot_data["db"]["appointments"]
+            if id and await appointments.client_has_appointments(id):
                 await self.interface.appointments(update, context, id)
                 return USER_APPOINTMENTS
             else:
@@ -526,11 +532,11 @@ class UserHandler:
             appointment_id = int(context.user_data["appointment_id"])
             appointments = context.bot_data["db"]["appointments"]
 
-            appointment_data = appointments.get_client_data_by_appointment_id(
+            appointment_data = await appointments.get_client_data_by_appointment_id(
                 appointment_id
             )
             try:
-                appointments.delete_appointment(appointment_id)
+                await appointments.delete_appointment(appointment_id)
                 db_success = True
             except Exception as e:
                 db_success = False
@@ -645,16 +651,17 @@ class UserHandler:
             month, year = map(int, month_str.split("_"))
             context.user_data["month_selected"] = (year, month)
 
-            available_dates = context.bot_data["db"]["schedule"].get_available_dates(
-                procedure=context.user_data.get("procedure_selected"),
-                target_month=context.user_data.get("month_selected"),
+            available_dates, keyboard = await context.bot_data["general"][
+                "date_keyboards"
+            ].get(
+                year,
+                month,
+                context.user_data.get("procedure_selected"),
+                context.user_data["tg_id"],
             )
 
             if available_dates:
-                keyboard = self.dyn_keyboards.date(
-                    year, month, available_dates, context.user_data["tg_id"]
-                )
-                context.user_data["date_keyboard"] = keyboard
+                save_date_keyboard(context, year, month, available_dates)
                 await context.bot.send_message(
                     chat_id=chat_id,
                     text=USER_MESSAGES["select_date"],
@@ -666,7 +673,7 @@ class UserHandler:
                 await context.bot.send_message(
                     chat_id=chat_id,
                     text=USER_MESSAGES["no_dates_available"],
-                    reply_markup=self.interface.general_keyboards["months"],
+                    reply_markup=self.dyn_keyboards.months(),
                 )
                 return USER_SELECT_MONTH
 
@@ -676,7 +683,7 @@ class UserHandler:
                 text=USER_MESSAGES["error_try_again"]
                 + "\n"
                 + USER_MESSAGES["select_month"],
-                reply_markup=self.interface.general_keyboards["months"],
+                reply_markup=self.dyn_keyboards.months(),
             )
             return USER_SELECT_MONTH
 
@@ -689,7 +696,7 @@ class UserHandler:
             text=USER_MESSAGES["error_try_again"]
             + "\n"
             + USER_MESSAGES["select_month"],
-            reply_markup=self.interface.general_keyboards["months"],
+            reply_markup=self.dyn_keyboards.months(),
         )
         return USER_SELECT_MONTH
 
@@ -705,29 +712,60 @@ class UserHandler:
             await context.bot.send_message(
                 chat_id=chat_id,
                 text=USER_MESSAGES["select_month"],
-                reply_markup=self.interface.general_keyboards["months"],
+                reply_markup=self.dyn_keyboards.months(),
             )
             return USER_SELECT_MONTH
 
+        elif query.data == "back_to_dates":
+            # Кнопка из сообщения о том, что на выбранную дату не осталось слотов:
+            # даты месяца пересчитываются, чтобы не предлагать занятый день снова.
+            await query.delete_message()
+            year, month = context.user_data["month_selected"]
+
+            available_dates, keyboard = await context.bot_data["general"][
+                "date_keyboards"
+            ].get(
+                year,
+                month,
+                context.user_data.get("procedure_selected"),
+                context.user_data["tg_id"],
+            )
+
+            if available_dates:
+                save_date_keyboard(context, year, month, available_dates)
+                await context.bot.send_message(
+                    chat_id=chat_id,
+                    text=USER_MESSAGES["select_date"],
+                    reply_markup=keyboard,
+                )
+                return USER_SELECT_DATE
+
+            else:
+                await context.bot.send_message(
+                    chat_id=chat_id,
+                    text=USER_MESSAGES["no_dates_available"],
+                    reply_markup=self.dyn_keyboards.months(),
+                )
+                return USER_SELECT_MONTH
+
         elif query.data.startswith("prev_month_") or query.data.startswith(
             "next_month_"
         ):
             _, _, year, month = query.data.split("_")
             year, month = int(year), int(month)
 
-            schedule = context.bot_data["db"].get("schedule")
-
-            available_dates = schedule.get_available_dates(
-                procedure=context.user_data.get("procedure_selected"),
-                target_month=(year, month),
+            available_dates, keyboard = await context.bot_data["general"][
+                "date_keyboards"
+            ].get(
+                year,
+                month,
+                context.user_data.get("procedure_selected"),
+                context.user_data["tg_id"],
             )
 
             context.user_data["month_selected"] = (year, month)
 
-            keyboard = self.dyn_keyboards.date(
-                year, month, available_dates, context.user_data["tg_id"]
-            )
-            context.user_data["date_keyboard"] = keyboard
+            save_date_keyboard(context, year, month, available_dates)
 
             await query.edit_message_reply_markup(reply_markup=keyboard)
             return USER_SELECT_DATE
@@ -743,8 +781,10 @@ class UserHandler:
             )
 
             schedule = context.bot_data["db"].get("schedule")
-            available_slots = schedule.get_available_time_slots(
-                selected_date, context.user_data.get("procedure_selected")
+            available_slots = await schedule.get_available_time_slots(
+                selected_date,
+                context.user_data.get("procedure_selected"),
+                owner_id=context.user_data["tg_id"],
             )
 
             if not available_slots:
@@ -765,7 +805,7 @@ class UserHandler:
                 return USER_SELECT_DATE
 
             keyboard = self.dyn_keyboards.time(available_slots, context)
-            context.user_data["time_keyboard"] = keyboard
+            save_time_keyboard(context, available_slots)
             await context.bot.send_message(
                 chat_id=chat_id,
                 text=f"{format_date_for_client_interface(selected_date)}\n\n{USER_MESSAGES["select_time"]}",
@@ -780,7 +820,7 @@ class UserHandler:
 
         await update.message.reply_text(
             text=USER_MESSAGES["error_try_again"] + "\n" + USER_MESSAGES["select_date"],
-            reply_markup=context.user_data.get("date_keyboard"),
+            reply_markup=saved_date_keyboard(context),
         )
         return USER_SELECT_DATE
 
@@ -802,6 +842,7 @@ class UserHandler:
                 )
                 return USER_SELECT_PROCEDURE
 
+            context.bot_data["db"]["slot_holds"].release(context.user_data["tg_id"])
             await self.interface.dates(context)
             return USER_SELECT_DATE
 
@@ -816,6 +857,18 @@ class UserHandler:
 
             context.user_data["time_selected"] = selected_time
 
+            selected_date = context.user_data["date_selected"]
+            end_time = (
+                datetime.combine(selected_date, selected_time)
+                + timedelta(
+                    minutes=PROCEDURES[context.user_data["procedure_selected"]]
+                )
+            ).time()
+            if not await context.bot_data["db"]["schedule"].hold_slot(
+                context.user_data["tg_id"], selected_date, selected_time, end_time
+            ):
+                return await self.slot_taken(context)
+
             await self.interface.enter_name(context)
             return USER_ENTER_NAME
 
@@ -826,7 +879,7 @@ class UserHandler:
 
         await update.message.reply_text(
             text=USER_MESSAGES["error_try_again"] + "\n" + USER_MESSAGES["select_time"],
-            reply_markup=context.user_data.get("time_keyboard"),
+            reply_markup=saved_time_keyboard(context),
         )
         return USER_SELECT_TIME
 
@@ -905,14 +958,23 @@ class UserHandler:
         await query.delete_message()
 
         if query.data == "confirm":
+            appointments = context.bot_data["db"].get("appointments")
+            try:
+                booking_status = await create_appointment_from_context(
+                    update, context
+                )
+            except Exception as e:
+                booking_status = BookingStatus.ERROR
+                appointments.logger.error(f"Ошибка при записи в базу данных: {e}")
+
+            if booking_status == BookingStatus.SLOT_TAKEN:
+                return await self.slot_taken(context)
+
             await context.bot.send_message(
                 chat_id=chat_id, text=USER_MESSAGES["booking_success"]
             )
             await self.interface.proceed(context)
             if context.user_data["reschedule"]:
-                appointments = context.bot_data["db"].get("appointments")
-                appointment_id = context.user_data.get("appointment_id")
-                appointments.delete_appointment(appointment_id)
                 notification_message = (
                     f'Клиент {context.user_data["name"]} перенес запись на процедуру '
                     f'"{context.user_data["procedure_selected"]}".\n'
@@ -930,14 +992,7 @@ class UserHandler:
                     f'время: {context.user_data["time_selected"].strftime("%H:%M")}.\n'
                     f'Телефон: {context.user_data["phone"]}\n'
                 )
-            try:
-                await create_appointment_from_context(update, context)
-                db_success = True
-            except Exception as e:
-                db_success = False
-                appointments.logger.error(f"Ошибка при записи в базу данных: {e}")
-
-            if db_success:
+            if booking_status == BookingStatus.BOOKED:
                 notification_message += (
                     f"\n{EMOJI['success']} Запись добавлена в базу данных."
                 )
@@ -959,6 +1014,7 @@ class UserHandler:
                 return USER_AFTER_EDIT
 
         elif query.data == "cancel":
+            context.bot_data["db"]["slot_holds"].release(context.user_data["tg_id"])
             if not context.user_data["reschedule"]:
                 await self.interface.booking_cancelled(context)
                 return USER_AFTER_CONFIRMATION
@@ -975,6 +1031,47 @@ class UserHandler:
             await self.interface.back_to_edit(context)
             return USER_ENTER_PHONE
 
+    async def slot_taken(self, context: CallbackContext):
+        """Сообщить, что выбранное время уже занято, и предложить выбрать другое."""
+
+        chat_id = context.user_data["chat_id"]
+        selected_date = context.user_data["date_selected"]
+
+        context.bot_data["db"]["slot_holds"].release(context.user_data["tg_id"])
+
+        schedule = context.bot_data["db"].get("schedule")
+        available_slots = await schedule.get_available_time_slots(
+            selected_date,
+            context.user_data.get("procedure_selected"),
+            owner_id=context.user_data["tg_id"],
+        )
+
+        if not available_slots:
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=f"{USER_MESSAGES["slot_taken"]}\n\n{USER_MESSAGES["no_slots_available"]}",
+                reply_markup=InlineKeyboardMarkup(
+                    [
+                        [
+                            InlineKeyboardButton(
+                                INLINE_BUTTONS["back"],
+                                callback_data="back_to_dates",
+                            )
+                        ]
+                    ]
+                ),
+            )
+            return USER_SELECT_DATE
+
+        keyboard = self.dyn_keyboards.time(available_slots, context)
+        save_time_keyboard(context, available_slots)
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"{USER_MESSAGES["slot_taken"]}\n\n{format_date_for_client_interface(selected_date)}\n\n{USER_MESSAGES["select_time"]}",
+            reply_markup=keyboard,
+        )
+        return USER_SELECT_TIME
+
     async def confirmation_unexpected_input(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
@@ -10,6 +10,11 @@ from telegram import (
 )
 from telegram.ext import ContextTypes
 from consts.messages import ADMIN_MESSAGES, INLINE_BUTTONS, REPLY_ADMIN_BUTTONS, EMOJI
+from keyboards.general_keyboards import (
+    months_keyboard,
+    saved_date_keyboard,
+    saved_time_keyboard,
+)
 from utils.formatter import format_date_for_client_interface, format_date_for_keyboard
 
 
@@ -63,7 +68,7 @@ class AdminInterface:
     async def months(self, update: Update):
         await update.message.reply_text(
             ADMIN_MESSAGES["select_month"],
-            reply_markup=self.general_keyboards["months"],
+            reply_markup=months_keyboard(),
         )
 
     async def appointments_menu(self, update: Update):
@@ -76,7 +81,7 @@ class AdminInterface:
         await context.bot.send_message(
             chat_id=context.user_data["chat_id"],
             text=ADMIN_MESSAGES["select_date"],
-            reply_markup=context.user_data.get("date_keyboard"),
+            reply_markup=saved_date_keyboard(context),
         )
 
     async def back_to_time(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -87,7 +92,7 @@ class AdminInterface:
 
         await update.message.reply_text(
             text=f"{format_date_for_client_interface(context.user_data['date_selected'])}\n{ADMIN_MESSAGES["select_time"]}",
-            reply_markup=context.user_data.get("time_keyboard"),
+            reply_markup=saved_time_keyboard(context),
         )
 
     async def invalid_phone_format(self, update: Update):
@@ -160,21 +165,23 @@ class AdminInterface:
             reply_markup=reply_markup,
         )
 
-    async def day_is_sunday(self, update: Update, date: str):
+    async def day_is_day_off(self, update: Update, date: str):
         keyboard = [[REPLY_ADMIN_BUTTONS["back_to_menu"]]]
         reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
         await update.message.reply_text(
-            text=f"{EMOJI['blue_heart']} {date} - это воскресенье. Забыла? У тебя выходной!",
+            text=f"{EMOJI['blue_heart']} {date} - нерабочий день. Забыла? У тебя выходной!",
             reply_markup=reply_markup,
         )
 
     async def view_appointments(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE, client_id: int
     ):
-        appointments_list = context.bot_data["db"][
+        appointments_list = await context.bot_data["db"][
             "appointments"
         ].get_client_appointments(client_id)
-        context.user_data["appointments_list"] = appointments_list
+        context.user_data["appointments_list"] = [
+            tuple(appointment) for appointment in appointments_list
+        ]
 
         keyboard = []
         for appointment in context.user_data["appointments_list"]:
@@ -266,15 +273,18 @@ class AdminInterface:
         self, context: ContextTypes.DEFAULT_TYPE, date: date
     ):
         appointments = context.bot_data["db"].get("appointments")
-        appointment_list = appointments.get_appointments_by_date(date)
+        appointment_list = await appointments.get_appointments_by_date(date)
         if not appointment_list:
             final_message = ADMIN_MESSAGES["no_appointments"]
         else:
             date_str = datetime.strftime(date, "%d.%m.%Y")
             final_message = f"<b>{date_str}</b>\n"
+            show_resource = len(context.bot_data["db"]["resources"].names) > 1
             for appointment in appointment_list:
                 text = "---------------\n"
                 text += appointment[4].strftime("%H:%M")
+                if show_resource and appointment[6]:
+                    text += f", {appointment[6]}"
                 text += "\n"
                 text += f"{appointment[1]}\n{appointment[2]}, {appointment[3]}\n"
                 final_message += text
@@ -317,7 +327,7 @@ class AdminInterface:
 
         await update.message.reply_text(
             text=f"{context.user_data['date_selected']}\n{ADMIN_MESSAGES["select_time"]}",
-            reply_markup=context.user_data.get("time_keyboard"),
+            reply_markup=saved_time_keyboard(context),
         )
 
     async def enter_phone(self, update: Update):
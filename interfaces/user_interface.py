@@ -8,7 +8,13 @@ from telegram import (
 )
 from telegram.ext import ContextTypes
 from consts.messages import INLINE_BUTTONS, USER_MESSAGES, EMOJI, REPLY_USER_BUTTONS
+from keyboards.general_keyboards import (
+    months_keyboard,
+    saved_date_keyboard,
+    saved_time_keyboard,
+)
 from utils.formatter import format_date_for_client_interface
+from utils.utils import get_client_for_update
 
 
 class UserInterface:
@@ -18,7 +24,7 @@ class UserInterface:
 
     async def months(self, update: Update):
         await update.message.reply_text(
-            USER_MESSAGES["select_month"], reply_markup=self.general_keyboards["months"]
+            USER_MESSAGES["select_month"], reply_markup=months_keyboard()
         )
 
     async def procedures(self, update: Update):
@@ -31,7 +37,7 @@ class UserInterface:
         await context.bot.send_message(
             chat_id=context.user_data["chat_id"],
             text=USER_MESSAGES["select_date"],
-            reply_markup=context.user_data.get("date_keyboard"),
+            reply_markup=saved_date_keyboard(context),
         )
 
     async def contact_master(self, update: Update):
@@ -76,7 +82,7 @@ class UserInterface:
 
         await update.message.reply_text(
             text=f"{format_date_for_client_interface(context.user_data['date_selected'])}\n{USER_MESSAGES["select_time"]}",
-            reply_markup=context.user_data.get("time_keyboard"),
+            reply_markup=saved_time_keyboard(context),
         )
 
     async def enter_phone(self, update: Update):
@@ -154,10 +160,12 @@ class UserInterface:
     async def appointments(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE, client_id: int
     ):
-        appointments_list = context.bot_data["db"][
+        appointments_list = await context.bot_data["db"][
             "appointments"
         ].get_client_appointments(client_id)
-        context.user_data["appointments_list"] = appointments_list
+        context.user_data["appointments_list"] = [
+            tuple(appointment) for appointment in appointments_list
+        ]
         appointments_text = f"{EMOJI['user']} <b>Ваши записи:</b>\n————————————\n"
         for appointment in appointments_list:
             procedure = appointment[1]
@@ -220,10 +228,9 @@ class UserInterface:
 
     async def personal_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
 
-        tg_id = context.user_data["tg_id"]
-        clients = context.bot_data["db"].get("clients")
-        name = clients.get_client_name_by_tg_id(tg_id)
-        phone = clients.get_client_phone_by_tg_id(tg_id)
+        client = await get_client_for_update(update, context)
+        name = client["name"] if client else None
+        phone = client["telephone"] if client else None
 
         await update.message.reply_text(
             text=f"<b> Ваши данные </b> \n {EMOJI['phone']} Телефон: {phone}\n {EMOJI['user']} Имя: {name}. \n Хотите что-то изменить?",
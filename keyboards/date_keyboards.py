@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import logging
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from telegram import InlineKeyboardMarkup
+from config import ADMIN_IDS
+from database.schedule import Schedule
+from keyboards.general_keyboards import GeneralKeyboards
+from logger import setup_logger
+
+DateKeyboardKey = Tuple[int, int, Optional[str], bool]
+
+
+class DateKeyboardCache:
+    """Готовые клавиатуры выбора даты по ключу (год, месяц, процедура, администратор).
+
+    Запись хранит доступные даты месяца и клавиатуру вместе с отметкой о состоянии
+    месяца: версией месяца в кэше доступности, версией удержаний слотов месяца
+    и текущей датой. Запись, блокировка или удержание в этом месяце и смена дня
+    меняют отметку, и клавиатура пересчитывается при следующем обращении;
+    изменения в других месяцах ее не затрагивают.
+    Для пользователя, который сам удерживает слот, доступность отличается от общей,
+    поэтому его клавиатура считается без кэша.
+    """
+
+    def __init__(
+        self, schedule: Schedule, keyboards: GeneralKeyboards, max_size: int = 256
+    ):
+        self.schedule = schedule
+        self.keyboards = keyboards
+        self.max_size = max_size
+        self.entries: "OrderedDict[DateKeyboardKey, Tuple[tuple, List[date], InlineKeyboardMarkup]]" = (OrderedDict())
+        self.hits = 0
+        self.misses = 0
+        self.logger = setup_logger(__name__)
+
+    def _stamp(self, year: int, month: int) -> tuple:
+        """Получить отметку о текущем состоянии расписания месяца."""
+
+        return (
+            self.schedule.availability_cache.month_version(year, month),
+            self.schedule.slot_holds.month_version(year, month),
+            date.today(),
+        )
+
+    async def get(
+        self, year: int, month: int, procedure: Optional[str], tg_id: int
+    ) -> Tuple[List[date], InlineKeyboardMarkup]:
+        """Получить доступные даты месяца и клавиатуру выбора даты для пользователя."""
+
+        is_admin = tg_id in ADMIN_IDS
+        # Администратор видит слоты, удерживаемые пользователями, занятыми.
+        owner_id = None if is_admin else tg_id
+
+        stamp = self._stamp(year, month)
+        if owner_id is not None and self.schedule.slot_holds.has_hold(owner_id):
+            return await self._build(year, month, procedure, owner_id, tg_id)
+
+        key = (year, month, procedure, is_admin)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1]), entry[2]
+
+        self.misses += 1
+        available_dates, keyboard = await self._build(
+            year, month, procedure, owner_id, tg_id
+        )
+
+        last_day = (date(year, month, 1) + timedelta(days=32)).replace(
+            day=1
+        ) - timedelta(days=1)
+        # Если расписание менялось во время расчета или часть дней не удалось
+        # получить из базы данных, результат не сохраняется.
+        if self._stamp(
+            year, month
+        ) == stamp and self.schedule.availability_cache.covers(
+            date(year, month, 1), last_day, procedure
+        ):
+            self.entries[key] = (stamp, list(available_dates), keyboard)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Кэш клавиатур дат: %s", self.stats())
+        return available_dates, keyboard
+
+    async def _build(
+        self,
+        year: int,
+        month: int,
+        procedure: Optional[str],
+        owner_id: Optional[int],
+        tg_id: int,
+    ) -> Tuple[List[date], InlineKeyboardMarkup]:
+        """Посчитать доступные даты месяца и построить клавиатуру."""
+
+        available_dates = await self.schedule.get_available_dates(
+            procedure=procedure, target_month=(year, month), owner_id=owner_id
+        )
+        return available_dates, self.keyboards.date(year, month, available_dates, tg_id)
+
+    def stats(self) -> dict:
+        """Получить статистику попаданий в кэш."""
+
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,6 +1,7 @@
 from datetime import date, datetime, time, timedelta
+from functools import lru_cache
 import locale
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -12,235 +13,349 @@ from config import ADMIN_IDS
 from consts.messages import EMOJI, INLINE_BUTTONS, REPLY_USER_BUTTONS
 from consts.constants import MONTHS_LOOKAHEAD, PROCEDURES_KEYBOARD
 
+# Сколько разных клавиатур выбора даты и времени хранится в кэше.
+# Клавиатуры не меняются после создания, поэтому одна и та же разметка
+# используется для всех пользователей с одинаковыми параметрами.
+KEYBOARD_CACHE_SIZE = 512
+
 
 class GeneralKeyboards:
 
     def __init__(self):
-        pass
+        locale.setlocale(locale.LC_TIME, "ru_RU.UTF-8")
 
     def get_keyboards(self) -> Dict:
         return {
-            "months": self.months(),
             "procedures": self.procedures(),
             "confirmation": self.confirmation(),
         }
 
     def months(self) -> InlineKeyboardMarkup:
-        """Создает клавиатуру для выбора месяца."""
-        locale.setlocale(locale.LC_TIME, "ru_RU.UTF-8")
-        today = date.today()
-        keyboard = []
-        row = []
+        """Создает клавиатуру для выбора месяца, начиная с текущего."""
 
-        for i in range(MONTHS_LOOKAHEAD):
-            year_offset = (today.month + i - 1) // 12
-            month = (today.month + i - 1) % 12 + 1
-            current_year = today.year + year_offset
+        return months_keyboard()
 
-            month_name = date(current_year, month, 1).strftime("%B")
-            row.append(
-                InlineKeyboardButton(
-                    month_name.capitalize(),
-                    callback_data=f"month_{month}_{current_year}",
-                )
+    def date(
+        self, year: int, month: int, available_dates: List[date], tg_id: int
+    ) -> InlineKeyboardMarkup:
+        """Создает клавиатуру для выбора даты в указанном месяце."""
+
+        available_days = tuple(
+            sorted(
+                available_date.day
+                for available_date in available_dates
+                if (available_date.year, available_date.month) == (year, month)
             )
+        )
+        return _date_keyboard(
+            year, month, available_days, tg_id in ADMIN_IDS, date.today()
+        )
 
-            if len(row) == 2:
-                keyboard.append(row)
-                row = []
-        if row:
-            keyboard.append(row)
+    def time(
+        self,
+        available_slots: List[Tuple[time, time]],
+        context: ContextTypes.DEFAULT_TYPE,
+    ) -> InlineKeyboardMarkup:
+        """Создает клавиатуру для выбора времени."""
 
-        keyboard.append(
-            [InlineKeyboardButton(INLINE_BUTTONS["back"], callback_data="back")]
+        is_admin = context.user_data["tg_id"] in ADMIN_IDS
+        return _time_keyboard(
+            tuple(available_slots),
+            is_admin,
+            is_admin and not context.user_data["reschedule"],
         )
 
+    def procedures(self) -> ReplyKeyboardMarkup:
+        """Создает клавиатуру для выбора процедуры."""
+        keyboard = PROCEDURES_KEYBOARD
+
+        keyboard.append([KeyboardButton(REPLY_USER_BUTTONS["back_to_menu"])])
+
+        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+    def procedures_buttons(self) -> List:
+        return [button.text for row in self.procedures().keyboard for button in row]
+
+    def confirmation(self) -> InlineKeyboardMarkup:
+        """Создает клавиатуру для подтверждения или отмены записи."""
+        keyboard = [
+            [
+                InlineKeyboardButton(
+                    INLINE_BUTTONS["confirm_booking"], callback_data="confirm"
+                ),
+                InlineKeyboardButton(
+                    INLINE_BUTTONS["cancel_booking"], callback_data="cancel"
+                ),
+                InlineKeyboardButton(
+                    INLINE_BUTTONS["edit_booking"], callback_data="back_to_edit"
+                ),
+            ]
+        ]
         return InlineKeyboardMarkup(keyboard)
 
-    def date(
-        self, year: int, month: int, available_dates: List[date], tg_id: int
-    ) -> InlineKeyboardMarkup:
-        """Создает клавиатуру для выбора даты в указанном месяце."""
 
-        keyboard = []
-        first_day = datetime(year, month, 1)
-        last_day = (first_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+def months_keyboard() -> InlineKeyboardMarkup:
+    """Получить клавиатуру для выбора месяца на сегодняшнюю дату."""
 
-        header = []
-        today = date.today()
+    return _months_keyboard(date.today())
 
-        start_month = today.month
-        start_year = today.year
-        end_month = (start_month + MONTHS_LOOKAHEAD - 1) % 12
-        end_year = start_year + (start_month + MONTHS_LOOKAHEAD - 1) // 12
 
-        if not (month == start_month and year == start_year):
-            prev_month = month - 1 if month > 1 else 12
-            prev_year = year if month > 1 else year - 1
-            header.append(
-                InlineKeyboardButton(
-                    EMOJI["back"], callback_data=f"prev_month_{prev_year}_{prev_month}"
-                )
-            )
+@lru_cache(maxsize=1)
+def _months_keyboard(today: date) -> InlineKeyboardMarkup:
+    """Создает клавиатуру для выбора месяца: MONTHS_LOOKAHEAD месяцев, начиная с месяца today.
 
-        header.append(
-            InlineKeyboardButton(first_day.strftime("%B %Y"), callback_data="ignore")
-        )
+    Клавиатура хранится в кэше до смены дня: первое обращение после полуночи
+    строит ее заново."""
 
-        if not (month == end_month and year == end_year):
-            next_month = month + 1 if month < 12 else 1
-            next_year = year if month < 12 else year + 1
-            header.append(
-                InlineKeyboardButton(
-                    EMOJI["forward"],
-                    callback_data=f"next_month_{next_year}_{next_month}",
-                )
-            )
+    keyboard = []
+    row = []
 
-        keyboard.append(header)
+    for i in range(MONTHS_LOOKAHEAD):
+        year_offset = (today.month + i - 1) // 12
+        month = (today.month + i - 1) % 12 + 1
+        current_year = today.year + year_offset
 
-        weekdays = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-        keyboard.append(
-            [InlineKeyboardButton(day, callback_data="ignore") for day in weekdays]
+        month_name = date(current_year, month, 1).strftime("%B")
+        row.append(
+            InlineKeyboardButton(
+                month_name.capitalize(),
+                callback_data=f"month_{month}_{current_year}",
+            )
         )
 
-        row = []
+        if len(row) == 2:
+            keyboard.append(row)
+            row = []
+    if row:
+        keyboard.append(row)
 
-        first_weekday = first_day.weekday()
+    keyboard.append(
+        [InlineKeyboardButton(INLINE_BUTTONS["back"], callback_data="back")]
+    )
 
-        for _ in range(first_weekday):
-            row.append(InlineKeyboardButton(" ", callback_data="ignore"))
+    return InlineKeyboardMarkup(keyboard)
 
-        if not tg_id in ADMIN_IDS:
-            block_condition = lambda date: date <= today
-        else:
-            block_condition = lambda date: date < today
 
-        for day in range(1, last_day.day + 1):
-            current_date = datetime(year, month, day).date()
-            if block_condition(current_date):
-                row.append(InlineKeyboardButton(EMOJI["lock"], callback_data="ignore"))
-            elif current_date in available_dates:
-                row.append(
-                    InlineKeyboardButton(str(day), callback_data=f"date_{current_date}")
-                )
-            else:
-                row.append(InlineKeyboardButton(EMOJI["lock"], callback_data="ignore"))
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _date_keyboard(
+    year: int, month: int, available_days: Tuple[int, ...], is_admin: bool, today: date
+) -> InlineKeyboardMarkup:
+    """Создает клавиатуру для выбора даты: available_days — доступные дни месяца."""
 
-            if len(row) == 7:
-                keyboard.append(row)
-                row = []
+    keyboard = []
+    first_day = datetime(year, month, 1)
+    last_day = (first_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
 
-        if row:
-            while len(row) < 7:
-                row.append(InlineKeyboardButton(" ", callback_data="ignore"))
-            keyboard.append(row)
+    header = []
 
-        keyboard.append(
-            [
-                InlineKeyboardButton(
-                    INLINE_BUTTONS["back_to_months"], callback_data="back_to_months"
-                )
-            ]
+    start_month = today.month
+    start_year = today.year
+    end_month = (start_month + MONTHS_LOOKAHEAD - 1) % 12
+    end_year = start_year + (start_month + MONTHS_LOOKAHEAD - 1) // 12
+
+    if not (month == start_month and year == start_year):
+        prev_month = month - 1 if month > 1 else 12
+        prev_year = year if month > 1 else year - 1
+        header.append(
+            InlineKeyboardButton(
+                EMOJI["back"], callback_data=f"prev_month_{prev_year}_{prev_month}"
+            )
         )
 
-        return InlineKeyboardMarkup(keyboard)
+    header.append(
+        InlineKeyboardButton(first_day.strftime("%B %Y"), callback_data="ignore")
+    )
 
-    def time(
-        self,
-        available_slots: List[Tuple[time, time]],
-        context: ContextTypes.DEFAULT_TYPE,
-    ) -> InlineKeyboardMarkup:
-        """Создает клавиатуру для выбора времени."""
-        keyboard = []
+    if not (month == end_month and year == end_year):
+        next_month = month + 1 if month < 12 else 1
+        next_year = year if month < 12 else year + 1
+        header.append(
+            InlineKeyboardButton(
+                EMOJI["forward"],
+                callback_data=f"next_month_{next_year}_{next_month}",
+            )
+        )
 
-        total_slots = len(available_slots)
+    keyboard.append(header)
 
-        if context.user_data["tg_id"] in ADMIN_IDS:
-            max_columns = 2
-        else:
-            max_columns = 5
+    weekdays = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+    keyboard.append(
+        [InlineKeyboardButton(day, callback_data="ignore") for day in weekdays]
+    )
 
-        if total_slots <= max_columns:
-            columns = total_slots
-            rows = 1
-        else:
-            columns = max_columns
-            rows = (total_slots + columns - 1) // columns
+    row = []
 
-        for row_index in range(rows):
-            row = []
-            for col_index in range(columns):
-                slot_index = row_index * columns + col_index
-                if slot_index < total_slots:
-                    if context.user_data["tg_id"] in ADMIN_IDS:
-                        start_time, end_time = available_slots[slot_index]
-                        button_text = f"({start_time.strftime("%H:%M")} - {end_time.strftime("%H:%M")})"
-                    else:
-                        start_time, _ = available_slots[slot_index]
-                        button_text = start_time.strftime("%H:%M")
-                    row.append(
-                        InlineKeyboardButton(
-                            button_text, callback_data=f"time_{start_time}"
-                        )
-                    )
-                else:
-                    row.append(InlineKeyboardButton(" ", callback_data="ignore"))
-            keyboard.append(row)
+    first_weekday = first_day.weekday()
 
-        if (
-            context.user_data["tg_id"] in ADMIN_IDS
-            and not context.user_data["reschedule"]
-        ):
-            keyboard.append(
-                [
-                    InlineKeyboardButton(
-                        INLINE_BUTTONS["back_to_admin_menu"],
-                        callback_data="back_to_menu",
-                    )
-                ]
-            )
-            keyboard.append(
-                [
-                    InlineKeyboardButton(
-                        INLINE_BUTTONS["back_to_dates"], callback_data="back_to_dates"
-                    )
-                ]
+    for _ in range(first_weekday):
+        row.append(InlineKeyboardButton(" ", callback_data="ignore"))
+
+    if not is_admin:
+        block_condition = lambda date: date <= today
+    else:
+        block_condition = lambda date: date < today
+
+    for day in range(1, last_day.day + 1):
+        current_date = datetime(year, month, day).date()
+        if block_condition(current_date):
+            row.append(InlineKeyboardButton(EMOJI["lock"], callback_data="ignore"))
+        elif day in available_days:
+            row.append(
+                InlineKeyboardButton(str(day), callback_data=f"date_{current_date}")
             )
         else:
-            keyboard.append(
-                [
-                    InlineKeyboardButton(
-                        INLINE_BUTTONS["back_to_dates"], callback_data="back_to_dates"
-                    )
-                ]
+            row.append(InlineKeyboardButton(EMOJI["lock"], callback_data="ignore"))
+
+        if len(row) == 7:
+            keyboard.append(row)
+            row = []
+
+    if row:
+        while len(row) < 7:
+            row.append(InlineKeyboardButton(" ", callback_data="ignore"))
+        keyboard.append(row)
+
+    keyboard.append(
+        [
+            InlineKeyboardButton(
+                INLINE_BUTTONS["back_to_months"], callback_data="back_to_months"
             )
-        return InlineKeyboardMarkup(keyboard)
+        ]
+    )
 
-    def procedures(self) -> ReplyKeyboardMarkup:
-        """Создает клавиатуру для выбора процедуры."""
-        keyboard = PROCEDURES_KEYBOARD
+    return InlineKeyboardMarkup(keyboard)
 
-        keyboard.append([KeyboardButton(REPLY_USER_BUTTONS["back_to_menu"])])
 
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _time_keyboard(
+    available_slots: Tuple[Tuple[time, time], ...],
+    is_admin: bool,
+    back_to_menu: bool,
+) -> InlineKeyboardMarkup:
+    """Создает клавиатуру для выбора времени.
 
-    def procedures_buttons(self) -> List:
-        return [button.text for row in self.procedures().keyboard for button in row]
+    Для администратора показываются интервалы целиком, а при back_to_menu
+    добавляется кнопка возврата в меню администратора."""
 
-    def confirmation(self) -> InlineKeyboardMarkup:
-        """Создает клавиатуру для подтверждения или отмены записи."""
-        keyboard = [
+    keyboard = []
+
+    total_slots = len(available_slots)
+
+    if is_admin:
+        max_columns = 2
+    else:
+        max_columns = 5
+
+    if total_slots <= max_columns:
+        columns = total_slots
+        rows = 1
+    else:
+        columns = max_columns
+        rows = (total_slots + columns - 1) // columns
+
+    for row_index in range(rows):
+        row = []
+        for col_index in range(columns):
+            slot_index = row_index * columns + col_index
+            if slot_index < total_slots:
+                if is_admin:
+                    start_time, end_time = available_slots[slot_index]
+                    button_text = f"({start_time.strftime("%H:%M")} - {end_time.strftime("%H:%M")})"
+                else:
+                    start_time, _ = available_slots[slot_index]
+                    button_text = start_time.strftime("%H:%M")
+                row.append(
+                    InlineKeyboardButton(
+                        button_text, callback_data=f"time_{start_time}"
+                    )
+                )
+            else:
+                row.append(InlineKeyboardButton(" ", callback_data="ignore"))
+        keyboard.append(row)
+
+    if back_to_menu:
+        keyboard.append(
             [
                 InlineKeyboardButton(
-                    INLINE_BUTTONS["confirm_booking"], callback_data="confirm"
-                ),
+                    INLINE_BUTTONS["back_to_admin_menu"],
+                    callback_data="back_to_menu",
+                )
+            ]
+        )
+        keyboard.append(
+            [
                 InlineKeyboardButton(
-                    INLINE_BUTTONS["cancel_booking"], callback_data="cancel"
-                ),
+                    INLINE_BUTTONS["back_to_dates"], callback_data="back_to_dates"
+                )
+            ]
+        )
+    else:
+        keyboard.append(
+            [
                 InlineKeyboardButton(
-                    INLINE_BUTTONS["edit_booking"], callback_data="back_to_edit"
-                ),
+                    INLINE_BUTTONS["back_to_dates"], callback_data="back_to_dates"
+                )
             ]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        )
+    return InlineKeyboardMarkup(keyboard)
+
+
+def save_date_keyboard(
+    context: ContextTypes.DEFAULT_TYPE,
+    year: int,
+    month: int,
+    available_dates: List[date],
+):
+    """Запомнить в user_data месяц и доступные даты клавиатуры выбора даты."""
+
+    context.user_data["calendar"] = (
+        year,
+        month,
+        tuple(
+            sorted(
+                available_date.day
+                for available_date in available_dates
+                if (available_date.year, available_date.month) == (year, month)
+            )
+        ),
+    )
+
+
+def saved_date_keyboard(
+    context: ContextTypes.DEFAULT_TYPE,
+) -> Optional[InlineKeyboardMarkup]:
+    """Получить последнюю показанную пользователю клавиатуру выбора даты."""
+
+    if "calendar" not in context.user_data:
+        return None
+    year, month, available_days = context.user_data["calendar"]
+    return _date_keyboard(
+        year,
+        month,
+        available_days,
+        context.user_data["tg_id"] in ADMIN_IDS,
+        date.today(),
+    )
+
+
+def save_time_keyboard(
+    context: ContextTypes.DEFAULT_TYPE, available_slots: List[Tuple[time, time]]
+):
+    """Запомнить в user_data слоты клавиатуры выбора времени."""
+
+    context.user_data["available_slots"] = tuple(available_slots)
+
+
+def saved_time_keyboard(
+    context: ContextTypes.DEFAULT_TYPE,
+) -> Optional[InlineKeyboardMarkup]:
+    """Получить последнюю показанную пользователю клавиатуру выбора времени."""
+
+    if "available_slots" not in context.user_data:
+        return None
+    is_admin = context.user_data["tg_id"] in ADMIN_IDS
+    return _time_keyboard(
+        tuple(context.user_data["available_slots"]),
+        is_admin,
+        is_admin and not context.user_data["reschedule"],
+    )
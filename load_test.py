@@ -0,0 +1,420 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import statistics
+import time as perf_time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest, RequestData
+import config
+from bot_setup import setup_bot_data, setup_bot_database
+from consts.messages import REPLY_USER_BUTTONS, USER_MESSAGES
+from database.benchmark import ScheduleBenchmark, percentile
+from database.setup import DB_BACKENDS
+from database.persistence import PostgresPersistence
+from main import add_handlers
+from utils.update_processor import PerChatUpdateProcessor
+
+# Схема, в которой создаются данные нагрузочного теста.
+LOAD_TEST_SCHEMA = "load_test"
+# Идентификаторы Telegram имитируемых клиентов начинаются с этого значения.
+FIRST_CLIENT_ID = 1_000_000_000
+# Сколько шагов может сделать клиент, прежде чем попытка записи считается неудачной.
+MAX_STEPS = 30
+
+
+class OfflineBotApi(BaseRequest):
+    """Заглушка Bot API: отвечает на запросы бота без обращения к Telegram.
+
+    Отправленные и отредактированные сообщения складываются в outbox по id чата,
+    число вызовов каждого метода API считается в calls."""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.outbox: Dict[int, List[dict]] = defaultdict(list)
+        self.message_ids = itertools.count(1)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=None,
+        write_timeout=None,
+        connect_timeout=None,
+        pool_timeout=None,
+    ) -> Tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        parameters = request_data.parameters if request_data else {}
+
+        if endpoint == "getMe":
+            result = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Load test",
+                "username": "load_test_bot",
+            }
+        elif endpoint in ("sendMessage", "editMessageText", "editMessageReplyMarkup"):
+            chat_id = int(parameters["chat_id"])
+            result = {
+                "message_id": int(
+                    parameters.get("message_id") or next(self.message_ids)
+                ),
+                "date": int(datetime.now().timestamp()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": parameters.get("text", ""),
+            }
+            # Telegram возвращает в сообщении только встроенную клавиатуру,
+            # клиенту нужны и обычные клавиатуры, поэтому в outbox попадают все.
+            reply_markup = parameters.get("reply_markup")
+            if reply_markup and "inline_keyboard" in reply_markup:
+                result["reply_markup"] = reply_markup
+            self.outbox[chat_id].append({**result, "reply_markup": reply_markup})
+        else:
+            result = True
+
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class SimulatedClient:
+    """Клиент, который проходит запись: /start → процедура → месяц → дата → время →
+    имя → телефон → подтверждение.
+
+    Каждый следующий шаг выбирается по клавиатуре последнего сообщения бота,
+    поэтому клиент выбирает только реально предложенные даты и время
+    и повторяет выбор, если слот успел занять другой клиент."""
+
+    def __init__(self, load_test: "LoadTest", number: int):
+        self.load_test = load_test
+        self.user = {
+            "id": FIRST_CLIENT_ID + number,
+            "is_bot": False,
+            "first_name": f"Клиент {number}",
+            "username": f"load_test_{number}",
+        }
+        self.name = f"Клиент {number}"
+        self.phone = f"8{9_000_000_000 + number}"
+        self.tried_months = set()
+
+    async def run(self) -> str:
+        """Пройти диалог записи и вернуть его итог: booked или abandoned."""
+
+        messages = await self.send_text("start", "/start")
+        for _ in range(MAX_STEPS):
+            if any(
+                message["text"] == USER_MESSAGES["booking_success"]
+                for message in messages
+            ):
+                return "booked"
+
+            markup_messages = [
+                message for message in messages if message["reply_markup"]
+            ]
+            if not markup_messages:
+                return "abandoned"
+            message = markup_messages[-1]
+            action = self.next_action(message["reply_markup"])
+            if action is None:
+                return "abandoned"
+
+            step, value = action
+            if "inline_keyboard" in message["reply_markup"]:
+                messages = await self.press(step, message, value)
+            else:
+                messages = await self.send_text(step, value)
+        return "abandoned"
+
+    def next_action(self, markup: dict) -> Optional[Tuple[str, str]]:
+        """Выбрать шаг и ответ по клавиатуре сообщения бота."""
+
+        if "inline_keyboard" in markup:
+            callbacks = [
+                button.get("callback_data")
+                for row in markup["inline_keyboard"]
+                for button in row
+            ]
+            if "confirm" in callbacks:
+                return "confirm", "confirm"
+            for prefix, step in (
+                ("time_", "time"),
+                ("date_", "date"),
+                ("next_month_", "next_month"),
+                ("month_", "month"),
+            ):
+                options = [
+                    callback
+                    for callback in callbacks
+                    if callback and callback.startswith(prefix)
+                ]
+                if step == "month":
+                    options = [
+                        option for option in options if option not in self.tried_months
+                    ]
+                    if options:
+                        self.tried_months.add(options[0])
+                        return step, options[0]
+                elif options:
+                    return step, random.choice(options)
+            # На выбранную дату не осталось слотов: вернуться к датам месяца
+            # и выбрать другую.
+            if "back_to_dates" in callbacks:
+                return "retry", "back_to_dates"
+            return None
+
+        texts = [button["text"] for row in markup.get("keyboard", []) for button in row]
+        if REPLY_USER_BUTTONS["select_procedure"] in texts:
+            return "menu", REPLY_USER_BUTTONS["select_procedure"]
+        if REPLY_USER_BUTTONS["back_to_time"] in texts:
+            return "name", self.name
+        if REPLY_USER_BUTTONS["back_to_name"] in texts:
+            return "phone", self.phone
+        procedures = [
+            text for text in texts if text != REPLY_USER_BUTTONS["back_to_menu"]
+        ]
+        if procedures:
+            return "procedure", random.choice(procedures)
+        return None
+
+    async def send_text(self, step: str, text: str) -> List[dict]:
+        """Отправить боту текстовое сообщение."""
+
+        message = {
+            "message_id": next(self.load_test.bot_api.message_ids),
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": self.user["id"], "type": "private"},
+            "from": self.user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [
+                {"type": "bot_command", "offset": 0, "length": len(text.split()[0])}
+            ]
+        return await self.load_test.process(step, self.user["id"], {"message": message})
+
+    async def press(self, step: str, message: dict, callback_data: str) -> List[dict]:
+        """Нажать кнопку встроенной клавиатуры сообщения бота."""
+
+        callback_query = {
+            "id": str(next(self.load_test.bot_api.message_ids)),
+            "from": self.user,
+            "chat_instance": str(self.user["id"]),
+            "message": message,
+            "data": callback_data,
+        }
+        return await self.load_test.process(
+            step, self.user["id"], {"callback_query": callback_query}
+        )
+
+
+class LoadTest:
+    """Нагрузочный тест диалога записи.
+
+    Обновления имитируемых клиентов проходят через настоящие обработчики
+    и ConversationHandler из main.py, обработчик очереди обновлений
+    и хранилище состояний; вместо Telegram бот обращается к OfflineBotApi,
+    а база данных — отдельная схема с синтетическим расписанием."""
+
+    def __init__(
+        self,
+        clients: int,
+        concurrency: int,
+        benchmark: ScheduleBenchmark,
+    ):
+        self.clients = clients
+        self.concurrency = concurrency
+        self.benchmark = benchmark
+        self.bot_api = OfflineBotApi()
+        self.update_ids = itertools.count(1)
+        self.step_timings: Dict[str, List[float]] = defaultdict(list)
+        self.app = None
+
+    def build_application(self) -> Application:
+        """Собрать приложение бота, работающее с заглушкой Bot API."""
+
+        app = (
+            Application.builder()
+            .token("0:load-test")
+            .request(self.bot_api)
+            .get_updates_request(self.bot_api)
+            .updater(None)
+            .concurrent_updates(
+                PerChatUpdateProcessor(getattr(config, "MAX_CONCURRENT_UPDATES", 1))
+            )
+            .persistence(
+                PostgresPersistence(
+                    self.benchmark.database["db"],
+                    getattr(config, "PERSISTENCE_FLUSH_INTERVAL", 60),
+                )
+            )
+            .build()
+        )
+        setup_bot_data(app)
+        add_handlers(app)
+        return app
+
+    async def process(self, step: str, chat_id: int, data: dict) -> List[dict]:
+        """Передать обновление приложению и вернуть сообщения, отправленные ботом в ответ."""
+
+        update = Update.de_json(
+            {"update_id": next(self.update_ids), **data}, self.app.bot
+        )
+        started = perf_time.perf_counter()
+        await self.app.update_processor.process_update(
+            update, self.app.process_update(update)
+        )
+        self.step_timings[step].append((perf_time.perf_counter() - started) * 1000)
+        return self.bot_api.outbox.pop(chat_id, [])
+
+    async def run(self) -> Dict[str, object]:
+        """Прогнать всех клиентов и вернуть результаты."""
+
+        self.app = self.build_application()
+        await self.app.initialize()
+        await setup_bot_database(self.app)
+        await self.app.start()
+
+        db = self.benchmark.database["db"]
+        db.query_stats.reset()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_client(number: int) -> str:
+            async with semaphore:
+                return await SimulatedClient(self, number).run()
+
+        started = perf_time.perf_counter()
+        try:
+            outcomes = Counter(
+                await asyncio.gather(
+                    *(run_client(number) for number in range(self.clients))
+                )
+            )
+            elapsed = perf_time.perf_counter() - started
+        finally:
+            await self.app.stop()
+            await self.app.shutdown()
+
+        # В статистику запросов попадают и запросы внутри Database.transaction,
+        # поэтому число запросов включает все запросы записи к базе данных.
+        queries = sum(stats.calls for stats in db.query_stats.statements.values())
+        return {
+            "elapsed": elapsed,
+            "outcomes": outcomes,
+            "updates": sum(len(timings) for timings in self.step_timings.values()),
+            "queries": queries,
+            "api_calls": self.bot_api.calls,
+        }
+
+
+def format_results(
+    results: Dict[str, object], step_timings: Dict[str, List[float]]
+) -> str:
+    """Сформировать текстовый отчет нагрузочного теста."""
+
+    outcomes = results["outcomes"]
+    booked = outcomes.get("booked", 0)
+    lines = [
+        f"Клиентов: {sum(outcomes.values())}, записались: {booked}, "
+        f"не записались: {outcomes.get('abandoned', 0)}",
+        f"Обновлений: {results['updates']} за {results['elapsed']:.2f} с "
+        f"({results['updates'] / results['elapsed']:.1f} обновлений/с)",
+        f"Запросов к базе данных: {results['queries']}"
+        + (f", на одну запись: {results['queries'] / booked:.1f}" if booked else ""),
+        "Вызовы Bot API: "
+        + ", ".join(
+            f"{name} {count}" for name, count in results["api_calls"].most_common()
+        ),
+        "",
+        f"{'Шаг':<12} {'обновлений':>10} {'среднее':>10} {'p50':>10} {'p95':>10} {'макс.':>10}",
+    ]
+    for step, timings in step_timings.items():
+        lines.append(
+            f"{step:<12} {len(timings):>10} {statistics.fmean(timings):>8.2f}мс "
+            f"{statistics.median(timings):>8.2f}мс {percentile(timings, 0.95):>8.2f}мс "
+            f"{max(timings):>8.2f}мс"
+        )
+    return "\n".join(lines)
+
+
+async def main(args: argparse.Namespace):
+    if not args.debug_log:
+        logging.disable(logging.INFO)
+
+    benchmark = ScheduleBenchmark(
+        appointments_per_day=args.appointments_per_day,
+        blocked_per_day=args.blocked_per_day,
+        history_months=0,
+        clients=1,
+        iterations=0,
+        schema=args.schema,
+        seed=args.seed,
+        backend=args.backend,
+        resources=args.resources,
+    )
+    random.seed(args.seed)
+    await benchmark.connect()
+    try:
+        await benchmark.seed()
+        load_test = LoadTest(args.clients, args.concurrency, benchmark)
+        results = await load_test.run()
+        print(format_results(results, load_test.step_timings))
+    finally:
+        await benchmark.close(keep=args.keep)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест диалога записи без обращения к Telegram."
+    )
+    parser.add_argument("--clients", type=int, default=1000, help="число клиентов")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=100,
+        help="сколько клиентов проходят диалог одновременно",
+    )
+    parser.add_argument(
+        "--appointments-per-day",
+        type=int,
+        default=4,
+        help="уже существующих записей на рабочий день",
+    )
+    parser.add_argument(
+        "--blocked-per-day", type=int, default=1, help="блокировок на рабочий день"
+    )
+    parser.add_argument(
+        "--resources", type=int, default=1, help="число мастеров в салоне"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=DB_BACKENDS,
+        default=getattr(config, "DB_BACKEND", "postgres"),
+        help="база данных: postgres или sqlite в памяти",
+    )
+    parser.add_argument(
+        "--schema", default=LOAD_TEST_SCHEMA, help="схема для данных теста"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="начальное значение генератора"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="не удалять схему с данными после теста"
+    )
+    parser.add_argument(
+        "--debug-log",
+        action="store_true",
+        help="оставить отладочное журналирование включенным во время теста",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -1,12 +1,76 @@
 from concurrent_log_handler import ConcurrentRotatingFileHandler
+from collections.abc import Mapping
+from datetime import date, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import copy
 import logging
+import queue
 
+_log_queue = None
+_listener = None
 
-def setup_logger(name, level=logging.DEBUG):
-    """Настройка базового логгера с выводом в файл и консоль с ротацией файла."""
 
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
+# Аргументы этих типов не меняются после вызова логгера и передаются в очередь как есть.
+_IMMUTABLE_ARG_TYPES = (
+    str,
+    bytes,
+    int,
+    float,
+    complex,
+    type(None),
+    date,
+    time,
+    timedelta,
+    Decimal,
+    Enum,
+)
+
+
+def _snapshot_arg(value):
+    """Зафиксировать аргумент записи: изменяемые объекты сразу приводятся к строке."""
+
+    if isinstance(value, _IMMUTABLE_ARG_TYPES):
+        return value
+    return str(value)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler, который кладет запись в очередь без форматирования.
+
+    Стандартный QueueHandler.prepare форматирует сообщение в вызывающем потоке;
+    здесь подстановка аргументов откладывается до фонового потока QueueListener.
+    Чтобы строка в журнале совпадала с моментом вызова, изменяемые аргументы
+    (списки строк, словари и т. п.) приводятся к строке сразу: они могут измениться
+    до того, как фоновый поток отформатирует запись. Такие аргументы подставляются
+    через str(), поэтому для них %r выводит ту же строку в кавычках."""
+
+    def prepare(self, record):
+        if not record.args:
+            return record
+
+        record = copy.copy(record)
+        if isinstance(record.args, Mapping):
+            record.args = {
+                key: _snapshot_arg(value) for key, value in record.args.items()
+            }
+        else:
+            record.args = tuple(_snapshot_arg(value) for value in record.args)
+        return record
+
+
+def _get_log_queue() -> queue.SimpleQueue:
+    """Создать общую очередь логов и запустить фоновый поток, который ее разбирает.
+
+    Форматирование, запись в файл с ротацией и вывод в консоль выполняются
+    в потоке QueueListener, а не в потоке, где вызывается логгер."""
+
+    global _log_queue, _listener
+
+    if _log_queue is not None:
+        return _log_queue
 
     formatter = logging.Formatter(
         "%(asctime)s - %(levelname)s - %(module)s - %(message)s"
@@ -15,14 +79,41 @@ def setup_logger(name, level=logging.DEBUG):
     file_handler = ConcurrentRotatingFileHandler(
         "bot.log", maxBytes=10 * 1024 * 1024, backupCount=1
     )
-    file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
 
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    _log_queue = queue.SimpleQueue()
+    _listener = QueueListener(
+        _log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+    return _log_queue
+
+
+def stop_logging():
+    """Дописать оставшиеся в очереди записи и остановить фоновый поток логов."""
+
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(name, level=logging.DEBUG):
+    """Настройка логгера, который только кладет записи в очередь.
+
+    Запись в файл с ротацией и в консоль выполняет фоновый поток.
+    Повторный вызов для того же имени не добавляет обработчики повторно."""
+
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+
+    if not any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        logger.addHandler(_DeferredQueueHandler(_get_log_queue()))
 
     return logger
@@ -1,6 +1,9 @@
-from bot_setup import setup_bot_data
+from bot_setup import on_shutdown, on_startup, setup_bot_data
 from config import TOKEN
+import config
 from handlers.general_handler import *
+from database.setup import create_database
+from database.persistence import PostgresPersistence
 
 from telegram.ext import (
     Application,
@@ -13,46 +16,94 @@ from warnings import filterwarnings
 from telegram.warnings import PTBUserWarning
 
 from states import START
+from utils.metrics import TimedHTTPXRequest
+from utils.update_processor import PerChatUpdateProcessor
 
 filterwarnings(
     action="ignore", message=r".*CallbackQueryHandler", category=PTBUserWarning
 )
 
 
+def run(app: Application):
+    """Запустить получение обновлений через вебхук или длинный опрос в зависимости от UPDATE_MODE."""
+
+    if getattr(config, "UPDATE_MODE", "polling") != "webhook":
+        app.run_polling()
+        return
+
+    if not config.WEBHOOK_URL:
+        raise ValueError("Для режима webhook необходимо задать WEBHOOK_URL.")
+
+    app.bot_data["logger"].debug(
+        f"Запуск в режиме webhook на {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}/{config.WEBHOOK_PATH}"
+    )
+    app.run_webhook(
+        listen=config.WEBHOOK_LISTEN,
+        port=config.WEBHOOK_PORT,
+        url_path=config.WEBHOOK_PATH,
+        webhook_url=config.WEBHOOK_URL,
+        secret_token=config.WEBHOOK_SECRET_TOKEN or None,
+        max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+    )
+
+
+def add_handlers(app: Application):
+    """Зарегистрировать команды и основной диалог бота.
+
+    Перед вызовом данные бота должны быть подготовлены setup_bot_data."""
+
+    user_handler = app.bot_data["user"]["handler"]
+    admin_handler = app.bot_data["admin"]["handler"]
+
+    start = CommandHandler("start", start_handler)
+    restart = CommandHandler("start", start_handler)
+
+    conv_handler = ConversationHandler(
+        entry_points=[start, restart],
+        states={
+            START: [MessageHandler(filters.TEXT & ~filters.COMMAND, start_handler)],
+            **user_handler,
+            **admin_handler,
+        },
+        fallbacks=[start],
+        per_message=False,
+        name="main",
+        persistent=True,
+    )
+
+    app.add_handler(CommandHandler("query_stats", query_stats_handler))
+    app.add_handler(CommandHandler("hours", working_hours_handler))
+    app.add_handler(CommandHandler("resources", resources_handler))
+    app.add_handler(conv_handler)
+
+
 def main():
     try:
-        app = Application.builder().token(TOKEN).build()
-        setup_bot_data(app)
-
-        user_handler = app.bot_data["user"]["handler"]
-        admin_handler = app.bot_data["admin"]["handler"]
-
-        start = CommandHandler("start", start_handler)
-        restart = CommandHandler("start", start_handler)
-
-        conv_handler = ConversationHandler(
-            entry_points=[start, restart],
-            states={
-                START: [MessageHandler(filters.TEXT & ~filters.COMMAND, start_handler)],
-                **user_handler,
-                **admin_handler,
-            },
-            fallbacks=[start],
-            per_message=False,
+        app = (
+            Application.builder()
+            .token(TOKEN)
+            .request(TimedHTTPXRequest(connection_pool_size=256))
+            .concurrent_updates(
+                PerChatUpdateProcessor(getattr(config, "MAX_CONCURRENT_UPDATES", 1))
+            )
+            .persistence(
+                PostgresPersistence(
+                    create_database(), getattr(config, "PERSISTENCE_FLUSH_INTERVAL", 60)
+                )
+            )
+            .post_init(on_startup)
+            .post_shutdown(on_shutdown)
+            .build()
         )
+        setup_bot_data(app)
+        add_handlers(app)
 
-        app.add_handler(conv_handler)
-
-        app.run_polling()
+        run(app)
 
     except KeyboardInterrupt:
         app.bot_data["logger"].debug("Бот остановлен.")
     except Exception as e:
         app.bot_data["logger"].error(f"Ошибка: {e}")
-    finally:
-        if "db" in locals():
-            app.bot_data["db"]["db"].close()
-            app.bot_data["logger"].debug("База данных закрыта.")
 
 
 if __name__ == "__main__":
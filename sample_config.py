@@ -14,3 +14,42 @@ DB_CONFIG = {
     "host": os.getenv("DB_HOST"),
     "port": os.getenv("DB_PORT"),
 }
+# База данных: postgres (DB_CONFIG) или sqlite (файл SQLITE_PATH, :memory: — в памяти процесса)
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+SQLITE_PATH = os.getenv("SQLITE_PATH", ":memory:")
+
+# Журналирование результатов SELECT-запросов: full, count или off
+QUERY_LOG_MODE = os.getenv("QUERY_LOG_MODE", "count")
+# Доля запросов (от 0 до 1), результаты которых попадают в журнал
+QUERY_LOG_SAMPLE_RATE = float(os.getenv("QUERY_LOG_SAMPLE_RATE", "1.0"))
+
+# Файл, в который сохраняется статистика запросов по команде /query_stats dump
+# и при остановке бота
+QUERY_STATS_FILE = os.getenv("QUERY_STATS_FILE", "query_stats.json")
+
+# Метрики обработчиков в формате Prometheus: локальный HTTP-эндпоинт (0 — отключен)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Файл, в который метрики записываются каждые METRICS_FILE_INTERVAL секунд (пусто — отключено)
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL = int(os.getenv("METRICS_FILE_INTERVAL", "60"))
+
+# Способ получения обновлений: polling (длинный опрос) или webhook
+UPDATE_MODE = os.getenv("UPDATE_MODE", "polling")
+# Публичный HTTPS-адрес вебхука, например https://example.com/bot
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Адрес и порт локального сервера, принимающего запросы от Telegram
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "bot")
+# Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+# Максимальное число одновременных соединений Telegram с вебхуком (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Число одновременно обрабатываемых обновлений разных пользователей
+# (обновления одного пользователя всегда обрабатываются по очереди)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "16"))
+
+# Как часто (в секундах) состояния диалогов и user_data записываются в базу данных
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "10"))
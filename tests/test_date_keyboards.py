@@ -0,0 +1,92 @@
+import unittest
+from datetime import date, time, timedelta
+from database.availability_cache import AvailabilityCache
+from database.slot_holds import SlotHolds
+from keyboards.date_keyboards import DateKeyboardCache
+
+YEAR = date.today().year + 1
+MONTH_A = (YEAR, 3)
+MONTH_B = (YEAR, 4)
+# Telegram id клиентов, которые не входят в ADMIN_IDS.
+CLIENT_ID = 10**15 + 1
+OTHER_CLIENT_ID = 10**15 + 2
+HOLDER_ID = 10**15 + 3
+
+
+class FakeSchedule:
+    """Расписание, которое заполняет кэш доступности и считает расчеты месяцев."""
+
+    def __init__(self):
+        self.availability_cache = AvailabilityCache()
+        self.slot_holds = SlotHolds()
+        self.builds = []
+
+    async def get_available_dates(
+        self, procedure=None, target_month=None, owner_id=None
+    ):
+        year, month = target_month
+        self.builds.append(target_month)
+        generation = self.availability_cache.generation
+        day = date(year, month, 1)
+        while day.month == month:
+            self.availability_cache.put(
+                day, procedure, [(time(10), time(11))], generation
+            )
+            day += timedelta(days=1)
+        return [date(year, month, 1)]
+
+
+class FakeKeyboards:
+    def date(self, year, month, available_dates, tg_id):
+        return (year, month, tuple(available_dates))
+
+
+class DateKeyboardCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.schedule = FakeSchedule()
+        self.cache = DateKeyboardCache(self.schedule, FakeKeyboards())
+
+    async def test_repeated_request_hits_cache(self):
+        await self.cache.get(*MONTH_B, None, CLIENT_ID)
+        await self.cache.get(*MONTH_B, None, OTHER_CLIENT_ID)
+
+        self.assertEqual(self.schedule.builds, [MONTH_B])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    async def test_booking_in_other_month_keeps_entry(self):
+        await self.cache.get(*MONTH_A, None, CLIENT_ID)
+        await self.cache.get(*MONTH_B, None, CLIENT_ID)
+
+        # Запись в месяце A сбрасывает кэш доступности только для ее даты.
+        self.schedule.availability_cache.invalidate([date(*MONTH_A, 10)])
+        await self.cache.get(*MONTH_B, None, OTHER_CLIENT_ID)
+        await self.cache.get(*MONTH_A, None, OTHER_CLIENT_ID)
+
+        self.assertEqual(self.schedule.builds, [MONTH_A, MONTH_B, MONTH_A])
+
+    async def test_hold_invalidates_only_its_month(self):
+        await self.cache.get(*MONTH_A, None, CLIENT_ID)
+        await self.cache.get(*MONTH_B, None, CLIENT_ID)
+
+        self.schedule.slot_holds.hold(
+            HOLDER_ID, date(*MONTH_A, 10), time(10), time(11), 1
+        )
+        await self.cache.get(*MONTH_B, None, OTHER_CLIENT_ID)
+        await self.cache.get(*MONTH_A, None, OTHER_CLIENT_ID)
+        self.schedule.slot_holds.release(HOLDER_ID)
+        await self.cache.get(*MONTH_B, None, OTHER_CLIENT_ID)
+        await self.cache.get(*MONTH_A, None, OTHER_CLIENT_ID)
+
+        self.assertEqual(self.schedule.builds, [MONTH_A, MONTH_B, MONTH_A, MONTH_A])
+
+    async def test_clear_invalidates_all_months(self):
+        await self.cache.get(*MONTH_B, None, CLIENT_ID)
+
+        self.schedule.availability_cache.clear()
+        await self.cache.get(*MONTH_B, None, OTHER_CLIENT_ID)
+
+        self.assertEqual(self.schedule.builds, [MONTH_B, MONTH_B])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,273 @@
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+from telegram.request import HTTPXRequest
+from logger import setup_logger
+import states
+
+# Квантили задержки обработчиков, которые считаются по последним наблюдениям.
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Показатели кэшей: имя метрики, описание, тип и ключ словаря, который возвращает stats() кэша.
+CACHE_METRICS = (
+    ("bot_cache_hits_total", "Число попаданий в кэш.", "counter", "hits"),
+    ("bot_cache_misses_total", "Число промахов кэша.", "counter", "misses"),
+    ("bot_cache_size", "Число записей в кэше.", "gauge", "size"),
+    ("bot_cache_hit_ratio", "Доля попаданий в кэш.", "gauge", "hit_rate"),
+)
+
+STATE_NAMES = {
+    value: name
+    for name, value in vars(states).items()
+    if name.isupper() and isinstance(value, int)
+}
+
+
+class UpdateTiming:
+    """Время, потраченное при обработке одного обновления на базу данных и Telegram API."""
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.telegram_seconds = 0.0
+
+
+# Замер текущего обновления. Обработчик, база данных и запросы к Telegram API
+# выполняются в одной asyncio-задаче, поэтому видят одно и то же значение.
+current_timing: ContextVar[Optional[UpdateTiming]] = ContextVar(
+    "current_timing", default=None
+)
+
+
+def add_db_time(seconds: float):
+    """Учесть время запроса к базе данных в замере текущего обновления."""
+
+    timing = current_timing.get()
+    if timing is not None:
+        timing.db_seconds += seconds
+
+
+def add_telegram_time(seconds: float):
+    """Учесть время запроса к Telegram API в замере текущего обновления."""
+
+    timing = current_timing.get()
+    if timing is not None:
+        timing.telegram_seconds += seconds
+
+
+class TimedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest, который учитывает время запросов к Telegram API."""
+
+    async def do_request(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(*args, **kwargs)
+        finally:
+            add_telegram_time(time.perf_counter() - started)
+
+
+class HandlerStats:
+    """Статистика одного обработчика в одном состоянии диалога."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.exceptions = 0
+        self.total_seconds = 0.0
+        self.db_seconds = 0.0
+        self.telegram_seconds = 0.0
+        self.recent = deque(maxlen=window)
+
+    def quantile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HandlerMetrics:
+    """Задержки, число обновлений и исключений обработчиков по состояниям диалога.
+
+    Квантили считаются по последним window наблюдениям каждого обработчика.
+    Метрики отдаются в текстовом формате Prometheus через локальный
+    HTTP-эндпоинт и/или периодически записываются в файл.
+    Вместе с ними отдается статистика зарегистрированных кэшей."""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self.handlers: Dict[Tuple[str, str], HandlerStats] = {}
+        self.caches: Dict[str, object] = {}
+        self.started_at = time.time()
+        self.logger = setup_logger(__name__)
+
+    def observe(
+        self,
+        state: str,
+        handler: str,
+        seconds: float,
+        timing: UpdateTiming,
+        failed: bool,
+    ):
+        """Учесть одну обработку обновления."""
+
+        stats = self.handlers.get((state, handler))
+        if stats is None:
+            stats = self.handlers[(state, handler)] = HandlerStats(self.window)
+        stats.count += 1
+        stats.total_seconds += seconds
+        stats.db_seconds += timing.db_seconds
+        stats.telegram_seconds += timing.telegram_seconds
+        stats.recent.append(seconds)
+        if failed:
+            stats.exceptions += 1
+
+    def register_cache(self, name: str, cache: object):
+        """Добавить в метрики статистику кэша: у кэша должен быть метод stats()."""
+
+        self.caches[name] = cache
+
+    def instrument(self, state: object, callback):
+        """Обернуть callback обработчика замером времени."""
+
+        state_name = STATE_NAMES.get(state, str(state))
+        handler_name = getattr(callback, "__qualname__", repr(callback))
+
+        @wraps(callback)
+        async def timed_callback(update, context):
+            timing = UpdateTiming()
+            token = current_timing.set(timing)
+            started = time.perf_counter()
+            failed = False
+            try:
+                return await callback(update, context)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                current_timing.reset(token)
+                self.observe(
+                    state_name,
+                    handler_name,
+                    time.perf_counter() - started,
+                    timing,
+                    failed,
+                )
+
+        return timed_callback
+
+    def instrument_handlers(self, handlers: dict) -> dict:
+        """Обернуть замером времени все обработчики словаря состояний диалога."""
+
+        for state, state_handlers in handlers.items():
+            for handler in state_handlers:
+                handler.callback = self.instrument(state, handler.callback)
+        return handlers
+
+    def render(self) -> str:
+        """Сформировать метрики в текстовом формате Prometheus."""
+
+        lines = [
+            "# HELP bot_uptime_seconds Время работы бота.",
+            "# TYPE bot_uptime_seconds gauge",
+            f"bot_uptime_seconds {time.time() - self.started_at:.3f}",
+            "# HELP bot_handler_duration_seconds Время обработки обновления обработчиком.",
+            "# TYPE bot_handler_duration_seconds summary",
+        ]
+        items = sorted(self.handlers.items())
+        for (state, handler), stats in items:
+            labels = f'state="{state}",handler="{handler}"'
+            for q in QUANTILES:
+                lines.append(
+                    f'bot_handler_duration_seconds{{{labels},quantile="{q}"}} '
+                    f"{stats.quantile(q):.6f}"
+                )
+            lines.append(
+                f"bot_handler_duration_seconds_sum{{{labels}}} {stats.total_seconds:.6f}"
+            )
+            lines.append(
+                f"bot_handler_duration_seconds_count{{{labels}}} {stats.count}"
+            )
+
+        for name, help_text, attribute in (
+            (
+                "bot_handler_exceptions_total",
+                "Число исключений в обработчике.",
+                "exceptions",
+            ),
+            (
+                "bot_handler_db_seconds_total",
+                "Время запросов к базе данных внутри обработчика.",
+                "db_seconds",
+            ),
+            (
+                "bot_handler_telegram_seconds_total",
+                "Время запросов к Telegram API внутри обработчика.",
+                "telegram_seconds",
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (state, handler), stats in items:
+                value = getattr(stats, attribute)
+                lines.append(
+                    f'{name}{{state="{state}",handler="{handler}"}} '
+                    + (f"{value:.6f}" if isinstance(value, float) else f"{value}")
+                )
+
+        cache_stats = {
+            name: cache.stats() for name, cache in sorted(self.caches.items())
+        }
+        for name, help_text, metric_type, key in CACHE_METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for cache_name, stats in cache_stats.items():
+                value = stats[key]
+                lines.append(
+                    f'{name}{{cache="{cache_name}"}} '
+                    + (f"{value:.6f}" if isinstance(value, float) else f"{value}")
+                )
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Записать метрики в файл."""
+
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.render())
+
+    async def write_periodically(self, path: str, interval: float):
+        """Записывать метрики в файл каждые interval секунд."""
+
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write(path)
+            except OSError as e:
+                self.logger.error(f"Ошибка при записи метрик в файл {path}: {e}")
+
+    async def _serve(self, reader, writer):
+        """Ответить на HTTP-запрос текущими метриками."""
+
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = self.render().encode("utf-8")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def start_server(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Запустить локальный HTTP-эндпоинт с метриками."""
+
+        server = await asyncio.start_server(self._serve, host, port)
+        self.logger.debug(f"Метрики доступны по адресу http://{host}:{port}/metrics")
+        return server
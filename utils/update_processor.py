@@ -0,0 +1,66 @@
+from typing import Any, Awaitable, Dict, Hashable, Optional, Tuple
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Ограничение на общее число принятых в обработку обновлений, включая ожидающие
+# своей очереди в чате. Одновременно выполняется не больше max_concurrent_updates из них.
+MAX_PENDING_UPDATES = 10_000
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений разных пользователей.
+
+    Обновления одного пользователя в одном чате обрабатываются строго по очереди,
+    чтобы ConversationHandler видел их в порядке поступления. Число одновременно
+    обрабатываемых обновлений ограничено max_concurrent_updates; обновления,
+    ожидающие своей очереди в чате, в это ограничение не входят."""
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(MAX_PENDING_UPDATES)
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates должно быть положительным числом.")
+        self.concurrency_limit = max_concurrent_updates
+        self.running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # Блокировка и число ожидающих ее обновлений для каждого ключа.
+        self.chat_locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+
+    @staticmethod
+    def update_key(update: object) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        """Ключ очереди обновления — как у ConversationHandler: (id чата, id пользователя)."""
+
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat
+        user = update.effective_user
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    async def do_process_update(
+        self, update: object, coroutine: Awaitable[Any]
+    ) -> None:
+        key = self.update_key(update)
+        if key is None:
+            async with self.running:
+                await coroutine
+            return
+
+        lock, waiting = self.chat_locks.get(key, (asyncio.Lock(), 0))
+        self.chat_locks[key] = (lock, waiting + 1)
+        try:
+            async with lock:
+                async with self.running:
+                    await coroutine
+        finally:
+            lock, waiting = self.chat_locks[key]
+            if waiting == 1:
+                del self.chat_locks[key]
+            else:
+                self.chat_locks[key] = (lock, waiting - 1)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
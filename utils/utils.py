@@ -1,8 +1,14 @@
 from datetime import datetime, timedelta
+from typing import Optional
+import asyncpg
 from telegram import Update
 from telegram.ext import ContextTypes
 from config import ADMIN_IDS
 from consts.constants import PROCEDURES
+from database.appointments import BookingStatus
+from logger import setup_logger
+
+logger = setup_logger(__name__)
 
 
 async def basic_context_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -17,10 +23,34 @@ async def basic_context_update(update: Update, context: ContextTypes.DEFAULT_TYP
     context.user_data["tg_first_name"] = tg_first_name
 
 
+async def get_client_for_update(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> Optional[asyncpg.Record]:
+    """Получить запись клиента текущего пользователя по tg_id.
+
+    Запись загружается из базы данных один раз за обработку обновления:
+    контекст создается заново для каждого обновления, поэтому кэш в нем
+    не переживает текущий запрос."""
+    if "client_record" not in context.__dict__:
+        clients = context.bot_data["db"]["clients"]
+        context.client_record = await clients.get_client_by_tg_id(
+            update.effective_user.id
+        )
+    return context.client_record
+
+
+def forget_client_for_update(context: ContextTypes.DEFAULT_TYPE):
+    """Сбросить закэшированную запись клиента после изменения его данных."""
+    context.__dict__.pop("client_record", None)
+
+
 async def create_appointment_from_context(
     update: Update, context: ContextTypes.DEFAULT_TYPE
-):
-    """Создать запись на основе данных из контекста."""
+) -> BookingStatus:
+    """Создать запись на основе данных из контекста.
+
+    При переносе (context.user_data["reschedule"]) прежняя запись удаляется
+    в той же транзакции, что и создается новая."""
     procedure_name = context.user_data["procedure_selected"]
     date_selected = context.user_data["date_selected"]
     time_selected = context.user_data["time_selected"]
@@ -33,15 +63,15 @@ async def create_appointment_from_context(
             else:
                 time_selected = datetime.strptime(time_selected, "%H:%M").time()
         except ValueError as e:
-            print(f"Ошибка при преобразовании времени: {e}")
-            return
+            logger.error(f"Ошибка при преобразовании времени: {e}")
+            return BookingStatus.ERROR
 
     if isinstance(date_selected, str):
         try:
             date_selected = datetime.strptime(date_selected, "%Y-%m-%d").date()
         except ValueError as e:
-            print(f"Ошибка при преобразовании даты: {e}")
-            return
+            logger.error(f"Ошибка при преобразовании даты: {e}")
+            return BookingStatus.ERROR
 
     start_datetime = datetime.combine(date_selected, time_selected)
     end_time = start_datetime + procedure_duration
@@ -49,62 +79,74 @@ async def create_appointment_from_context(
     appointments = context.bot_data["db"]["appointments"]
     clients = context.bot_data["db"]["clients"]
 
+    replaced_appointment_id = (
+        context.user_data.get("appointment_id")
+        if context.user_data.get("reschedule")
+        else None
+    )
+
     if not context.user_data["tg_id"] in ADMIN_IDS:
-        tg_id = int(context.user_data["tg_id"])
-        tg_username = context.user_data["tg_username"]
-        tg_first_name = context.user_data["tg_first_name"]
+        # Клиент добавляется или обновляется в одной транзакции с записью.
         name = context.user_data["name"]
         phone = context.user_data["phone"]
 
-        clients.add_client(
-            tg_id=tg_id,
-            tg_first_name=tg_first_name,
-            tg_username=tg_username,
-            name=name,
-            telephone=phone,
+        return await appointments.create_appointment(
+            client_id=None,
+            client_name=name,
+            client_telephone=phone,
+            procedure=procedure_name,
+            date=date_selected,
+            start_time=time_selected,
+            end_time=end_time.time(),
+            replaced_appointment_id=replaced_appointment_id,
+            hold_owner_id=context.user_data["tg_id"],
+            tg_id=int(context.user_data["tg_id"]),
+            tg_first_name=context.user_data["tg_first_name"],
+            tg_username=context.user_data["tg_username"],
         )
 
-        client_id = clients.get_client_id_by_tg_id(tg_id)
+    try:
+        name = context.user_data["client"][1]
+        phone = context.user_data["client"][2]
+    except:
+        name = context.user_data["name"]
+        phone = context.user_data["phone"]
 
-    else:
-        try:
-            name = context.user_data["client"][1]
-            phone = context.user_data["client"][2]
-        except:
-            name = context.user_data["name"]
-            phone = context.user_data["phone"]
-
-        client_id = clients.get_client_id_by_telephone(phone)
-
-        if client_id:
-            if len(client_id) > 1:
-                chat_id = context.user_data["chat_id"]
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text="❗ Найдено несколько клиентов с таким телефоном. Операция прервана ❗",
-                )
-                return
-            clients.update_client(
-                client_id=client_id[0][0],
-                name=name,
-                telephone=phone,
-            )
-        else:
-            clients.add_client(
-                tg_id=None,
-                tg_first_name=None,
-                tg_username=None,
-                name=name,
-                telephone=phone,
+    client_ids = await clients.get_client_id_by_telephone(phone)
+
+    if client_ids:
+        if len(client_ids) > 1:
+            chat_id = context.user_data["chat_id"]
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text="❗ Найдено несколько клиентов с таким телефоном. Операция прервана ❗",
             )
-            client_id = clients.get_client_id_by_telephone(phone)
+            return BookingStatus.ERROR
+        client_id = client_ids[0][0]
+        await clients.update_client(
+            client_id=client_id,
+            name=name,
+            telephone=phone,
+        )
+    else:
+        client_id = await clients.add_client(
+            tg_id=None,
+            tg_first_name=None,
+            tg_username=None,
+            name=name,
+            telephone=phone,
+        )
+        if client_id is None:
+            return BookingStatus.ERROR
 
-    appointments.create_appointment(
-        client_id=client_id[0][0],
+    return await appointments.create_appointment(
+        client_id=client_id,
         client_name=name,
         client_telephone=phone,
         procedure=procedure_name,
         date=date_selected,
         start_time=time_selected,
         end_time=end_time.time(),
+        replaced_appointment_id=replaced_appointment_id,
+        hold_owner_id=context.user_data["tg_id"],
     )